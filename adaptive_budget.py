@@ -0,0 +1,120 @@
+import math
+import time
+from collections import Counter, namedtuple
+
+# Sequential stopping rule for the generation/validation loop. Each distinct
+# candidate starts at prior odds of being correct; every extra generation that
+# repeats it multiplies them by agreement_weight and every validation by the
+# judge's likelihood ratio (judge_sensitivity: P(valid | correct),
+# judge_false_accept: P(valid | wrong)). A candidate is accepted at
+# target_confidence once at least one validation passed it (agreement alone
+# never accepts) and dropped below reject_below. Generation stops early
+# after divergence_limit distinct candidates in a row, or when the optional
+# per-query max_calls / max_seconds budget runs out (checked before each call).
+AdaptivePolicy = namedtuple(
+    'AdaptivePolicy',
+    ['target_confidence', 'reject_below', 'prior', 'judge_sensitivity', 'judge_false_accept',
+     'agreement_weight', 'divergence_limit', 'max_calls', 'max_seconds'],
+    defaults=(0.95, 0.3, 0.7, 0.9, 0.25, 3.0, 3, None, None)
+)
+
+
+def _logit(p):
+    return math.log(p / (1 - p))
+
+
+class CandidateBeliefs:
+    """Posterior confidence in each distinct candidate of one query under an AdaptivePolicy"""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.counts = Counter()
+        self.validations = Counter()
+        self.passes = Counter()
+        self.log_odds = {}
+        self.generations = 0
+        # Generations in a row that produced a candidate not seen before
+        self.new_streak = 0
+        self._accept = _logit(policy.target_confidence)
+        self._reject = _logit(policy.reject_below)
+        self._passed = math.log(policy.judge_sensitivity / policy.judge_false_accept)
+        self._failed = math.log((1 - policy.judge_sensitivity) / (1 - policy.judge_false_accept))
+        self._agreement = math.log(policy.agreement_weight)
+
+    def add_generation(self, sequence):
+        """Count a generation; sequence is None if it could not be parsed"""
+        self.generations += 1
+        if sequence is None:
+            return
+        if sequence in self.counts:
+            self.log_odds[sequence] += self._agreement
+            self.new_streak = 0
+        else:
+            self.log_odds[sequence] = _logit(self.policy.prior)
+            self.new_streak += 1
+        self.counts[sequence] += 1
+
+    def add_verdict(self, sequence, valid):
+        self.validations[sequence] += 1
+        self.passes[sequence] += valid
+        self.log_odds[sequence] += self._passed if valid else self._failed
+
+    def confidence(self, sequence):
+        return 1 / (1 + math.exp(-self.log_odds[sequence]))
+
+    def accepted(self, sequence):
+        return self.log_odds[sequence] >= self._accept and self.passes[sequence] > 0
+
+    def rejected(self, sequence):
+        return self.log_odds[sequence] < self._reject
+
+    def decided(self, sequence):
+        return self.accepted(sequence) or self.rejected(sequence)
+
+    def validations_needed(self, sequence):
+        """Passed validations that would still be needed to accept the sequence"""
+        needed = math.ceil((self._accept - self.log_odds[sequence]) / self._passed - 1e-9)
+        return max(needed, 0 if self.passes[sequence] else 1)
+
+    def diverging(self):
+        return self.new_streak >= self.policy.divergence_limit
+
+    def open_candidates(self, max_validations):
+        """Undecided candidates with validations left, most confident first"""
+        return sorted(
+            (sequence for sequence in self.counts
+             if not self.decided(sequence) and self.validations[sequence] < max_validations),
+            key=lambda sequence: -self.log_odds[sequence]
+        )
+
+    def majority(self):
+        """The most generated candidate, ties broken by confidence; None without candidates"""
+        if not self.counts:
+            return None
+        return max(self.counts, key=lambda sequence: (self.counts[sequence], self.log_odds[sequence]))
+
+
+class QueryBudget:
+    """Calls and seconds left of an AdaptivePolicy's per-query budget, read from the query stats"""
+
+    def __init__(self, policy, stats):
+        self.policy = policy
+        self.stats = stats
+
+    def calls_left(self):
+        if self.policy.max_calls is None:
+            return math.inf
+        return max(0, self.policy.max_calls - self.stats.llm_calls)
+
+    def time_left(self):
+        if self.policy.max_seconds is None:
+            return math.inf
+        return max(0.0, self.policy.max_seconds - (time.perf_counter() - self.stats.started))
+
+    def exhausted(self):
+        """'call_budget' or 'time_budget' if no further call may start, else None"""
+        if self.calls_left() <= 0:
+            return 'call_budget'
+        if self.time_left() <= 0:
+            return 'time_budget'
+        return None
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import httpx
+import ollama
+
+
+def normalize_model_name(name):
+    """Model name with the implicit :latest tag made explicit"""
+    return name if ':' in name else f"{name}:latest"
+
+
+def parse_hosts(spec, max_in_flight):
+    """Parse a comma-separated host list; each URL may end in #<max in flight>"""
+    hosts = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, limit = entry.partition('#')
+        hosts.append((url.rstrip('/'), int(limit) if limit else max_in_flight))
+    return hosts
+
+
+def is_backend_failure(error):
+    """True if error means the host is unhealthy rather than the request being bad"""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class Backend:
+    """State of one Ollama host in the pool"""
+
+    def __init__(self, url, max_in_flight):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        # Models reported by /api/tags; None until the first health check answers
+        self.models = None
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.next_check = 0.0
+
+    def serves(self, model):
+        return self.models is None or normalize_model_name(model) in self.models
+
+    def snapshot(self):
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'models': sorted(self.models) if self.models is not None else None,
+        }
+
+
+class BackendPool:
+    """Spreads LLM requests over several Ollama hosts.
+
+    Each request goes to the least-loaded healthy host that has the model
+    (in-flight requests relative to the host's max_in_flight). A host that
+    fails with a connection error, a timeout or a server error is ejected for
+    eject_seconds; after that a health check against /api/tags decides whether
+    it comes back. Healthy hosts are re-checked every health_interval seconds,
+    which also refreshes their model inventory. If every host that has the
+    model is ejected, requests still go to the least loaded of them.
+
+    The pool only does the bookkeeping; the caller runs the requests and the
+    health checks and reports the outcome with release() and check_passed() /
+    check_failed(). It is thread-safe, so one pool serves every event loop.
+    """
+
+    def __init__(self, hosts, max_in_flight=4, eject_seconds=30.0, health_interval=15.0):
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.backends = []
+        for host in hosts:
+            url, limit = (host, max_in_flight) if isinstance(host, str) else host
+            self.backends.append(Backend(url, limit))
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one host")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.backends)
+
+    def capacity(self):
+        """Total max in-flight requests over all hosts"""
+        return sum(backend.max_in_flight for backend in self.backends)
+
+    def _candidates(self, model, exclude):
+        return [backend for backend in self.backends if backend.url not in exclude and backend.serves(model)]
+
+    def acquire(self, model, exclude=()):
+        """Pick the host for one request and count it as in flight until release()"""
+        with self._lock:
+            candidates = self._candidates(model, exclude)
+            if not candidates:
+                raise ollama.ResponseError(f"model '{model}' not found on any Ollama host", 404)
+            healthy = [backend for backend in candidates if backend.healthy] or candidates
+            # Ties go to the host with fewer requests so far, which spreads an idle start evenly
+            backend = min(healthy, key=lambda backend: (backend.in_flight / backend.max_in_flight, backend.requests))
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, failed=False):
+        """Finish a request; a failed one ejects the host. Returns True if it was ejected"""
+        with self._lock:
+            backend.in_flight -= 1
+            if not failed:
+                return False
+            backend.failures += 1
+            was_healthy = backend.healthy
+            self._eject(backend)
+            return was_healthy
+
+    def _eject(self, backend):
+        backend.healthy = False
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+        backend.next_check = backend.ejected_until
+
+    def has_alternative(self, model, exclude):
+        """True if a host not in exclude could serve model"""
+        with self._lock:
+            return bool(self._candidates(model, exclude))
+
+    def due_checks(self):
+        """Hosts whose health check is due; each is handed out once per interval"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for backend in self.backends:
+                if now >= backend.next_check:
+                    backend.next_check = now + (self.health_interval if backend.healthy else self.eject_seconds)
+                    due.append(backend)
+        return due
+
+    def check_passed(self, backend, models):
+        """Re-add the host and store the models it reported"""
+        with self._lock:
+            backend.models = {normalize_model_name(model) for model in models}
+            backend.healthy = True
+            backend.next_check = time.monotonic() + self.health_interval
+
+    def check_failed(self, backend):
+        with self._lock:
+            self._eject(backend)
+
+    def status(self):
+        with self._lock:
+            return [backend.snapshot() for backend in self.backends]
@@ -0,0 +1,97 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """State of one background job, updated by the job and read by pollers"""
+
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.status = 'queued'
+        self.done = 0
+        self.total = None
+        self.lines = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def progress(self, done=None, total=None, message=None):
+        """Report progress from inside the job"""
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.lines.append(message)
+
+    def snapshot(self):
+        """Returns a consistent copy of the job state"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'name': self.name,
+                'status': self.status,
+                'done': self.done,
+                'total': self.total,
+                'output': "\n".join(self.lines),
+                'result': self.result,
+                'error': self.error,
+            }
+
+
+class JobManager:
+    """Runs long jobs on a small dedicated thread pool and keeps their progress for polling.
+
+    max_workers bounds how many jobs run at once; further jobs wait their
+    turn, so a burst of long jobs cannot take over the request threads or the
+    backend. Finished jobs are kept for keep_finished seconds.
+    """
+
+    def __init__(self, max_workers=1, keep_finished=3600):
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs) and return the job id"""
+        with self._lock:
+            self._prune()
+            job = Job(f"{name}-{next(self._ids)}", name)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Returns the snapshot of a job, or None for unknown ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def active(self):
+        """Number of queued or running jobs"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ('queued', 'running'))
@@ -0,0 +1,98 @@
+"""Compare fixed retry/validation budgets with the adaptive stopping rule.
+
+Runs the test prompts through process_query with each policy, with a share
+of them marked hard on the mock server (the model never gets them right), and
+reports accuracy on the answerable prompts, mean / p95 / max LLM calls per
+query, mean calls on the hard prompts and the stop reasons:
+
+- fixed 3/3 (run_tests) and fixed 10/5 (terminal and Gradio defaults)
+- adaptive with the same upper bounds, without and with a call budget
+
+    python benchmarks/bench_adaptive.py
+    python benchmarks/bench_adaptive.py --live --model qwen2.5-coder:7b
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from adaptive_budget import AdaptivePolicy
+from mock_ollama import MockConfig, MockOllamaServer
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_policy(node_seq_gen, cases, hard, model, max_attempts, validation_threshold, adaptive, concurrency):
+    node_seq_gen.result_cache.clear()
+    prompts = [case['User Prompt'] for case in cases]
+    calls = [0] * len(cases)
+    passed = 0
+    stops = Counter()
+    for index, node_sequence, _, _, stats, _ in node_seq_gen.process_queries(
+        prompts, concurrency, max_attempts=max_attempts, validation_threshold=validation_threshold,
+        selected_model=model, silent=True, use_cache=False, return_stats=True, adaptive=adaptive
+    ):
+        calls[index] = stats.llm_calls
+        passed += index >= hard and node_sequence == cases[index]['Correct Output']
+        stops[stats.stop_reason or 'fixed'] += 1
+    return {
+        'accuracy': round(passed / (len(cases) - hard), 3),
+        'mean_llm_calls': round(sum(calls) / len(calls), 2),
+        'p95_llm_calls': percentile(calls, 0.95),
+        'max_llm_calls': max(calls),
+        'mean_llm_calls_hard': round(sum(calls[:hard]) / hard, 2) if hard else None,
+        'stops': dict(stops),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fixed vs adaptive retry/validation budgets')
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--hard', type=int, default=10, help='Test prompts the mock model never answers correctly')
+    parser.add_argument('--call-budget', type=int, default=6)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # Read the prompts directly: node_seq_gen may only be imported once OLLAMA_HOSTS is set
+    with open('test_prompts.json', 'r', encoding='utf-8') as f:
+        cases = json.load(f)[:args.max_tests]
+    # Live models have no designated hard prompts
+    hard = 0 if args.live else min(args.hard, len(cases))
+    server = None
+    if not args.live:
+        server = MockOllamaServer(config=MockConfig(
+            latency_ms=1, accuracy=0.8, valid_rate=0.9, false_accept_rate=0.2, models=[args.model],
+            hard_prompts=[case['User Prompt'] for case in cases[:hard]], seed=args.seed
+        )).start()
+        os.environ['OLLAMA_HOSTS'] = server.url
+    import node_seq_gen
+    policies = {
+        'fixed 3/3': (3, 3, None),
+        'fixed 10/5': (10, 5, None),
+        'adaptive 3/3': (3, 3, AdaptivePolicy()),
+        'adaptive 10/5': (10, 5, AdaptivePolicy()),
+        f'adaptive 10/5, budget {args.call_budget}': (10, 5, AdaptivePolicy(max_calls=args.call_budget)),
+    }
+    try:
+        report = {'queries': len(cases), 'hard': hard}
+        for name, (max_attempts, validation_threshold, adaptive) in policies.items():
+            report[name] = run_policy(node_seq_gen, cases, hard, args.model, max_attempts, validation_threshold, adaptive, args.concurrency)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
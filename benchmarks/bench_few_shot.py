@@ -0,0 +1,119 @@
+"""Compare the full system prompt with retrieval-based few-shot prompts.
+
+Offline it reports prompt size (estimated tokens), example lookup time and the
+leave-one-out accuracy of the nearest retrieved example on test_prompts.json.
+It also runs process_query with the full prompt and each k and reports the
+prompt tokens per call and pass rate, against the mock Ollama server (or
+OLLAMA_HOSTS with --live). The mock counts the prompt tokens it is sent but
+answers regardless of the examples in the prompt, so only --live measures
+what fewer examples cost in pass rate.
+
+    python benchmarks/bench_few_shot.py --k 3 5 8
+    python benchmarks/bench_few_shot.py --k 5 --live --model qwen2.5-coder:7b --max-tests 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockConfig, MockOllamaServer
+
+
+def estimate_tokens(messages):
+    # Rough token estimate (~4 characters per token), good for relative comparisons
+    return sum(len(message['content']) for message in messages) // 4
+
+
+def offline_report(node_seq_gen, test_cases, k):
+    """Prompt size, lookup latency and nearest-example accuracy for one k"""
+    example_index = node_seq_gen.example_index
+    tokens = []
+    for case in test_cases:
+        system_prompt = node_seq_gen.build_system_message(case['User Prompt'], k, exclude_exact=True)
+        tokens.append(estimate_tokens(node_seq_gen.build_generation_messages(case['User Prompt'], system_prompt)))
+
+    repeats = 20
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for case in test_cases:
+            example_index.search(case['User Prompt'], k, exclude_exact=True)
+    lookup_us = (time.perf_counter() - start) / (repeats * len(test_cases)) * 1e6
+
+    nearest_correct = sum(
+        1 for case in test_cases
+        if (example_index.search(case['User Prompt'], 1, exclude_exact=True) or [(0, '', None)])[0][2] == case['Correct Output']
+    )
+    return {
+        'k': k,
+        'mean_prompt_tokens': round(sum(tokens) / len(tokens), 1),
+        'lookup_us': round(lookup_us, 2),
+        'nearest_example_exact_match': round(nearest_correct / len(test_cases), 3),
+    }
+
+
+def pipeline_report(node_seq_gen, test_cases, k, args):
+    """Run process_query against the backend and collect prompt tokens and pass rate"""
+    passed = 0
+    prompt_tokens = 0
+    calls = 0
+    for case in test_cases:
+        node_sequence, _, _, stats = node_seq_gen.process_query(
+            case['User Prompt'], args.max_attempts, args.validation_threshold, args.model,
+            silent=True, use_cache=False, return_stats=True, few_shot_k=k, exclude_exact_examples=True
+        )
+        passed += node_sequence == case['Correct Output']
+        prompt_tokens += stats.total('prompt_eval_count')
+        calls += stats.llm_calls
+    return {
+        'k': k,
+        'pass_rate': round(passed / len(test_cases), 3),
+        'prompt_eval_tokens_per_call': round(prompt_tokens / calls, 1) if calls else None,
+        'llm_calls': calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full vs. few-shot system prompt benchmark')
+    parser.add_argument('--k', type=int, nargs='+', default=[3, 5, 8])
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--validation-threshold', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    server = None
+    if not args.live:
+        server = MockOllamaServer(config=MockConfig(
+            latency_ms=1, accuracy=0.8, valid_rate=0.9, false_accept_rate=0.2, models=[args.model], seed=args.seed
+        )).start()
+        os.environ['OLLAMA_HOSTS'] = server.url
+    # node_seq_gen reads OLLAMA_HOSTS on import
+    import node_seq_gen
+
+    test_cases = node_seq_gen.load_test_cases(max_tests=args.max_tests)
+    full_tokens = sum(
+        estimate_tokens(node_seq_gen.build_generation_messages(case['User Prompt'])) for case in test_cases
+    ) / len(test_cases)
+
+    report = {
+        'indexed_examples': len(node_seq_gen.example_index),
+        'full_prompt_tokens': round(full_tokens, 1),
+        'few_shot': [offline_report(node_seq_gen, test_cases, k) for k in args.k],
+    }
+    try:
+        report['pipeline'] = [pipeline_report(node_seq_gen, test_cases, k, args) for k in [0] + args.k]
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
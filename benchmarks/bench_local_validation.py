@@ -0,0 +1,150 @@
+"""Measure what the structural validator saves and what it costs in pass rate.
+
+The validator is built from the examples in the system message and every
+other test case of test_prompts.json, and evaluated on the rest:
+
+- offline: how often it accepts the correct sequence, how often it accepts
+  corrupted ones (a node substituted, dropped, inserted or two nodes
+  swapped) and microseconds per check
+- pipeline: process_query with local_validations=0 and with every slot local,
+  against the mock Ollama server (or OLLAMA_HOSTS with --live), reporting LLM
+  calls and validation calls per query and the pass rate
+
+    python benchmarks/bench_local_validation.py
+    python benchmarks/bench_local_validation.py --live --model qwen2.5-coder:7b
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from few_shot import parse_examples
+from mock_ollama import MockConfig, MockOllamaServer
+from node_registry import SORTED_NODE_NAMES
+from structural_validator import StructuralValidator
+
+
+def substitute(sequence, rng):
+    changed = list(sequence)
+    index = rng.randrange(len(changed))
+    changed[index] = rng.choice([name for name in SORTED_NODE_NAMES if name != changed[index]])
+    return changed
+
+
+def drop(sequence, rng):
+    changed = list(sequence)
+    del changed[rng.randrange(len(changed))]
+    return changed
+
+
+def insert(sequence, rng):
+    changed = list(sequence)
+    changed.insert(rng.randrange(len(changed) + 1), rng.choice(SORTED_NODE_NAMES))
+    return changed
+
+
+def swap(sequence, rng):
+    changed = list(sequence)
+    index = rng.randrange(len(changed) - 1)
+    changed[index], changed[index + 1] = changed[index + 1], changed[index]
+    return changed
+
+
+CORRUPTIONS = {'substitute': substitute, 'drop': drop, 'insert': insert, 'swap': swap}
+
+
+def offline_report(validator, cases, rng):
+    report = {'correct_accept_rate': round(sum(
+        validator.accepts(case['User Prompt'], case['Correct Output']) for case in cases
+    ) / len(cases), 3)}
+    for name, corrupt in CORRUPTIONS.items():
+        corrupted = []
+        for case in cases:
+            if len(case['Correct Output']) < 2:
+                continue
+            sequence = corrupt(case['Correct Output'], rng)
+            if sequence != case['Correct Output']:
+                corrupted.append((case['User Prompt'], sequence))
+        report[f'{name}_false_accept_rate'] = round(
+            sum(validator.accepts(prompt, sequence) for prompt, sequence in corrupted) / len(corrupted), 3
+        )
+
+    start = time.perf_counter()
+    for _ in range(20):
+        for case in cases:
+            validator.score(case['User Prompt'], case['Correct Output'])
+    report['us_per_check'] = round((time.perf_counter() - start) / (20 * len(cases)) * 1e6, 2)
+    return report
+
+
+def pipeline_report(node_seq_gen, validator, cases, args):
+    report = {}
+    with mock.patch.object(node_seq_gen, 'structural_validator', validator):
+        for local_validations in (0, args.validation_threshold):
+            node_seq_gen.result_cache.clear()
+            llm_calls = validation_calls = passed = 0
+            for case in cases:
+                node_sequence, _, _, stats = node_seq_gen.process_query(
+                    case['User Prompt'], args.max_attempts, args.validation_threshold, args.model,
+                    silent=True, use_cache=False, return_stats=True, local_validations=local_validations
+                )
+                llm_calls += stats.llm_calls
+                validation_calls += stats.validation_calls
+                passed += node_sequence == case['Correct Output']
+            report[f'local_validations={local_validations}'] = {
+                'llm_calls_per_query': round(llm_calls / len(cases), 2),
+                'validation_calls_per_query': round(validation_calls / len(cases), 2),
+                'pass_rate': round(passed / len(cases), 3),
+            }
+    baseline, local = report.values()
+    report['llm_calls_saved_per_query'] = round(baseline['llm_calls_per_query'] - local['llm_calls_per_query'], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Structural validator benchmark')
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--validation-threshold', type=int, default=3)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(root)
+    server = None
+    if not args.live:
+        server = MockOllamaServer(config=MockConfig(
+            latency_ms=1, accuracy=0.8, valid_rate=0.9, false_accept_rate=0.2, models=[args.model], seed=args.seed
+        )).start()
+        os.environ['OLLAMA_HOSTS'] = server.url
+    import node_seq_gen
+
+    cases = node_seq_gen.load_test_cases(max_tests=args.max_tests)
+    train, evaluation = cases[::2], cases[1::2]
+    validator = StructuralValidator(
+        parse_examples(node_seq_gen.system_message)
+        + [(case['User Prompt'], case['Correct Output']) for case in train]
+    )
+    try:
+        report = {
+            'train_cases': len(train),
+            'eval_cases': len(evaluation),
+            'offline': offline_report(validator, evaluation, random.Random(args.seed)),
+            'pipeline': pipeline_report(node_seq_gen, validator, evaluation, args),
+        }
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Compare the old response parser with the tolerant extractor on a response corpus.
+
+Builds a corpus from the correct outputs in test_prompts.json, rendered the
+ways models actually answer: plain JSON, the {"sequence": ...} object, code
+fences at the start or after some chatter, trailing explanations, Python list
+reprs, near-miss node names (casing, spaces, a "Node" suffix, a typo) and
+responses that contain no usable sequence at all. Reports for both parsers
+the share of responses that yield a sequence of valid node names, the share
+that yield the correct sequence and microseconds per response.
+
+    python benchmarks/bench_parser.py --max-tests 100 --repeat 20
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_seq_gen import load_test_cases, validate_node_names
+from response_parser import extract_sequence
+
+
+def legacy_parse(content):
+    """parse_llm_response before the tolerant extractor"""
+    try:
+        if content.startswith('```json'):
+            content = content.replace('```json', '', 1)
+            content = content.replace('```', '', 1)
+        elif content.startswith('```python'):
+            content = content.replace('```python', '', 1)
+            content = content.replace('```', '', 1)
+        elif content.startswith('```'):
+            content = content.replace('```', '', 1)
+            content = content.replace('```', '', 1)
+        content = content.strip()
+        try:
+            json_data = json.loads(content)
+            if isinstance(json_data, list):
+                return json_data
+            elif isinstance(json_data, dict) and 'sequence' in json_data:
+                return json_data['sequence']
+        except json.JSONDecodeError:
+            if content.startswith('[') and content.endswith(']'):
+                return ast.literal_eval(content)
+        raise ValueError("Invalid response format")
+    except Exception as e:
+        raise ValueError(f"Failed to parse response: {str(e)}")
+
+
+def tolerant_parse(content):
+    return extract_sequence(content)[0]
+
+
+def _with_name(sequence, rng, change):
+    changed = list(sequence)
+    index = rng.randrange(len(changed))
+    changed[index] = change(changed[index])
+    return changed
+
+
+def _typo(name, rng):
+    if len(name) < 7:
+        return name + "Node"
+    index = rng.randrange(1, len(name) - 1)
+    return name[:index] + name[index + 1:]
+
+
+VARIANTS = {
+    'json': lambda seq, rng: json.dumps(seq),
+    'object': lambda seq, rng: json.dumps({'sequence': seq}),
+    'fence': lambda seq, rng: f"```json\n{json.dumps(seq)}\n```",
+    'chatter_fence': lambda seq, rng: f"Here is the node sequence for your request:\n\n```json\n{json.dumps({'sequence': seq})}\n```\n\nIt covers every step.",
+    'trailing_chatter': lambda seq, rng: f"{json.dumps(seq)}\n\nExplanation: the first node [{seq[0]}] starts the flow.",
+    'python_list': lambda seq, rng: repr(list(seq)),
+    'case': lambda seq, rng: json.dumps(_with_name(seq, rng, lambda name: name[0].lower() + name[1:])),
+    'spaces': lambda seq, rng: json.dumps(_with_name(seq, rng, lambda name: re.sub(r'(?<!^)(?=[A-Z])', ' ', name))),
+    'node_suffix': lambda seq, rng: json.dumps(_with_name(seq, rng, lambda name: name + "Node")),
+    'typo': lambda seq, rng: json.dumps(_with_name(seq, rng, lambda name: _typo(name, rng))),
+    'no_sequence': lambda seq, rng: f"I think you should use {seq[0]} first and then {seq[-1]}.",
+    'truncated': lambda seq, rng: json.dumps({'sequence': seq})[:-3],
+}
+
+
+def build_corpus(test_cases, seed):
+    rng = random.Random(seed)
+    return [
+        (variant, render(case['Correct Output'], rng), case['Correct Output'])
+        for case in test_cases
+        for variant, render in VARIANTS.items()
+    ]
+
+
+def evaluate(parse, corpus, repeat):
+    valid = correct = 0
+    by_variant = {}
+    for variant, content, expected in corpus:
+        try:
+            sequence = parse(content)
+            ok = validate_node_names(sequence)[0]
+        except (ValueError, SyntaxError):
+            sequence, ok = None, False
+        valid += ok
+        correct += ok and sequence == expected
+        by_variant.setdefault(variant, []).append(ok)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, content, _ in corpus:
+            try:
+                parse(content)
+            except (ValueError, SyntaxError):
+                pass
+    elapsed = time.perf_counter() - start
+
+    return {
+        'parse_success_rate': round(valid / len(corpus), 3),
+        'correct_rate': round(correct / len(corpus), 3),
+        'us_per_response': round(elapsed / (repeat * len(corpus)) * 1e6, 2),
+        'success_by_variant': {variant: round(sum(oks) / len(oks), 3) for variant, oks in by_variant.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response parser benchmark on a synthetic corpus')
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    test_cases = load_test_cases(
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_prompts.json'),
+        max_tests=args.max_tests
+    )
+    corpus = build_corpus(test_cases, args.seed)
+    report = {
+        'responses': len(corpus),
+        'legacy': evaluate(legacy_parse, corpus, args.repeat),
+        'tolerant': evaluate(tolerant_parse, corpus, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
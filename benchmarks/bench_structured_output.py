@@ -0,0 +1,92 @@
+"""Compare retries with and without schema-constrained generation.
+
+Runs every prompt of test_prompts.json through process_query twice, once with
+free-text responses and once with structured_output=True, and reports how many
+attempts were wasted on parse failures or unknown nodes. By default it runs
+against the mock Ollama server, where --malformed-rate of the free-text and
+--structured-malformed-rate of the structured generations are malformed (the
+latter cut off before the array closes, which a schema cannot rule out); with
+--live against OLLAMA_HOSTS / OLLAMA_HOST.
+
+    python benchmarks/bench_structured_output.py
+    python benchmarks/bench_structured_output.py --live --model qwen2.5-coder:7b --max-tests 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockConfig, MockOllamaServer
+
+
+def run_mode(process_query, test_cases, model, max_attempts, validation_threshold, structured_output):
+    """Run all test cases in one mode and count attempts and wasted retries"""
+    totals = {'attempts': 0, 'parse_failures': 0, 'invalid_nodes': 0, 'passed': 0, 'seconds': 0.0}
+    for case in test_cases:
+        start = time.time()
+        node_sequence, was_validated, debug_output = process_query(
+            case['User Prompt'],
+            max_attempts=max_attempts,
+            validation_threshold=validation_threshold,
+            selected_model=model,
+            silent=False,
+            use_cache=False,
+            structured_output=structured_output
+        )
+        totals['seconds'] += time.time() - start
+        for line in debug_output.splitlines():
+            if 'Attempt ' in line:
+                totals['attempts'] += 1
+            elif 'Error in attempt' in line:
+                totals['parse_failures'] += 1
+            elif 'Invalid nodes in sequence' in line:
+                totals['invalid_nodes'] += 1
+        if node_sequence == case['Correct Output']:
+            totals['passed'] += 1
+    totals['wasted_retries'] = totals['parse_failures'] + totals['invalid_nodes']
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--validation-threshold', type=int, default=3)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--malformed-rate', type=float, default=0.2)
+    parser.add_argument('--structured-malformed-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    server = None
+    if not args.live:
+        server = MockOllamaServer(config=MockConfig(
+            latency_ms=1, accuracy=0.8, valid_rate=0.9, false_accept_rate=0.2, malformed_rate=args.malformed_rate,
+            structured_malformed_rate=args.structured_malformed_rate, models=[args.model], seed=args.seed
+        )).start()
+        os.environ['OLLAMA_HOSTS'] = server.url
+    # node_seq_gen reads OLLAMA_HOSTS on import
+    from node_seq_gen import load_test_cases, process_query
+
+    test_cases = load_test_cases(max_tests=args.max_tests)
+    report = {}
+    try:
+        for name, structured_output in (('free_text', False), ('structured', True)):
+            report[name] = run_mode(
+                process_query, test_cases, args.model, args.max_attempts, args.validation_threshold, structured_output
+            )
+    finally:
+        if server is not None:
+            server.stop()
+    report['retries_saved'] = report['free_text']['wasted_retries'] - report['structured']['wasted_retries']
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Compare the old full-prompt validation call with the dedicated judge prompt.
+
+It reports the estimated prompt size of both, then sends both validation
+calls for every test case, once with the correct sequence and once with a
+corrupted one, and reports the prompt and output tokens, milliseconds per
+call and how often the two verdicts agree. The calls go to the mock Ollama
+server, which counts the tokens it is sent but ignores the output cap and
+gives the same verdicts whatever the prompt, or with --live to OLLAMA_HOSTS;
+only --live compares output tokens and verdicts of the two prompts.
+
+    python benchmarks/bench_validation.py
+    python benchmarks/bench_validation.py --live --model qwen2.5-coder:7b --max-tests 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import QueryStats, current_query_stats
+from mock_ollama import MockConfig, MockOllamaServer
+from node_registry import SORTED_NODE_NAMES
+
+# The validation prompt before the dedicated judge prompt: the full generation
+# system message and the instructions in the user message, uncapped output
+LEGACY_VALIDATION_INSTRUCTIONS = """Evaluate if the generated node sequence below correctly fulfills the user's request.
+Return ONLY a JSON object with a single "valid" boolean key.
+Example: {"valid": true}
+"""
+
+
+def build_legacy_validation_messages(system_message, user_query, node_sequence):
+    user_message = (
+        f"{LEGACY_VALIDATION_INSTRUCTIONS}\n"
+        f"Original User Request: \"{user_query}\"\n"
+        f"Generated Node Sequence: {json.dumps(list(node_sequence))}\n"
+    )
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def estimate_tokens(messages):
+    # Rough token estimate (~4 characters per token), good for relative comparisons
+    return sum(len(message['content']) for message in messages) // 4
+
+
+def corrupt(sequence, rng):
+    """Replace one node of the sequence with a different random node"""
+    corrupted = list(sequence)
+    index = rng.randrange(len(corrupted))
+    corrupted[index] = rng.choice([name for name in SORTED_NODE_NAMES if name != corrupted[index]])
+    return corrupted
+
+
+async def timed_verdict(node_seq_gen, model, messages, **kwargs):
+    """Run one validation call, returning (verdict, call record)"""
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        response = await node_seq_gen.chat_async(model, messages, kind='validation', **kwargs)
+        verdict = node_seq_gen.parse_validation_response(response['message']['content'])
+    except Exception:
+        verdict = False
+    finally:
+        current_query_stats.reset(token)
+    return verdict, stats.calls[-1]
+
+
+def summarize(calls):
+    count = len(calls) or 1
+    return {
+        'prompt_eval_tokens_per_call': round(sum(call['prompt_eval_count'] or 0 for call in calls) / count, 1),
+        'eval_tokens_per_call': round(sum(call['eval_count'] or 0 for call in calls) / count, 2),
+        'ms_per_call': round(sum(call['latency_s'] for call in calls) / count * 1000, 1),
+    }
+
+
+async def calls_report(node_seq_gen, test_cases, args):
+    rng = random.Random(args.seed)
+    legacy_calls, judge_calls = [], []
+    agreements = 0
+    correct_legacy = correct_judge = 0
+    checks = 0
+    for case in test_cases:
+        expected = case['Correct Output']
+        for sequence, truth in ((expected, True), (corrupt(expected, rng), False)):
+            legacy, legacy_call = await timed_verdict(
+                node_seq_gen, args.model,
+                build_legacy_validation_messages(node_seq_gen.system_message, case['User Prompt'], sequence)
+            )
+            judge, judge_call = await timed_verdict(
+                node_seq_gen, args.model, node_seq_gen.build_validation_messages(case['User Prompt'], sequence),
+                format='json', options=node_seq_gen.validation_options
+            )
+            legacy_calls.append(legacy_call)
+            judge_calls.append(judge_call)
+            agreements += legacy == judge
+            correct_legacy += legacy == truth
+            correct_judge += judge == truth
+            checks += 1
+    return {
+        'checks': checks,
+        'legacy': dict(summarize(legacy_calls), accuracy=round(correct_legacy / checks, 3)),
+        'judge': dict(summarize(judge_calls), accuracy=round(correct_judge / checks, 3)),
+        'agreement_rate': round(agreements / checks, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-prompt vs. dedicated validation prompt benchmark')
+    parser.add_argument('--max-tests', type=int, default=100)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    server = None
+    if not args.live:
+        server = MockOllamaServer(config=MockConfig(
+            latency_ms=1, valid_rate=0.9, false_accept_rate=0.2, models=[args.model], seed=args.seed
+        )).start()
+        os.environ['OLLAMA_HOSTS'] = server.url
+    # node_seq_gen reads OLLAMA_HOSTS on import
+    import node_seq_gen
+
+    test_cases = node_seq_gen.load_test_cases(max_tests=args.max_tests)
+    report = {
+        'legacy_prompt_tokens': round(sum(
+            estimate_tokens(build_legacy_validation_messages(
+                node_seq_gen.system_message, case['User Prompt'], case['Correct Output']
+            ))
+            for case in test_cases
+        ) / len(test_cases), 1),
+        'judge_prompt_tokens': round(sum(
+            estimate_tokens(node_seq_gen.build_validation_messages(case['User Prompt'], case['Correct Output']))
+            for case in test_cases
+        ) / len(test_cases), 1),
+    }
+    try:
+        report['calls'] = asyncio.run(calls_report(node_seq_gen, test_cases, args))
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
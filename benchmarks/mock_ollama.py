@@ -0,0 +1,392 @@
+"""Mock Ollama HTTP server for offline benchmarks and tests.
+
+Implements the parts of the Ollama API the pipeline uses (/api/chat with and
+without streaming, /api/generate, /api/tags, /api/ps, /api/version). Generation
+requests are answered from the known correct outputs in test_prompts.json with
+a configurable accuracy; validation requests return a verdict. Latency
+distribution, HTTP failure rate, malformed-response rate (free text, and
+structured output cut off before the array closes) and the number of chat
+requests served at once are configurable.
+
+    python benchmarks/mock_ollama.py --port 11435 --latency-ms 200 --failure-rate 0.05
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_registry import SORTED_NODE_NAMES
+from result_cache import normalize_prompt
+
+DEFAULT_PROMPTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_prompts.json')
+
+MALFORMED_RESPONSES = [
+    "Sure! Here is the sequence you asked for.",
+    '["OnClick", "FetchDataNode", "DisplayModal"]',
+    '{"sequence": ["Fetch Data", "Show"',
+    "I think you should fetch the data first and then show it.",
+]
+
+
+def load_canned_answers(prompts_file=DEFAULT_PROMPTS_FILE):
+    """Map normalized test prompts to their correct outputs"""
+    try:
+        with open(prompts_file, 'r', encoding='utf-8') as f:
+            test_cases = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {normalize_prompt(case['User Prompt']): case['Correct Output'] for case in test_cases}
+
+
+class MockConfig:
+    """Behavior knobs of the mock server"""
+
+    def __init__(self, latency_ms=50.0, latency_sigma=0.0, failure_rate=0.0, malformed_rate=0.0,
+                 structured_malformed_rate=0.0, accuracy=0.8, valid_rate=0.9, false_accept_rate=0.2, load_ms=0.0,
+                 models=('qwen2.5-coder:7b',), num_parallel=None, hard_prompts=(), seed=None):
+        self.latency_ms = latency_ms
+        # Sigma of a lognormal multiplier around latency_ms; 0 means fixed latency
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        # Schema-constrained generations cut off inside the array, as when they run into num_predict
+        self.structured_malformed_rate = structured_malformed_rate
+        self.accuracy = accuracy
+        self.valid_rate = valid_rate
+        self.false_accept_rate = false_accept_rate
+        # Simulated cold model load, paid once per model until it is "resident"
+        self.load_ms = load_ms
+        self.models = list(models)
+        # Chat requests served at once, like OLLAMA_NUM_PARALLEL on a GPU box; None is unlimited
+        self.num_parallel = num_parallel
+        # Known prompts the model never answers correctly; a sorted tuple so vars(config) dumps to JSON
+        self.hard_prompts = tuple(sorted({normalize_prompt(prompt) for prompt in hard_prompts}))
+        self.rng = random.Random(seed)
+
+
+class MockState:
+    """Request counters shared by the handler threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_models = set()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {
+                'chat': 0, 'generation': 0, 'validation': 0, 'stream': 0,
+                'generate': 0, 'failures': 0, 'malformed': 0,
+                'prompt_eval_tokens': 0, 'eval_tokens': 0,
+            }
+
+    def add(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.counts[key] = self.counts.get(key, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _tokens(text):
+    # Rough token estimate, good enough for relative comparisons
+    return max(1, len(text) // 4)
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle + delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _latency(self):
+        config = self.config
+        with self.state.lock:
+            multiplier = math.exp(config.rng.gauss(0, config.latency_sigma)) if config.latency_sigma else 1.0
+        return config.latency_ms * multiplier / 1000.0
+
+    def _load_seconds(self, model):
+        with self.state.lock:
+            if model in self.state.loaded_models or not self.config.load_ms:
+                self.state.loaded_models.add(model)
+                return 0.0
+            self.state.loaded_models.add(model)
+        return self.config.load_ms / 1000.0
+
+    def _roll(self, probability):
+        with self.state.lock:
+            return self.config.rng.random() < probability
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json(200, {'models': [
+                {'name': model, 'model': model, 'modified_at': _now(), 'size': 0, 'digest': model}
+                for model in self.config.models
+            ]})
+        elif self.path == '/api/ps':
+            with self.state.lock:
+                loaded = sorted(self.state.loaded_models)
+            self._send_json(200, {'models': [{'name': model, 'model': model} for model in loaded]})
+        elif self.path == '/api/version':
+            self._send_json(200, {'version': '0.0.0-mock'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json(400, {'error': 'invalid json'})
+            return
+
+        model = request.get('model', '')
+        if model not in self.config.models:
+            self._send_json(404, {'error': f"model '{model}' not found"})
+            return
+
+        if self.path == '/api/generate':
+            self.state.add(generate=1)
+            load_seconds = self._load_seconds(model)
+            time.sleep(load_seconds)
+            self._send_json(200, {
+                'model': model, 'created_at': _now(), 'response': '', 'done': True,
+                'done_reason': 'load', 'load_duration': int(load_seconds * 1e9),
+                'total_duration': int(load_seconds * 1e9),
+            })
+        elif self.path == '/api/chat':
+            with self.server.slots or contextlib.nullcontext():
+                self._handle_chat(request, model)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _handle_chat(self, request, model):
+        messages = request.get('messages', [])
+        user_content = messages[-1]['content'] if messages else ''
+        prompt_text = ''.join(message.get('content', '') for message in messages)
+        is_validation = 'Generated Node Sequence:' in user_content
+        structured = bool(request.get('format'))
+        stream = request.get('stream', False)
+
+        self.state.add(chat=1, validation=int(is_validation), generation=int(not is_validation), stream=int(bool(stream)))
+
+        load_seconds = self._load_seconds(model)
+        latency = self._latency()
+        if self._roll(self.config.failure_rate):
+            time.sleep(latency / 2)
+            self.state.add(failures=1)
+            self._send_json(500, {'error': 'mock backend failure'})
+            return
+
+        if is_validation:
+            content = self._validation_content(user_content)
+        else:
+            content = self._generation_content(user_content, structured)
+
+        prompt_tokens = _tokens(prompt_text)
+        eval_tokens = _tokens(content)
+        self.state.add(prompt_eval_tokens=prompt_tokens, eval_tokens=eval_tokens)
+        stats = {
+            'done': True,
+            'done_reason': 'stop',
+            'total_duration': int((latency + load_seconds) * 1e9),
+            'load_duration': int(load_seconds * 1e9),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(latency * 0.3 * 1e9),
+            'eval_count': eval_tokens,
+            'eval_duration': int(latency * 0.7 * 1e9),
+        }
+
+        if not stream:
+            time.sleep(latency + load_seconds)
+            self._send_json(200, dict(
+                model=model, created_at=_now(), message={'role': 'assistant', 'content': content}, **stats
+            ))
+            return
+
+        chunks = [content[i:i + 6] for i in range(0, len(content), 6)] or ['']
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(load_seconds)
+        try:
+            for chunk in chunks:
+                time.sleep(latency / len(chunks))
+                self._write_chunk({'model': model, 'created_at': _now(),
+                                   'message': {'role': 'assistant', 'content': chunk}, 'done': False})
+            self._write_chunk(dict(model=model, created_at=_now(),
+                                   message={'role': 'assistant', 'content': ''}, **stats))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client aborted the stream early
+            self.close_connection = True
+
+    def _write_chunk(self, body):
+        line = (json.dumps(body) + '\n').encode('utf-8')
+        self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b'\r\n')
+        self.wfile.flush()
+
+    def _expected(self, text):
+        return self.server.canned.get(normalize_prompt(text))
+
+    def _generation_content(self, user_content, structured):
+        match = re.search(r'User request: (.*)', user_content, re.S)
+        query = match.group(1).strip() if match else user_content
+        expected = self._expected(query)
+        accuracy = 0.0 if normalize_prompt(query) in self.config.hard_prompts else self.config.accuracy
+
+        if not structured and self._roll(self.config.malformed_rate):
+            self.state.add(malformed=1)
+            with self.state.lock:
+                return self.config.rng.choice(MALFORMED_RESPONSES)
+
+        with self.state.lock:
+            rng = self.config.rng
+            if expected and rng.random() < accuracy:
+                sequence = list(expected)
+            elif expected:
+                sequence = list(expected)
+                sequence[rng.randrange(len(sequence))] = rng.choice(SORTED_NODE_NAMES)
+            else:
+                sequence = rng.sample(SORTED_NODE_NAMES, rng.randint(2, 4))
+        content = json.dumps({'sequence': sequence})
+
+        # The schema constrains which tokens come next, not that the output ends
+        if structured and self._roll(self.config.structured_malformed_rate):
+            self.state.add(malformed=1)
+            with self.state.lock:
+                return content[:self.config.rng.randrange(len('{"sequence": ['), len(content) - 1)]
+        return content
+
+    def _validation_content(self, user_content):
+        query_match = re.search(r'Original User Request: "(.*)"', user_content)
+        sequence_match = re.search(r'Generated Node Sequence: (\[.*?\])', user_content)
+        expected = self._expected(query_match.group(1)) if query_match else None
+        try:
+            sequence = json.loads(sequence_match.group(1)) if sequence_match else None
+        except ValueError:
+            sequence = None
+
+        correct = expected is None or sequence == expected
+        valid = self._roll(self.config.valid_rate if correct else self.config.false_accept_rate)
+        return json.dumps({'valid': valid})
+
+
+class MockOllamaServer:
+    """Run the mock Ollama API on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None, prompts_file=DEFAULT_PROMPTS_FILE):
+        self.httpd = ThreadingHTTPServer((host, port), MockOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or MockConfig()
+        self.httpd.state = MockState()
+        self.httpd.canned = load_canned_answers(prompts_file)
+        num_parallel = self.httpd.config.num_parallel
+        self.httpd.slots = threading.BoundedSemaphore(num_parallel) if num_parallel else None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-ollama', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Ollama API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--structured-malformed-rate', type=float, default=0.0)
+    parser.add_argument('--accuracy', type=float, default=0.8)
+    parser.add_argument('--valid-rate', type=float, default=0.9)
+    parser.add_argument('--load-ms', type=float, default=0.0)
+    parser.add_argument('--model', action='append', dest='models')
+    parser.add_argument('--num-parallel', type=int)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        failure_rate=args.failure_rate, malformed_rate=args.malformed_rate,
+        structured_malformed_rate=args.structured_malformed_rate, accuracy=args.accuracy, valid_rate=args.valid_rate, load_ms=args.load_ms,
+        models=args.models or ('qwen2.5-coder:7b',), num_parallel=args.num_parallel, seed=args.seed
+    )
+    server = MockOllamaServer(args.host, args.port, config)
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
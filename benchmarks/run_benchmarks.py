@@ -0,0 +1,230 @@
+"""Offline benchmark suite against the mock Ollama server.
+
+Exercises process_query, run_tests and the Gradio handler at several
+concurrency levels and reports throughput, p50/p95/p99 latency, LLM calls per
+query and the retry/validation breakdown. Results are written as JSON so they
+can be compared across commits. With --hosts N the requests are spread over N
+mock servers, each serving --num-parallel chat requests at once, to measure how
+throughput scales with the backend pool.
+
+    python benchmarks/run_benchmarks.py --queries 50 --concurrency 1 4 16 --output bench.json
+    python benchmarks/run_benchmarks.py --hosts 4 --num-parallel 2 --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockConfig, MockOllamaServer
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(name, concurrency, latencies, elapsed, outcomes, counts):
+    """Build one result record from timings, query outcomes and mock server counters"""
+    queries = len(outcomes)
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'queries': queries,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_qps': round(queries / elapsed, 3) if elapsed else None,
+        'latency_ms': {
+            'p50': _ms(percentile(latencies, 50)),
+            'p95': _ms(percentile(latencies, 95)),
+            'p99': _ms(percentile(latencies, 99)),
+        },
+        'llm_calls_per_query': round(counts['chat'] / queries, 3) if queries else None,
+        'generation_calls': counts['generation'],
+        'validation_calls': counts['validation'],
+        'retries': max(0, counts['generation'] - queries),
+        'backend_failures': counts['failures'],
+        'malformed_responses': counts['malformed'],
+        'validated': sum(1 for outcome in outcomes if outcome.get('validated')),
+        'correct': sum(1 for outcome in outcomes if outcome.get('correct')),
+        'prompt_eval_tokens': counts['prompt_eval_tokens'],
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def bench_process_query(node_seq_gen, test_cases, concurrency, args):
+    """Time process_query_async calls interleaved on one event loop"""
+    latencies = []
+    outcomes = []
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(case):
+            async with semaphore:
+                start = time.perf_counter()
+                node_sequence, was_validated, _ = await node_seq_gen.process_query_async(
+                    case['User Prompt'], args.max_attempts, args.validation_threshold,
+                    args.model, silent=True, use_cache=False
+                )
+                latencies.append(time.perf_counter() - start)
+                outcomes.append({'validated': was_validated, 'correct': node_sequence == case['Correct Output']})
+
+        await asyncio.gather(*[run_one(case) for case in test_cases])
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    return latencies, outcomes, time.perf_counter() - start
+
+
+def bench_run_tests(node_seq_gen, test_cases, concurrency, args):
+    """Time a full run_tests pass writing to a temporary CSV"""
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        output_file = os.path.join(tmp, 'results.csv')
+        node_seq_gen.run_tests(test_cases, args.model, concurrency=concurrency, output_file=output_file)
+        elapsed = time.perf_counter() - start
+        # run_tests only keeps totals; the per-test outcomes are in its CSV
+        with open(output_file, 'r', newline='', encoding='utf-8') as f:
+            outcomes = [
+                {'validated': result.get('validated'), 'correct': result.get('passed')}
+                for result in map(node_seq_gen._parse_result_row, csv.DictReader(f))
+            ]
+    # run_tests does not expose per-test timings, so only throughput is reported
+    return [], outcomes, elapsed
+
+
+def bench_gradio(gradio_app, test_cases, concurrency, args):
+    """Time the async Gradio generate_sequence handler with `concurrency` requests in flight"""
+    latencies = []
+    outcomes = []
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(case):
+            async with semaphore:
+                start = time.perf_counter()
+                output = await gradio_app.generate_sequence(case['User Prompt'], args.max_attempts, args.validation_threshold)
+                latencies.append(time.perf_counter() - start)
+                outcomes.append({
+                    'validated': output.startswith("✅"),
+                    'correct': output.endswith("\n".join(case['Correct Output'])),
+                })
+
+        await asyncio.gather(*[run_one(case) for case in test_cases])
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    return latencies, outcomes, time.perf_counter() - start
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a mock Ollama server')
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--scenarios', nargs='+', default=['process_query', 'run_tests', 'gradio'])
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--validation-threshold', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--malformed-rate', type=float, default=0.1)
+    parser.add_argument('--accuracy', type=float, default=0.8)
+    parser.add_argument('--valid-rate', type=float, default=0.9)
+    parser.add_argument('--hosts', type=int, default=1)
+    parser.add_argument('--num-parallel', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    # The modules under test read test_prompts.json relative to the repo root
+    output_path = os.path.abspath(args.output)
+    os.chdir(ROOT)
+
+    config = MockConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        failure_rate=args.failure_rate, malformed_rate=args.malformed_rate,
+        accuracy=args.accuracy, valid_rate=args.valid_rate,
+        models=[args.model], num_parallel=args.num_parallel, seed=args.seed
+    )
+
+    with contextlib.ExitStack() as stack:
+        servers = [stack.enter_context(MockOllamaServer(config=config)) for _ in range(args.hosts)]
+        os.environ['OLLAMA_HOSTS'] = ','.join(server.url for server in servers)
+        os.environ['OLLAMA_MAX_IN_FLIGHT'] = str(args.num_parallel or max(args.concurrency) * max(1, args.validation_threshold))
+        import node_seq_gen
+
+        test_cases = node_seq_gen.load_test_cases(max_tests=args.queries)
+        runners = {
+            'process_query': lambda n: bench_process_query(node_seq_gen, test_cases, n, args),
+            'run_tests': lambda n: bench_run_tests(node_seq_gen, test_cases, n, args),
+        }
+        if 'gradio' in args.scenarios:
+            try:
+                import gradio_app
+                runners['gradio'] = lambda n: bench_gradio(gradio_app, test_cases, n, args)
+            except ImportError as e:
+                print(f"Skipping gradio scenario: {e}", file=sys.stderr)
+
+        records = []
+        for scenario in args.scenarios:
+            if scenario not in runners:
+                continue
+            for concurrency in args.concurrency:
+                node_seq_gen.result_cache.clear()
+                for server in servers:
+                    server.state.reset()
+                latencies, outcomes, elapsed = runners[scenario](concurrency)
+                counts = {}
+                for server in servers:
+                    for key, value in server.state.snapshot().items():
+                        counts[key] = counts.get(key, 0) + value
+                record = summarize(scenario, concurrency, latencies, elapsed, outcomes, counts)
+                records.append(record)
+                print(
+                    f"{scenario:>14} c={concurrency:<3} {record['throughput_qps']:>8} q/s  "
+                    f"p50={record['latency_ms']['p50']}ms p95={record['latency_ms']['p95']}ms "
+                    f"p99={record['latency_ms']['p99']}ms  calls/query={record['llm_calls_per_query']}"
+                )
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'mock_config': {key: value for key, value in vars(config).items() if key != 'rng'},
+        'settings': {'queries': args.queries, 'max_attempts': args.max_attempts,
+                     'validation_threshold': args.validation_threshold, 'hosts': args.hosts},
+        'results': records,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+KEY_LENGTH = 32
+# Response fields kept in the cassette; durations are dropped since replay has no latency
+RESPONSE_FIELDS = ('model', 'done_reason', 'prompt_eval_count', 'eval_count')
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+def request_key(model, messages, options):
+    """Stable hash of a chat request; options are the chat kwargs except keep_alive"""
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'options': {k: v for k, v in options.items() if k != 'keep_alive'}},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:KEY_LENGTH]
+
+
+def _compact_response(response):
+    compact = {'message': {'role': 'assistant', 'content': response['message']['content']}}
+    for field in RESPONSE_FIELDS:
+        try:
+            value = response[field]
+        except (KeyError, TypeError):
+            continue
+        if value is not None:
+            compact[field] = value
+    return compact
+
+
+class Cassette:
+    """Append-only record of LLM chat requests and their responses.
+
+    Each line is the request key, a tab and the compact JSON response. In
+    'record' mode every answered request is appended (and flushed) as it
+    completes. In 'replay' mode the file is memory-mapped and indexed by key
+    once; responses are decoded on demand. A request sent several times (retry
+    attempts, repeated validations) gets the recorded responses in recording
+    order, starting over when they run out, so a replayed run makes the same
+    decisions as the recorded one without touching the network.
+    """
+
+    def __init__(self, path, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self._index = {}
+        self._plays = {}
+        if mode == 'record':
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._load_index()
+
+    def _load_index(self):
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._mmap
+        offset = 0
+        while offset < len(data):
+            end = data.find(b'\n', offset)
+            if end == -1:
+                end = len(data)
+            # A line cut short by an interrupted recording has no tab; skip it
+            if data[offset + KEY_LENGTH:offset + KEY_LENGTH + 1] == b'\t':
+                key = data[offset:offset + KEY_LENGTH].decode('ascii')
+                self._index.setdefault(key, []).append((offset + KEY_LENGTH + 1, end))
+            offset = end + 1
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._index.values())
+
+    def record(self, model, messages, options, response):
+        line = request_key(model, messages, options) + '\t' + json.dumps(
+            _compact_response(response), separators=(',', ':'), ensure_ascii=False
+        ) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def play(self, model, messages, options):
+        """Returns the next recorded response for the request; raises CassetteMiss if there is none"""
+        key = request_key(model, messages, options)
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded response for {model} request {key} in {self.path}")
+            count = self._plays.get(key, 0)
+            self._plays[key] = count + 1
+            start, end = entries[count % len(entries)]
+            return json.loads(self._mmap[start:end].decode('utf-8'))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
@@ -0,0 +1,100 @@
+import hashlib
+import json
+
+CHUNK_SIZE = 1 << 16
+REQUIRED_FIELDS = ('User Prompt', 'Correct Output')
+
+
+def parse_shard(spec):
+    """Parse 'i/n' (1 <= i <= n) into a zero-based (index, count) pair"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected i/n such as 1/4")
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}': i must be between 1 and n")
+    return index - 1, count
+
+
+def _iter_json_array(f):
+    """Yield the elements of a top-level JSON array, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    opened = False
+    while True:
+        # Skip whitespace and separators, then decode the next element once it is complete
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not opened and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError("Expected a JSON array or JSON lines")
+            opened = True
+            position += 1
+            continue
+        if opened and position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield element
+                position = end
+                continue
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = f.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _iter_json_lines(f):
+    for line_number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+
+def _sampled(seed, index, rate):
+    """Deterministic coin flip per case, independent of sharding and of other cases"""
+    digest = hashlib.blake2b(f"{seed}:{index}".encode('ascii'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64 < rate
+
+
+def iter_test_cases(path, shard=None, sample_rate=None, seed=0, max_tests=0):
+    """Yield test cases from a JSON array or JSON lines file without loading it whole.
+
+    The format is detected from the first character. With shard=(i, n) only
+    the cases whose position in the file is i modulo n are yielded, so n
+    machines reading the same file evaluate disjoint slices that together
+    cover it. With sample_rate each case is kept with that probability,
+    decided by a hash of seed and its position: the same seed selects the
+    same cases however the file is sharded. max_tests > 0 stops after that
+    many cases. Raises ValueError on malformed input.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        cases = _iter_json_array(f) if first == '[' else _iter_json_lines(f)
+
+        yielded = 0
+        for index, case in enumerate(cases):
+            if shard is not None and index % shard[1] != shard[0]:
+                continue
+            if sample_rate is not None and not _sampled(seed, index, sample_rate):
+                continue
+            if not isinstance(case, dict) or any(field not in case for field in REQUIRED_FIELDS):
+                raise ValueError(f"Test case {index} needs the fields {', '.join(REQUIRED_FIELDS)}")
+            yield case
+            yielded += 1
+            if max_tests > 0 and yielded >= max_tests:
+                return
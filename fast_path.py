@@ -0,0 +1,191 @@
+import json
+import re
+import threading
+from collections import defaultdict
+
+from few_shot import TOKEN_PATTERN, ExampleIndex
+from node_registry import KEYWORD_RULES, category_of, is_node
+from result_cache import normalize_prompt
+
+# Splits a prompt into its steps ("fetch data, sort it and then show it")
+CLAUSE_PATTERN = re.compile(r"[,;.]|\b(?:then|and|if|else|otherwise|when|after)\b")
+# Words and clause punctuation, for rule_sequence
+RULE_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[,;.]")
+# Words that start a new clause; the trigger words make it a condition of what came before
+CLAUSE_WORDS = frozenset(('then', 'and', 'else', 'otherwise'))
+TRIGGER_WORDS = frozenset(('if', 'when', 'whenever', 'after', 'every', 'once', 'upon'))
+
+# Neighbours consulted for the vote
+NEIGHBOURS = 5
+# Confidence of a keyword-rule sequence whose every step matched exactly one node;
+# without agreeing neighbours it is also kept below the classifier's threshold
+RULE_CONFIDENCE = 0.9
+# Raised when neighbours and rules agree, scaled down when they do not
+AGREEMENT_BONUS = 0.1
+DISAGREEMENT_FACTOR = 0.9
+
+# Keyword rules grouped by their first word, so matching only scans candidate phrases
+_RULES_BY_FIRST_WORD = defaultdict(list)
+for _phrase, _node in KEYWORD_RULES:
+    _words = tuple(_phrase.split())
+    _RULES_BY_FIRST_WORD[_words[0]].append((_words, _node))
+
+
+def _rule_clauses(prompt):
+    """Keyword-rule matches per clause, as (is_trigger_clause, [(node, leads_clause)]) in prompt order.
+
+    At each position the longest matching phrase wins. leads_clause is True
+    for a match on the clause's first word after its connective ("then wait
+    2 seconds"), where a node names a new step rather than referring back.
+    """
+    words = RULE_TOKEN_PATTERN.findall(prompt.lower())
+    clauses = [(False, [])]
+    lead = 0
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in ',;.':
+            clauses.append((False, []))
+            lead = i + 1
+            i += 1
+            continue
+        if word in CLAUSE_WORDS or word in TRIGGER_WORDS:
+            clauses.append((word in TRIGGER_WORDS, []))
+            lead = i + 1
+        for phrase, node in _RULES_BY_FIRST_WORD.get(word, ()):
+            if tuple(words[i:i + len(phrase)]) == phrase:
+                clauses[-1][1].append((node, i == lead))
+                i += len(phrase)
+                break
+        else:
+            i += 1
+    return [clause for clause in clauses if clause[1]]
+
+
+def rule_sequence(prompt):
+    """Node sequence from the registry keyword rules, in execution order.
+
+    Nodes follow the prompt's order, except that a trailing trigger clause
+    made only of events ("... when the button is clicked", "... after a
+    delay") runs before everything mentioned ahead of it. A node already in
+    the sequence is a reference back ("...then show the sorted list") and is
+    dropped, unless it leads its clause ("wait 2 seconds, beep, then wait
+    again").
+    """
+    sequence = []
+    for trigger, matches in _rule_clauses(prompt):
+        steps = []
+        for node, leads_clause in matches:
+            if leads_clause or (node not in sequence and node not in steps):
+                steps.append(node)
+        if not steps:
+            continue
+        if trigger and sequence and all(category_of(node) == 'Event' for node in steps):
+            sequence = steps + sequence
+        else:
+            sequence.extend(steps)
+    return sequence
+
+
+def split_clauses(prompt):
+    """The prompt's steps: lowercase clauses of more than one word"""
+    return [clause for clause in CLAUSE_PATTERN.split(prompt.lower()) if len(clause.split()) > 1]
+
+
+def rule_coverage(prompt):
+    """Fraction of the prompt's steps that the keyword rules map to exactly one node"""
+    clauses = split_clauses(prompt)
+    if not clauses:
+        return 0.0
+    score = 0.0
+    for clause in clauses:
+        matched = len(rule_sequence(clause))
+        score += 1.0 if matched == 1 else 0.5 if matched > 1 else 0.0
+    return score / len(clauses)
+
+
+class FastPathClassifier:
+    """Local nearest-neighbour classifier that answers confident queries without the LLM.
+
+    Two predictors are combined: the registry keyword rules, trusted in
+    proportion to how many of the prompt's steps they explain, and a vote of
+    the nearest known (prompt, sequence) pairs in a TF-IDF index. Agreement
+    raises the confidence. Validated LLM results can be fed back with
+    learn(); with a db_path they are appended there and reloaded on start.
+    """
+
+    def __init__(self, examples=(), threshold=0.9, db_path=None):
+        self.threshold = threshold
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._examples = {}
+        for prompt, sequence in list(examples) + self._load_learned():
+            self._examples[normalize_prompt(prompt)] = (prompt, list(sequence))
+        self._index = None
+
+    def _load_learned(self):
+        if not self.db_path:
+            return []
+        try:
+            with open(self.db_path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+        return [(record['prompt'], record['sequence']) for record in records]
+
+    def __len__(self):
+        return len(self._examples)
+
+    def learn(self, prompt, sequence):
+        """Add a validated (prompt, sequence) pair; the index is rebuilt on the next predict"""
+        if not sequence or not all(is_node(node) for node in sequence):
+            return
+        key = normalize_prompt(prompt)
+        with self._lock:
+            if self._examples.get(key, (None, None))[1] == list(sequence):
+                return
+            self._examples[key] = (prompt, list(sequence))
+            self._index = None
+            if self.db_path:
+                with open(self.db_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'prompt': prompt, 'sequence': list(sequence)}) + "\n")
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = ExampleIndex(list(self._examples.values()))
+            return self._index
+
+    def predict(self, prompt):
+        """Returns (sequence, confidence); sequence is None if nothing is known.
+
+        An example identical to the prompt is skipped like in few-shot
+        retrieval: exact repeats are served by the result cache, and this keeps
+        evaluations on the training prompts honest.
+        """
+        rules = rule_sequence(prompt)
+        rule_confidence = RULE_CONFIDENCE * rule_coverage(prompt) if rules else 0.0
+
+        neighbours = self._get_index().search(prompt, k=NEIGHBOURS, exclude_exact=True)
+        if not neighbours:
+            return (rules, min(rule_confidence, self.threshold * DISAGREEMENT_FACTOR)) if rules else (None, 0.0)
+
+        votes = defaultdict(float)
+        best_similarity = {}
+        for score, _, sequence in neighbours:
+            key = tuple(sequence)
+            votes[key] += score
+            best_similarity[key] = max(best_similarity.get(key, 0.0), score)
+        winner = max(votes, key=lambda key: (votes[key], best_similarity[key]))
+        similarity = best_similarity[winner]
+
+        if rules == list(winner):
+            return rules, min(1.0, max(similarity, rule_confidence) + AGREEMENT_BONUS)
+        if rule_confidence >= similarity * DISAGREEMENT_FACTOR:
+            return rules, min(rule_confidence, self.threshold * DISAGREEMENT_FACTOR)
+        return list(winner), similarity * DISAGREEMENT_FACTOR
+
+    def classify(self, prompt):
+        """Returns the predicted sequence if its confidence clears the threshold, else None"""
+        sequence, confidence = self.predict(prompt)
+        return sequence if sequence is not None and confidence >= self.threshold else None
@@ -0,0 +1,111 @@
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+from result_cache import normalize_prompt
+
+# Matches the examples embedded in the system message
+EXAMPLE_PATTERN = re.compile(r'User Prompt: "(.*?)"\s*\nCorrect Output: (\[.*?\])')
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "then", "to", "it", "of", "on", "in", "is", "if", "for", "with",
+    "that", "this", "them", "their", "its", "by", "be", "as", "at", "or", "from", "into",
+    "after", "before", "when", "some", "any", "all", "user", "users",
+})
+
+
+def tokenize(text):
+    """Lowercase word unigrams and bigrams, without stopwords"""
+    words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def parse_examples(text):
+    """Extract (prompt, sequence) pairs from 'User Prompt / Correct Output' blocks"""
+    return [(prompt, json.loads(output)) for prompt, output in EXAMPLE_PATTERN.findall(text)]
+
+
+def load_examples(json_file):
+    """Load (prompt, sequence) pairs from a test_prompts.json style file"""
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return [(case['User Prompt'], case['Correct Output']) for case in json.load(f)]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+class ExampleIndex:
+    """In-memory TF-IDF index over example prompts for top-k retrieval.
+
+    Vectors are precomputed and stored in an inverted index, so a lookup only
+    touches examples that share a term with the query.
+    """
+
+    def __init__(self, examples):
+        self.examples = []
+        seen = set()
+        for prompt, sequence in examples:
+            key = normalize_prompt(prompt)
+            if key not in seen:
+                seen.add(key)
+                self.examples.append((prompt, list(sequence)))
+        self._keys = [normalize_prompt(prompt) for prompt, _ in self.examples]
+
+        document_frequency = Counter()
+        term_counts = []
+        for prompt, _ in self.examples:
+            counts = Counter(tokenize(prompt))
+            term_counts.append(counts)
+            document_frequency.update(counts.keys())
+
+        total = len(self.examples)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self.postings = defaultdict(list)
+        for doc_id, counts in enumerate(term_counts):
+            weights = {term: count * self.idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self.postings[term].append((doc_id, weight / norm))
+
+    def __len__(self):
+        return len(self.examples)
+
+    def search(self, query, k=5, exclude_exact=False):
+        """Return up to k (score, prompt, sequence) tuples, most similar first.
+
+        With exclude_exact an example identical to the query (after
+        normalization) is skipped, which keeps evaluations on the indexed
+        prompts honest; serving queries keeps it.
+        """
+        counts = Counter(term for term in tokenize(query) if term in self.idf)
+        if not counts:
+            return []
+        weights = {term: count * self.idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+
+        scores = defaultdict(float)
+        for term, weight in weights.items():
+            for doc_id, doc_weight in self.postings[term]:
+                scores[doc_id] += weight * doc_weight
+
+        query_key = normalize_prompt(query) if exclude_exact else None
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for doc_id, score in ranked:
+            if self._keys[doc_id] == query_key:
+                continue
+            prompt, sequence = self.examples[doc_id]
+            results.append((score / norm, prompt, sequence))
+            if len(results) == k:
+                break
+        return results
+
+
+def format_examples(examples):
+    """Render retrieved examples in the system message example format"""
+    return "\n\n".join(
+        f'User Prompt: "{prompt}"\nCorrect Output: {json.dumps(sequence)}'
+        for _, prompt, sequence in examples
+    )
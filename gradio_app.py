@@ -1,12 +1,19 @@
 import gradio as gr
+import asyncio
 import json
 import random
-from node_seq_gen import process_query, load_test_cases, run_tests, print_test_summary
-from io import StringIO
-import sys
-import re
+from node_seq_gen import AdaptivePolicy, CascadePolicy, backend_pool, process_query_async, run_background, warm_up_until_ready
+from metrics import ready, start_metrics_server
+from background_jobs import JobManager
+import os
 import unittest
-from test_module import TestNodeSeqSystem
+
+# Interactive generations running at once; further requests wait in the queue
+GENERATION_CONCURRENCY = int(os.getenv('NODE_SEQ_GENERATION_CONCURRENCY', str(backend_pool.capacity())))
+# Requests waiting in the queue before new ones are rejected (back-pressure)
+QUEUE_SIZE = int(os.getenv('NODE_SEQ_QUEUE_SIZE', '64'))
+# Unit test runs execute as background jobs, this many at a time
+test_jobs = JobManager(max_workers=int(os.getenv('NODE_SEQ_TEST_JOB_WORKERS', '1')))
 
 try:
     with open('test_prompts.json', 'r') as f:
@@ -21,19 +28,24 @@ except:
 def load_examples():
     return [case["User Prompt"] for case in random.sample(ALL_TEST_CASES, 5)]
 
-def generate_sequence(prompt, max_attempts, validation_threshold, show_steps=False):
-    if not prompt.strip():
-        return "Please enter a prompt."
-    
-    model = "qwen2.5-coder:7b"
-    node_sequence, was_validated, debug_output = process_query(
-        prompt,
-        max_attempts=max_attempts,
-        validation_threshold=validation_threshold,
-        selected_model=model,
-        silent=not show_steps
+MODEL = "qwen2.5-coder:7b"
+MODELS = ["qwen2.5-coder:7b", "qwen2.5-coder:14b", "llama3.1:8b", "codegemma:7b"]
+# Models loaded on every host before the interface starts (comma-separated; empty disables)
+WARMUP_MODELS = [model.strip() for model in os.getenv('NODE_SEQ_WARMUP_MODELS', MODEL).split(',') if model.strip()]
+# Seconds between warm-up attempts while a model failed to load (/ready answers 503 meanwhile)
+WARMUP_RETRY_S = float(os.getenv('NODE_SEQ_WARMUP_RETRY_S', '30'))
+
+def build_cascade(cascade_tiers, validation_model, max_attempts):
+    # Tiers are escalated in the order they were selected; a validation model alone is a single tier
+    if not cascade_tiers and not validation_model:
+        return None
+    return CascadePolicy(
+        list(cascade_tiers or [MODEL]),
+        validation_model or None,
+        tier_attempts=max(1, int(max_attempts) // 2)
     )
-    
+
+def format_result(node_sequence, was_validated, debug_output, stats, show_steps=False):
     if node_sequence is None:
         return "❌ Failed to generate sequence."
     
@@ -41,33 +53,121 @@ def generate_sequence(prompt, max_attempts, validation_threshold, show_steps=Fal
     result = f"{validation_status}\n\n{chr(10).join(node_sequence)}"
     
     if show_steps:
-        result = f"{debug_output}\n\n{'-' * 40}\n\n{result}"
+        timing = (
+            f"⏱️ {stats.duration_s:.2f}s, {stats.llm_calls} LLM calls "
+            f"({stats.generation_calls} generation, {stats.validation_calls} validation)"
+        )
+        result = f"{debug_output}\n{timing}\n\n{'-' * 40}\n\n{result}"
     
     return result
 
-def run_unit_tests():
-    # Capture stdout to get the test results
-    old_stdout = sys.stdout
-    result_output = StringIO()
-    sys.stdout = result_output
+def _query(prompt, max_attempts, validation_threshold, show_steps, validation_concurrency, speculative_candidates, structured_output, few_shot_k, use_fast_path, cascade_tiers, validation_model, local_validations=0, adaptive=False, call_budget=0, on_partial=None):
+    # Queries run on the shared engine loop, so all users share its per-host request cap
+    return asyncio.wrap_future(run_background(process_query_async(
+        prompt,
+        max_attempts=int(max_attempts),
+        validation_threshold=int(validation_threshold),
+        selected_model=MODEL,
+        silent=not show_steps,
+        validation_concurrency=int(validation_concurrency),
+        speculative_candidates=int(speculative_candidates),
+        structured_output=structured_output,
+        return_stats=True,
+        few_shot_k=int(few_shot_k),
+        use_fast_path=use_fast_path,
+        stream=on_partial is not None,
+        on_partial=on_partial,
+        cascade=build_cascade(cascade_tiers, validation_model, max_attempts),
+        local_validations=int(local_validations or 0),
+        adaptive=AdaptivePolicy(max_calls=int(call_budget) or None) if adaptive else None
+    )))
+
+async def generate_sequence(prompt, max_attempts, validation_threshold, show_steps=False, validation_concurrency=1, speculative_candidates=0, structured_output=False, few_shot_k=0, use_fast_path=False, cascade_tiers=None, validation_model=None, local_validations=0, adaptive=False, call_budget=0):
+    if not prompt.strip():
+        return "Please enter a prompt."
     
-    # Run the unittest suite with verbosity=2 for detailed output
-    suite = unittest.TestLoader().loadTestsFromName('test_module.TestNodeSeqSystem')
-    unittest.TextTestRunner(stream=result_output, verbosity=2).run(suite)
+    node_sequence, was_validated, debug_output, stats = await _query(
+        prompt, max_attempts, validation_threshold, show_steps, validation_concurrency, speculative_candidates,
+        structured_output, few_shot_k, use_fast_path, cascade_tiers, validation_model, local_validations, adaptive, call_budget
+    )
+    return format_result(node_sequence, was_validated, debug_output, stats, show_steps)
+
+async def stream_sequence(prompt, max_attempts, validation_threshold, show_steps=False, validation_concurrency=1, speculative_candidates=0, structured_output=False, few_shot_k=0, use_fast_path=False, cascade_tiers=None, validation_model=None, local_validations=0, adaptive=False, call_budget=0):
+    """Like generate_sequence, but yields the nodes of the current attempt as they are generated"""
+    if not prompt.strip():
+        yield "Please enter a prompt."
+        return
     
-    # Restore stdout and get output
-    sys.stdout = old_stdout
-    test_output = result_output.getvalue()
+    # on_partial runs on the engine loop; hand partial sequences over to this loop
+    loop = asyncio.get_running_loop()
+    partials = asyncio.Queue()
+    future = _query(
+        prompt, max_attempts, validation_threshold, show_steps, validation_concurrency, speculative_candidates,
+        structured_output, few_shot_k, use_fast_path, cascade_tiers, validation_model, local_validations, adaptive, call_budget,
+        on_partial=lambda partial: loop.call_soon_threadsafe(partials.put_nowait, partial)
+    )
+    try:
+        while not future.done():
+            next_partial = asyncio.ensure_future(partials.get())
+            await asyncio.wait({next_partial, future}, return_when=asyncio.FIRST_COMPLETED)
+            if next_partial.done():
+                yield f"⏳ Generating...\n\n{chr(10).join(next_partial.result())}"
+            else:
+                next_partial.cancel()
+    finally:
+        # The client went away: stop the query instead of letting it run to the end
+        if not future.done():
+            future.cancel()
     
-    # Strip ANSI color codes
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    clean_output = ansi_escape.sub('', test_output)
+    node_sequence, was_validated, debug_output, stats = future.result()
+    yield format_result(node_sequence, was_validated, debug_output, stats, show_steps)
+
+def _iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+def run_unit_tests(job, test_name='test_module.TestNodeSeqSystem'):
+    """Background job: run the test suite one test at a time, reporting progress to the job"""
+    tests = list(_iter_tests(unittest.TestLoader().loadTestsFromName(test_name)))
+    job.progress(done=0, total=len(tests))
+    failures = []
+    for index, test in enumerate(tests):
+        result = unittest.TestResult()
+        test(result)
+        problems = result.errors + result.failures
+        if problems:
+            status = "ERROR" if result.errors else "FAIL"
+            failures.extend(problems)
+        elif result.skipped:
+            status = "skipped"
+        else:
+            status = "ok"
+        job.progress(done=index + 1, message=f"{test.id()} ... {status}")
     
-    # Format the output for display
-    if not clean_output:
-        return "No test results available."
+    for test, trace in failures:
+        job.progress(message=f"\n{'=' * 70}\n{test.id()}\n{'-' * 70}\n{trace}")
+    return {'tests': len(tests), 'failures': len(failures)}
+
+def start_unit_tests():
+    job_id = test_jobs.submit('unit-tests', run_unit_tests)
+    return job_id, f"Queued unit tests ({test_jobs.active()} job(s) queued or running)...", gr.Timer(active=True)
+
+def poll_unit_tests(job_id):
+    job = test_jobs.get(job_id) if job_id else None
+    if job is None:
+        return "No test run.", gr.Timer(active=False)
     
-    return clean_output
+    total = job['total'] if job['total'] is not None else '?'
+    header = f"Unit tests {job['status']}: {job['done']}/{total}"
+    if job['status'] == 'done':
+        header += f" ({job['result']['failures']} failed)"
+    elif job['status'] == 'failed':
+        header += f"\n{job['error']}"
+    finished = job['status'] in ('done', 'failed')
+    return f"{header}\n\n{job['output']}", gr.Timer(active=not finished)
 
 with gr.Blocks(css="""
     #generate-btn {
@@ -120,10 +220,68 @@ with gr.Blocks(css="""
                     maximum=10,
                     step=1
                 )
+                validation_concurrency_input = gr.Number(
+                    value=1,
+                    label="Parallel Validations",
+                    minimum=1,
+                    maximum=10,
+                    step=1
+                )
+                speculative_candidates_input = gr.Number(
+                    value=0,
+                    label="Parallel Candidates",
+                    minimum=0,
+                    maximum=20,
+                    step=1
+                )
+                few_shot_input = gr.Number(
+                    value=0,
+                    label="Few-shot Examples (0 = all)",
+                    minimum=0,
+                    maximum=20,
+                    step=1
+                )
+                local_validations_input = gr.Number(
+                    value=0,
+                    label="Local Validations",
+                    minimum=0,
+                    maximum=10,
+                    step=1
+                )
+                adaptive_checkbox = gr.Checkbox(
+                    label="Adaptive Budget (stop at 95% confidence)",
+                    value=False
+                )
+                call_budget_input = gr.Number(
+                    value=0,
+                    label="Call Budget per Query (0 = none, adaptive only)",
+                    minimum=0,
+                    maximum=100,
+                    step=1
+                )
                 show_steps_checkbox = gr.Checkbox(
                     label="Show Steps",
                     value=False
                 )
+                structured_output_checkbox = gr.Checkbox(
+                    label="Structured Output",
+                    value=False
+                )
+                fast_path_checkbox = gr.Checkbox(
+                    label="Local Fast Path",
+                    value=False
+                )
+                cascade_input = gr.Dropdown(
+                    choices=MODELS,
+                    value=[],
+                    multiselect=True,
+                    label="Model Cascade (cheapest first, empty = default model)"
+                )
+                validation_model_input = gr.Dropdown(
+                    choices=[""] + MODELS,
+                    value="",
+                    label="Validation Model (empty = same as generation)"
+                )
                 run_tests_btn = gr.Button("Run Unit Tests")
 
         examples_state = gr.State(load_examples())
@@ -135,30 +293,65 @@ with gr.Blocks(css="""
 
         refresh_btn = gr.Button("Refresh Examples")
 
+        test_output = gr.Textbox(
+            lines=8,
+            label="Unit Test Results"
+        )
+        test_job_state = gr.State(None)
+        test_poll_timer = gr.Timer(1.0, active=False)
+
         # Event handlers
         examples_radio.change(fn=lambda x: x, inputs=examples_radio, outputs=input_text)
+        generation_inputs = [input_text, max_attempts_input, validation_threshold_input, show_steps_checkbox, validation_concurrency_input, speculative_candidates_input, structured_output_checkbox, few_shot_input, fast_path_checkbox, cascade_input, validation_model_input, local_validations_input, adaptive_checkbox, call_budget_input]
+        # Both triggers share one concurrency limit for interactive generation
         submit_btn.click(
-            fn=generate_sequence,
-            inputs=[input_text, max_attempts_input, validation_threshold_input, show_steps_checkbox],
-            outputs=output_text
+            fn=stream_sequence,
+            inputs=generation_inputs,
+            outputs=output_text,
+            concurrency_limit=GENERATION_CONCURRENCY,
+            concurrency_id="generate"
         )
         input_text.submit(
-            fn=generate_sequence,
-            inputs=[input_text, max_attempts_input, validation_threshold_input, show_steps_checkbox],
-            outputs=output_text
+            fn=stream_sequence,
+            inputs=generation_inputs,
+            outputs=output_text,
+            concurrency_limit=GENERATION_CONCURRENCY,
+            concurrency_id="generate"
         )
         refresh_btn.click(
             fn=lambda: gr.update(choices=load_examples(), value=None),
             inputs=None,
             outputs=examples_radio
         )
+        # Test runs only enqueue a background job; progress is polled by the timer
         run_tests_btn.click(
-            fn=run_unit_tests,
+            fn=start_unit_tests,
             inputs=None,
-            outputs=output_text
+            outputs=[test_job_state, test_output, test_poll_timer],
+            queue=False
+        )
+        test_poll_timer.tick(
+            fn=poll_unit_tests,
+            inputs=test_job_state,
+            outputs=[test_output, test_poll_timer],
+            queue=False
         )
 
-iface.launch(
+    iface.queue(max_size=QUEUE_SIZE, default_concurrency_limit=GENERATION_CONCURRENCY)
+
+if __name__ == "__main__":
+    # Prometheus metrics at http://<host>:<port>/metrics; set NODE_SEQ_METRICS_PORT=0 to disable
+    metrics_port = int(os.getenv('NODE_SEQ_METRICS_PORT', '9090'))
+    if metrics_port:
+        start_metrics_server(metrics_port)
+
+    # Load the models before accepting requests so no user pays the cold start
+    if WARMUP_MODELS:
+        warm_up_until_ready(WARMUP_MODELS, ready, WARMUP_RETRY_S)
+    else:
+        ready.set()
+
+    iface.launch(
         server_name="0.0.0.0",  # Very important - allows external connections
         server_port=7860,
         share=True  # Set to True if you want a public URL
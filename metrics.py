@@ -0,0 +1,305 @@
+import contextvars
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default histogram buckets in seconds, spanning fast cache hits to slow CPU inference
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Stats of the query currently running in this context (thread or asyncio task)
+current_query_stats = contextvars.ContextVar('current_query_stats', default=None)
+# Attempt number tagged onto LLM calls made in this context
+current_attempt = contextvars.ContextVar('current_attempt', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, exportable in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._histograms = {}
+        self._buckets = {}
+
+    def _declare(self, name, metric_type, help_text):
+        if name not in self._types:
+            self._types[name] = metric_type
+            self._help[name] = help_text
+
+    def inc(self, name, value=1, help_text='', **labels):
+        """Increment a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'counter', help_text)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, help_text='', buckets=DEFAULT_BUCKETS, **labels):
+        """Record an observation in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, 'histogram', help_text)
+            bucket_bounds = self._buckets.setdefault(name, tuple(buckets))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(bucket_bounds), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(bucket_bounds):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def counter_value(self, name, **labels):
+        """Returns the current value of a counter (0 if never incremented)"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        """Drop every recorded metric"""
+        with self._lock:
+            self._help.clear()
+            self._types.clear()
+            self._counters.clear()
+            self._histograms.clear()
+            self._buckets.clear()
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted(self._types):
+                if self._help[name]:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+                if self._types[name] == 'counter':
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                bounds = self._buckets[name]
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(bounds, histogram['buckets']):
+                        le_labels = labels + (('le', _format_value(float(bound))),)
+                        lines.append(f"{name}_bucket{_format_labels(le_labels)} {count}")
+                    inf_labels = labels + (('le', '+Inf'),)
+                    lines.append(f"{name}_bucket{_format_labels(inf_labels)} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryStats:
+    """Structured per-query record of every LLM call and its timings"""
+
+    def __init__(self):
+        self.calls = []
+        self.cache_hit = False
+        self.fast_path = False
+        self.tier = None
+        self.escalations = 0
+        self.coalesced = False
+        # (original, repaired) node names fixed while parsing responses
+        self.repairs = []
+        # Validation slots filled by the structural validator instead of the LLM
+        self.local_validations = 0
+        # Sequences (as tuples) that at least one LLM validation call accepted
+        self.llm_accepted = set()
+        # Why an adaptive query stopped and the posterior confidence of its answer
+        self.stop_reason = None
+        self.confidence = None
+        self.started = time.perf_counter()
+        self.duration_s = None
+
+    def finish(self):
+        self.duration_s = time.perf_counter() - self.started
+
+    def count(self, kind):
+        return sum(1 for call in self.calls if call['kind'] == kind)
+
+    @property
+    def llm_calls(self):
+        return len(self.calls)
+
+    @property
+    def generation_calls(self):
+        return self.count('generation')
+
+    @property
+    def validation_calls(self):
+        return self.count('validation')
+
+    def total(self, field):
+        return sum(call[field] or 0 for call in self.calls)
+
+    def to_dict(self):
+        return {
+            'duration_s': self.duration_s,
+            'cache_hit': self.cache_hit,
+            'fast_path': self.fast_path,
+            'tier': self.tier,
+            'escalations': self.escalations,
+            'coalesced': self.coalesced,
+            'repairs': list(self.repairs),
+            'local_validations': self.local_validations,
+            'stop_reason': self.stop_reason,
+            'confidence': self.confidence,
+            'llm_calls': self.llm_calls,
+            'generation_calls': self.generation_calls,
+            'validation_calls': self.validation_calls,
+            'llm_seconds': self.total('latency_s'),
+            'prompt_eval_count': self.total('prompt_eval_count'),
+            'eval_count': self.total('eval_count'),
+            'calls': list(self.calls),
+        }
+
+
+def _response_field(response, name):
+    if response is None:
+        return None
+    try:
+        return response[name]
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _ns_to_s(value):
+    return value / 1e9 if value is not None else None
+
+
+def record_llm_call(kind, model, wait_s, latency_s, response=None, status='ok'):
+    """Record one LLM call in the current query stats and the process-wide registry"""
+    call = {
+        'kind': kind,
+        'attempt': current_attempt.get(),
+        'model': model,
+        'status': status,
+        'wait_s': wait_s,
+        'latency_s': latency_s,
+        'prompt_eval_count': _response_field(response, 'prompt_eval_count'),
+        'eval_count': _response_field(response, 'eval_count'),
+        'total_duration_s': _ns_to_s(_response_field(response, 'total_duration')),
+        'load_duration_s': _ns_to_s(_response_field(response, 'load_duration')),
+    }
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.calls.append(call)
+
+    registry.inc('node_seq_llm_calls_total', help_text='LLM chat calls', kind=kind, model=model, status=status)
+    registry.observe('node_seq_llm_call_seconds', latency_s, help_text='Latency of LLM chat calls', kind=kind, model=model)
+    registry.observe('node_seq_llm_wait_seconds', wait_s, help_text='Time spent waiting for a free host slot', kind=kind, model=model)
+    if call['prompt_eval_count']:
+        registry.inc('node_seq_prompt_eval_tokens_total', call['prompt_eval_count'], help_text='Prompt tokens evaluated', kind=kind, model=model)
+    if call['eval_count']:
+        registry.inc('node_seq_eval_tokens_total', call['eval_count'], help_text='Tokens generated', kind=kind, model=model)
+    if call['load_duration_s']:
+        registry.observe('node_seq_model_load_seconds', call['load_duration_s'], help_text='Model load time reported by Ollama', model=model)
+    return call
+
+
+def record_query(stats, outcome, model):
+    """Record a finished query in the process-wide registry"""
+    registry.inc('node_seq_queries_total', help_text='Processed queries by outcome', outcome=outcome, model=model)
+    if stats.duration_s is not None:
+        registry.observe('node_seq_query_seconds', stats.duration_s, help_text='End-to-end query latency', outcome=outcome, model=model)
+    registry.observe('node_seq_llm_calls_per_query', stats.llm_calls, help_text='LLM calls per query',
+                     buckets=(0, 1, 2, 4, 6, 10, 20, 40, 60, 100), model=model)
+
+
+def record_local_validations(count):
+    """Record validation slots filled by the structural validator"""
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.local_validations += count
+    registry.inc('node_seq_local_validations_total', count, help_text='Validation slots filled without an LLM call')
+
+
+def record_adaptive_stop(reason, confidence):
+    """Record why an adaptive query stopped and the confidence of its answer"""
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.stop_reason = reason
+        stats.confidence = confidence
+    registry.inc('node_seq_adaptive_stops_total', help_text='Adaptive queries by stop reason', reason=reason)
+
+
+def record_repairs(repairs):
+    """Record node names repaired while parsing a response"""
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.repairs.extend(repairs)
+    for original, repaired in repairs:
+        registry.inc('node_seq_node_repairs_total', help_text='Near-miss node names repaired while parsing', node=repaired)
+
+
+def record_coalesced(saved_llm_calls):
+    """Record a query that shared the result of an identical in-flight query"""
+    registry.inc('node_seq_coalesced_queries_total', help_text='Queries coalesced with an identical in-flight query')
+    registry.inc('node_seq_coalesced_llm_calls_saved_total', saved_llm_calls,
+                 help_text='LLM calls saved by coalescing identical queries')
+
+
+def record_ejection(host):
+    """Record an Ollama host being ejected from the backend pool"""
+    registry.inc('node_seq_backend_ejections_total', help_text='Ollama hosts ejected after failures', host=host)
+
+
+def record_escalation(from_model, to_model):
+    """Record a model cascade escalation in the process-wide registry"""
+    registry.inc('node_seq_cascade_escalations_total', help_text='Model cascade escalations',
+                 from_model=from_model, to_model=to_model)
+
+
+# Set once the models are warm; the metrics server answers /ready with 503 until then
+ready = threading.Event()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/ready':
+            self.send_response(200 if ready.is_set() else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if path != '/metrics':
+            self.send_error(404)
+            return
+        payload = registry.to_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """Serve the registry at http://host:port/metrics (and readiness at /ready) from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
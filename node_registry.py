@@ -0,0 +1,219 @@
+import re
+from collections import namedtuple
+from types import MappingProxyType
+
+# keywords: lowercase phrases that usually signal the node in a user prompt
+Node = namedtuple('Node', ['name', 'category', 'description', 'keywords'], defaults=((),))
+
+# The single source of truth for available nodes. Adding a node here updates
+# validation, the prompt catalog and the structured-output schema.
+NODES = (
+    # Event Nodes
+    Node("OnVariableChange", "Event", "Triggered when a specified variable changes value.",
+         ("variable changes", "variable change", "value changes")),
+    Node("OnKeyRelease", "Event", "Triggered when a key is released.",
+         ("key is released", "key released", "key release", "releases a key", "released")),
+    Node("OnKeyPress", "Event", "Triggered when a key is pressed.",
+         ("key is pressed", "key pressed", "key press", "presses a key", "keypress", "pressed")),
+    Node("OnClick", "Event", "Triggered when an element is clicked.",
+         ("clicked", "click", "clicks")),
+    Node("OnWindowResize", "Event", "Triggered when the window is resized.",
+         ("window is resized", "window resize", "resized", "resize")),
+    Node("OnMouseEnter", "Event", "Triggered when the mouse pointer enters an element.",
+         ("mouse enters", "mouse pointer enters", "mouse enter", "hover", "hovers")),
+    Node("OnMouseLeave", "Event", "Triggered when the mouse pointer leaves an element.",
+         ("mouse leaves", "mouse pointer leaves", "mouse leave")),
+    Node("OnTimer", "Event", "Triggered at specified time intervals.",
+         ("timer", "every", "interval", "intervals", "periodically")),
+    Node("Delay", "Event", "Delays the execution of the next node by a specified amount of time.",
+         ("delay", "wait", "waits", "pause for")),
+
+    # Action Nodes
+    Node("Console", "Action", "Prints a message to the console.",
+         ("console",)),
+    Node("Alert", "Action", "Displays an alert message.",
+         ("alert", "show an alert")),
+    Node("Log", "Action", "Logs information for debugging purposes.",
+         ("log", "logs")),
+    Node("Assign", "Action", "Assigns a value to a variable.",
+         ("assign", "assigns", "set a variable")),
+    Node("SendRequest", "Action", "Sends a network request.",
+         ("send a request", "send a network request", "sends a request", "network request", "request")),
+    Node("Navigate", "Action", "Navigates to a different URL or page.",
+         ("navigate", "redirect", "new page")),
+    Node("Save", "Action", "Saves data to local storage or a database.",
+         ("save", "saves")),
+    Node("Delete", "Action", "Deletes specified data or records.",
+         ("delete", "deletes", "remove records")),
+    Node("PlaySound", "Action", "Plays an audio file.",
+         ("play a sound", "plays a sound", "play sound", "play the audio", "play audio", "play a", "play")),
+    Node("PauseSound", "Action", "Pauses an audio file.",
+         ("pause the sound", "pause sound", "pause it", "pause")),
+    Node("StopSound", "Action", "Stops an audio file.",
+         ("stop the sound", "stop sound", "stop the audio", "stop")),
+
+    # Transformation Nodes
+    Node("Branch", "Transformation", "Conditional node that branches based on a true/false evaluation.",
+         ("branch", "if true", "condition", "otherwise")),
+    Node("Map", "Transformation", "Transforms data from one format to another.",
+         ("map", "maps", "transform", "transforms")),
+    Node("Filter", "Transformation", "Filters data based on specified criteria.",
+         ("filter", "filters", "filtered")),
+    Node("Reduce", "Transformation", "Reduces a list of items to a single value.",
+         ("reduce", "reduces", "sum", "total")),
+    Node("Sort", "Transformation", "Sorts data based on specified criteria.",
+         ("sort", "sorts", "sorted")),
+    Node("GroupBy", "Transformation", "Groups data by a specified attribute.",
+         ("group", "groups", "grouped")),
+    Node("Merge", "Transformation", "Merges multiple datasets into one.",
+         ("merge", "merges", "combine")),
+    Node("Split", "Transformation", "Splits data into multiple parts based on criteria.",
+         ("split", "splits")),
+
+    # Display Nodes
+    Node("Show", "Display", "Displays information on the screen.",
+         ("show", "shows", "display it", "display the", "on the screen")),
+    Node("Hide", "Display", "Hides information from the screen.",
+         ("hide", "hides")),
+    Node("Update", "Display", "Updates the display with new information.",
+         ("update the display", "update the displayed", "update the view", "updates the display", "refresh the display")),
+    Node("DisplayModal", "Display", "Displays a modal dialog.",
+         ("modal", "display a modal", "show a modal", "in a modal")),
+    Node("CloseModal", "Display", "Closes an open modal dialog.",
+         ("close the modal", "close a modal", "closes the modal", "close modal")),
+    Node("Highlight", "Display", "Highlights an element on the screen.",
+         ("highlight", "highlights")),
+    Node("Tooltip", "Display", "Shows a tooltip with additional information.",
+         ("tooltip", "tooltips")),
+    Node("RenderChart", "Display", "Renders a chart with specified data.",
+         ("chart", "render a chart", "graph")),
+
+    # Data Nodes
+    Node("FetchData", "Data", "Fetches data from an API or database.",
+         ("fetch data", "fetch", "fetches", "retrieve", "load data")),
+    Node("StoreData", "Data", "Stores data in a variable or storage.",
+         ("store data", "store", "stores")),
+    Node("UpdateData", "Data", "Updates existing data.",
+         ("update it with", "update the data", "update data", "update existing")),
+    Node("DeleteData", "Data", "Deletes specified data.",
+         ("delete data", "delete the data", "delete specified data")),
+    Node("CacheData", "Data", "Caches data for performance improvement.",
+         ("cache", "caches", "cached")),
+)
+
+CATEGORIES = ("Event", "Action", "Transformation", "Display", "Data")
+
+# Lookup structures, built once at import
+NODE_NAMES = frozenset(node.name for node in NODES)
+SORTED_NODE_NAMES = tuple(sorted(NODE_NAMES))
+NODES_BY_NAME = MappingProxyType({node.name: node for node in NODES})
+NODES_BY_LOWER_NAME = MappingProxyType({node.name.casefold(): node.name for node in NODES})
+# Separators ignored when repairing names ("Display Modal", "fetch_data")
+NAME_SEPARATORS = re.compile(r'[\s_\-.]+')
+NODES_BY_CATEGORY = MappingProxyType({
+    category: tuple(node.name for node in NODES if node.category == category)
+    for category in CATEGORIES
+})
+
+
+# Keyword phrase -> node name, longest phrases first so they win over their prefixes
+KEYWORD_RULES = tuple(sorted(
+    ((phrase, node.name) for node in NODES for phrase in node.keywords),
+    key=lambda rule: (-len(rule[0].split()), -len(rule[0]), rule[0])
+))
+
+
+def is_node(name):
+    """Returns True if name is an available node"""
+    return name in NODE_NAMES
+
+
+def lookup_node(name):
+    """Returns the canonical node name for a case-insensitive match, or None"""
+    if name in NODE_NAMES:
+        return name
+    return NODES_BY_LOWER_NAME.get(str(name).strip().casefold())
+
+
+def _max_edits(key):
+    """Edits allowed when repairing a name; short names must match exactly"""
+    return 0 if len(key) <= 5 else 1 if len(key) <= 9 else 2
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def repair_node_name(name):
+    """Returns the node a near-miss name refers to, or None.
+
+    Tries the exact name, then ignores case and separators ("display modal"),
+    then also drops a trailing "Node" ("FetchDataNode"), and finally accepts
+    the single closest node within a few edits ("PlaySond"). Names of five
+    characters or less are never edited, so "Save" cannot become "Show".
+    """
+    if name in NODE_NAMES:
+        return name
+    key = NAME_SEPARATORS.sub('', str(name)).casefold()
+    if key in NODES_BY_LOWER_NAME:
+        return NODES_BY_LOWER_NAME[key]
+    if key.endswith('node') and key[:-4] in NODES_BY_LOWER_NAME:
+        return NODES_BY_LOWER_NAME[key[:-4]]
+    limit = _max_edits(key)
+    if not limit:
+        return None
+    distances = sorted(
+        (edit_distance(key, candidate, limit), candidate)
+        for candidate in NODES_BY_LOWER_NAME if abs(len(candidate) - len(key)) <= limit
+    )
+    if not distances or distances[0][0] > limit or (len(distances) > 1 and distances[1][0] == distances[0][0]):
+        return None
+    return NODES_BY_LOWER_NAME[distances[0][1]]
+
+
+def category_of(name):
+    """Returns the category of a node, or None for unknown names"""
+    node = NODES_BY_NAME.get(name)
+    return node.category if node else None
+
+
+def _build_catalog_text():
+    """Render the node catalog section of the system message"""
+    sections = []
+    for category in CATEGORIES:
+        lines = [f"{category} Nodes:"]
+        for node in NODES:
+            if node.category == category:
+                lines.append(f"  [{node.name}]: {node.description}")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+CATALOG_TEXT = _build_catalog_text()
+
+# Comma-separated node names for compact prompts, in sorted (stable) order
+NODE_LIST_TEXT = ", ".join(SORTED_NODE_NAMES)
+
+# JSON schema constraining generation to a sequence of known node names (treat as read-only)
+SEQUENCE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sequence": {
+            "type": "array",
+            "items": {"type": "string", "enum": list(SORTED_NODE_NAMES)},
+            "minItems": 1
+        }
+    },
+    "required": ["sequence"]
+}
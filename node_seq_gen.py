@@ -1,27 +1,115 @@
 import ollama
 from rich.console import Console
 from rich.markdown import Markdown
-import pandas as pd
+import argparse
+import ast
+import asyncio
+import csv
+import itertools
 import json
-from collections import Counter
+import threading
+import time
+import weakref
+from collections import Counter, namedtuple
 from multiprocessing import Pool, cpu_count
 import os
+from result_cache import ResultCache, make_cache_key
+from node_registry import CATALOG_TEXT, NODE_LIST_TEXT, NODE_NAMES, SEQUENCE_SCHEMA
+from few_shot import ExampleIndex, format_examples, load_examples, parse_examples
+from fast_path import FastPathClassifier
+from stream_parser import SequenceStreamParser, StreamAbort
+from response_parser import extract_sequence
+from structural_validator import StructuralValidator
+from adaptive_budget import AdaptivePolicy, CandidateBeliefs, QueryBudget
+from eval_dataset import iter_test_cases, parse_shard
+from singleflight import Singleflight
+from backend_pool import BackendPool, is_backend_failure, parse_hosts
+from cassette import Cassette
+from metrics import QueryStats, current_attempt, current_query_stats, record_adaptive_stop, record_coalesced, record_ejection, record_escalation, record_llm_call, record_local_validations, record_query, record_repairs, registry
 
 # Get Ollama host from environment variable or use default
 ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
-client = ollama.Client(host=ollama_host)
+# How long Ollama keeps the model (and its cached prompt prefix) loaded after a request
+ollama_keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Maximum number of outstanding chat requests per Ollama host
+ollama_max_in_flight = int(os.getenv('OLLAMA_MAX_IN_FLIGHT', '4'))
+# Seconds before a request to a host counts as timed out (unset: no timeout)
+ollama_timeout = float(os.getenv('OLLAMA_TIMEOUT')) if os.getenv('OLLAMA_TIMEOUT') else None
+# Ollama hosts to spread requests over: comma-separated URLs, each optionally
+# followed by #<max in flight> (default OLLAMA_MAX_IN_FLIGHT). Defaults to OLLAMA_HOST.
+backend_pool = BackendPool(
+    parse_hosts(os.getenv('OLLAMA_HOSTS') or ollama_host, ollama_max_in_flight),
+    eject_seconds=float(os.getenv('OLLAMA_EJECT_SECONDS', '30')),
+    health_interval=float(os.getenv('OLLAMA_HEALTH_INTERVAL', '15'))
+)
+# Record LLM calls to, or replay them from, a cassette file instead of Ollama:
+# NODE_SEQ_CASSETTE=<file> with NODE_SEQ_CASSETTE_MODE=record or replay (default)
+cassette = (
+    Cassette(os.getenv('NODE_SEQ_CASSETTE'), os.getenv('NODE_SEQ_CASSETTE_MODE', 'replay'))
+    if os.getenv('NODE_SEQ_CASSETTE') else None
+)
 console = Console()
 
-
-# System message for the LLM
-system_message = """
+CACHE_HIT_MESSAGE = "✅ Cache hit: returning stored sequence"
+FAST_PATH_MESSAGE = "⚡ Fast path: answered locally without the LLM"
+
+# Where test runs started from the command line dump the metrics registry
+METRICS_FILE = 'test_metrics.prom'
+# Debug output of a query that raised instead of returning a result (for display only;
+# process_queries reports the exception itself)
+QUERY_ERROR_PREFIX = "❌ Error: "
+TEST_RESULT_FIELDS = [
+    'prompt', 'expected', 'actual', 'passed', 'validated', 'cache_hit', 'fast_path', 'tier', 'escalations',
+    'local_validations', 'stop_reason', 'confidence', 'llm_calls', 'generation_calls', 'validation_calls', 'duration_s', 'error'
+]
+
+# Model cascade: generate and validate with tiers[0] first and escalate to the
+# next tier when its validations fail (or its candidates disagree). Tiers
+# before the last get tier_attempts attempts (default: max_attempts).
+# validation_model, if set, judges every tier instead of the tier's own model.
+CascadePolicy = namedtuple(
+    'CascadePolicy',
+    ['tiers', 'validation_model', 'tier_attempts', 'escalate_on_disagreement'],
+    defaults=(None, None, True)
+)
+
+# AsyncClient and semaphore objects are bound to the event loop they are used on,
+# so they are kept per loop and per host.
+_async_clients = weakref.WeakKeyDictionary()
+_host_semaphores = weakref.WeakKeyDictionary()
+# Running health checks, referenced so they are not garbage collected
+_health_checks = set()
+
+# Background event loop that runs the async engine for the sync wrappers
+_sync_loop = None
+_sync_loop_pid = None
+_sync_loop_lock = threading.Lock()
+
+# Result cache in front of process_query. Set NODE_SEQ_CACHE_DB to a file path
+# to enable the sqlite tier shared across restarts and pool workers.
+result_cache = ResultCache(
+    max_size=int(os.getenv('NODE_SEQ_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('NODE_SEQ_CACHE_TTL', '86400')),
+    db_path=os.getenv('NODE_SEQ_CACHE_DB') or None
+)
+
+
+# Identical queries in flight at the same time run once (coalesce=True)
+query_flights = Singleflight()
+
+
+# Instructions at the top of every system message
+system_instructions = """
 You are a system that converts a user's instruction into a sequence of nodes.
 Use a step by step approach. First define the actions in an order that achieves the user's goal. 
 Then assign the nodes to the actions.
 In final step, you must respond with a JSON object containing only a "sequence" key with an array of node names.
 You MUST always output exactly and only a JSON array where each element is a node string. 
 No explanations, no introductions, no trailing text.
+"""
 
+# System message for the LLM
+system_message = system_instructions + """
 Example Use Cases:
 
 User Prompt: "Navigate to a new page after a delay of 3 seconds when the user clicks a button."
@@ -47,56 +135,7 @@ Correct Output: ["Filter","Sort","Show"]
 
 You are only allowed to use the following nodes:
 
-Event Nodes:
-  [OnVariableChange]: Triggered when a specified variable changes value. 
-  [OnKeyRelease]: Triggered when a key is released. 
-  [OnKeyPress]: Triggered when a key is pressed. 
-  [OnClick]: Triggered when an element is clicked. 
-  [OnWindowResize]: Triggered when the window is resized. 
-  [OnMouseEnter]: Triggered when the mouse pointer enters an element. 
-  [OnMouseLeave]: Triggered when the mouse pointer leaves an element. 
-  [OnTimer]: Triggered at specified time intervals.
-  [Delay]: Delays the execution of the next node by a specified amount of time.
-
-Action Nodes:
-  [Console]: Prints a message to the console. 
-  [Alert]: Displays an alert message. 
-  [Log]: Logs information for debugging purposes. 
-  [Assign]: Assigns a value to a variable. 
-  [SendRequest]: Sends a network request. 
-  [Navigate]: Navigates to a different URL or page. 
-  [Save]: Saves data to local storage or a database. 
-  [Delete]: Deletes specified data or records. 
-  [PlaySound]: Plays an audio file. 
-  [PauseSound]: Pauses an audio file. 
-  [StopSound]: Stops an audio file.
-
-Transformation Nodes: 
-  [Branch]: Conditional node that branches based on a true/false evaluation. 
-  [Map]: Transforms data from one format to another. 
-  [Filter]: Filters data based on specified criteria. 
-  [Reduce]: Reduces a list of items to a single value. 
-  [Sort]: Sorts data based on specified criteria. 
-  [GroupBy]: Groups data by a specified attribute. 
-  [Merge]: Merges multiple datasets into one. 
-  [Split]: Splits data into multiple parts based on criteria.
-
-Display Nodes: 
-  [Show]: Displays information on the screen. 
-  [Hide]: Hides information from the screen. 
-  [Update]: Updates the display with new information. 
-  [DisplayModal]: Displays a modal dialog. 
-  [CloseModal]: Closes an open modal dialog. 
-  [Highlight]: Highlights an element on the screen. 
-  [Tooltip]: Shows a tooltip with additional information. 
-  [RenderChart]: Renders a chart with specified data.
-
-Data Nodes: 
-  [FetchData]: Fetches data from an API or database. 
-  [StoreData]: Stores data in a variable or storage. 
-  [UpdateData]: Updates existing data. 
-  [DeleteData]: Deletes specified data. 
-  [CacheData]: Caches data for performance improvement.
+""" + CATALOG_TEXT + """
 
 
 More Examples:
@@ -197,144 +236,673 @@ Correct Output: ["SendRequest","Map","CacheData","RenderChart"]
 
 """
 
-def get_llm_response(user_query, selected_model):
-    """Get node sequence from LLM"""
-    
-    user_message = f"""
-        User request: {user_query}
+# Known (prompt, sequence) pairs: the inline examples and test_prompts.json
+known_examples = (
+    parse_examples(system_message)
+    + load_examples(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_prompts.json'))
+)
+
+# Retrieval index for compact few-shot system messages, built once at import
+example_index = ExampleIndex(known_examples)
+
+# Local classifier that answers confident queries without the LLM (use_fast_path).
+# It also learns from validated results; set NODE_SEQ_FAST_PATH_DB to a file
+# path to keep them across restarts.
+fast_path_classifier = FastPathClassifier(
+    known_examples,
+    threshold=float(os.getenv('NODE_SEQ_FAST_PATH_THRESHOLD', '0.9')),
+    db_path=os.getenv('NODE_SEQ_FAST_PATH_DB') or None
+)
+
+# Local check that fills validation slots for structurally sound sequences
+# (local_validations); learns category transitions from validated results too
+structural_validator = StructuralValidator(
+    known_examples, threshold=float(os.getenv('NODE_SEQ_LOCAL_VALIDATION_THRESHOLD', '1.0'))
+)
+
+def build_system_message(user_query, few_shot_k=0, exclude_exact=False):
+    """Returns the system message, compacted to the top-k most similar examples when few_shot_k > 0.
+
+    The instructions and node catalog stay first so the shared prefix is
+    stable; only the retrieved examples vary per query. exclude_exact leaves
+    out an example identical to the query, for evaluations on indexed prompts.
+    """
+    if few_shot_k <= 0:
+        return system_message
+    examples = example_index.search(user_query, few_shot_k, exclude_exact)
+    return (
+        f"{system_instructions}\nYou are only allowed to use the following nodes:\n\n{CATALOG_TEXT}\n\n"
+        f"Examples:\n\n{format_examples(examples)}\n"
+    )
 
-        Convert this request into a sequence of nodes that achieves the desired functionality.
-        You are only allowed to use the nodes defined in the system message. They are:
-        
-        {get_available_nodes()}
-        
-        You must respond with a JSON object containing only a "sequence" key with an array of node names.
-        
-        Example format:
-        {{
-            "sequence": ["OnClick", "FetchData", "DisplayModal"]
-        }}
+def _get_async_client(host):
+    """Returns the AsyncClient for host on the running event loop"""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if host not in clients:
+        clients[host] = ollama.AsyncClient(host=host, timeout=ollama_timeout)
+    return clients[host]
+
+def _get_host_semaphore(host, limit):
+    """Returns the semaphore capping outstanding requests to host on the running event loop"""
+    semaphores = _host_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore(limit)
+    return semaphores[host]
+
+async def _check_backend(backend):
+    """Health check: list the host's models, re-adding it to the pool if it answers"""
+    try:
+        listing = await _get_async_client(backend.url).list()
+        backend_pool.check_passed(backend, [model.model for model in listing.models])
+    except Exception:
+        backend_pool.check_failed(backend)
+
+def _schedule_health_checks():
+    for backend in backend_pool.due_checks():
+        task = asyncio.ensure_future(_check_backend(backend))
+        _health_checks.add(task)
+        task.add_done_callback(_health_checks.discard)
+
+async def _consume_stream(stream, on_content):
+    """Feed streamed content to on_content until it returns True, then drain the stream.
+
+    Returns the final chunk, which carries Ollama's token counts and
+    durations, with all the content received as its message. A StreamAbort
+    from on_content closes the stream early instead, which drops the
+    connection and makes Ollama stop generating.
+    """
+    parts = []
+    response = None
+    finished = False
+    try:
+        async for chunk in stream:
+            response = chunk
+            text = chunk['message']['content']
+            if text:
+                parts.append(text)
+                finished = finished or on_content(text)
+    finally:
+        await stream.aclose()
+    if response is not None:
+        response['message']['content'] = ''.join(parts)
+    return response
+
+async def chat_async(model, messages, kind='chat', on_content=None, **kwargs):
+    """Send a chat request to the least-loaded Ollama host, waiting for a free slot on it.
+
+    Every call is timed and recorded under `kind` (generation or validation)
+    in the current query's stats and the process-wide metrics registry. With
+    on_content the response is streamed and each piece of text is passed to
+    it as it arrives until it returns True (the rest is still read for the
+    final statistics), or it aborts the stream by raising StreamAbort. A host that fails is ejected from the pool and the request
+    moves to the next one, unless part of the response was already streamed.
+    With a cassette, answered requests are recorded, or replayed from it
+    without contacting Ollama.
+    """
+    kwargs.setdefault('keep_alive', ollama_keep_alive)
+    queued = time.perf_counter()
+    started = None
+    response = None
+    status = 'ok'
+    tried = []
+    received = []
+
+    def forward(text):
+        received.append(text)
+        return on_content(text)
 
-        Use only the node names defined in the system message. Ensure the sequence is logical and achieves the user's goal.
+    try:
+        if cassette is not None and cassette.mode == 'replay':
+            started = time.perf_counter()
+            response = cassette.play(model, messages, kwargs)
+            if on_content is not None:
+                forward(response['message']['content'])
+            return response
+        while True:
+            _schedule_health_checks()
+            backend = backend_pool.acquire(model, exclude=tried)
+            failed = False
+            try:
+                async with _get_host_semaphore(backend.url, backend.max_in_flight):
+                    started = time.perf_counter()
+                    client = _get_async_client(backend.url)
+                    if on_content is None:
+                        response = await client.chat(model=model, messages=messages, **kwargs)
+                    else:
+                        stream = await client.chat(model=model, messages=messages, stream=True, **kwargs)
+                        response = await _consume_stream(stream, forward)
+                if cassette is not None:
+                    cassette.record(model, messages, kwargs, response)
+                return response
+            except Exception as e:
+                failed = is_backend_failure(e)
+                tried.append(backend.url)
+                if not failed or received or not backend_pool.has_alternative(model, tried):
+                    raise
+            finally:
+                if backend_pool.release(backend, failed):
+                    record_ejection(backend.url)
+    except StreamAbort:
+        status = 'aborted'
+        # Recorded as far as it streamed, so replay aborts at the same point
+        if cassette is not None and cassette.mode == 'record':
+            cassette.record(model, messages, kwargs, {'message': {'content': ''.join(received)}})
+        raise
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        finished = time.perf_counter()
+        started = started or finished
+        record_llm_call(kind, model, started - queued, finished - started, response, status)
+
+def _get_sync_loop():
+    """Returns the background event loop, starting it on first use in this process"""
+    global _sync_loop, _sync_loop_pid
+    with _sync_loop_lock:
+        # Forked pool workers do not inherit the loop thread, so start a new one
+        if _sync_loop is None or _sync_loop_pid != os.getpid():
+            _sync_loop = asyncio.new_event_loop()
+            _sync_loop_pid = os.getpid()
+            threading.Thread(target=_sync_loop.run_forever, name="node-seq-gen-loop", daemon=True).start()
+        return _sync_loop
+
+def run_background(coro):
+    """Schedule a coroutine on the async engine, returning a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_sync_loop())
+
+def run_sync(coro):
+    """Run a coroutine of the async engine from synchronous code"""
+    return run_background(coro).result()
+
+# Static parts of the user messages. The node list is sorted so the prompt text
+# does not depend on set iteration order (hash randomization).
+generation_instructions = f"""Convert the user request below into a sequence of nodes that achieves the desired functionality.
+You are only allowed to use the nodes defined in the system message. They are:
+
+{NODE_LIST_TEXT}
+
+You must respond with a JSON object containing only a "sequence" key with an array of node names.
+
+Example format:
+{{
+    "sequence": ["OnClick", "FetchData", "DisplayModal"]
+}}
+
+Use only the node names defined in the system message. Ensure the sequence is logical and achieves the user's goal.
+"""
+
+# Validation only needs the node meanings and the verdict format, not the
+# generation examples, so it gets its own short system message.
+judge_system_message = f"""You check whether a sequence of nodes correctly fulfills a user's request.
+The sequence is valid if its nodes, in order, perform the steps the request asks for, starting with
+the triggering event if the request names one, with no missing or extra steps.
+
+Nodes:
+
+{CATALOG_TEXT}
+
+Answer with ONLY a JSON object with a single "valid" boolean key: {{"valid": true}} or {{"valid": false}}.
+"""
+
+# A verdict is a handful of tokens: cap the output and stop at the closing brace
+validation_options = {'num_predict': 12, 'stop': ['}']}
+
+def build_generation_messages(user_query, system_prompt=None):
+    """Build the chat messages asking the LLM for a node sequence.
+
+    The shared instructions come first and the user request last, so every
+    call starts with the same byte-identical prefix that Ollama can reuse.
+    """
+    return [
+        {"role": "system", "content": system_prompt or system_message},
+        {"role": "user", "content": f"{generation_instructions}\nUser request: {user_query}\n"}
+    ]
+
+def get_sequence_schema():
+    """JSON schema constraining generation to a sequence of known node names"""
+    return SEQUENCE_SCHEMA
+
+# JSON schema constraining validation to a single boolean verdict
+validation_schema = {
+    "type": "object",
+    "properties": {"valid": {"type": "boolean"}},
+    "required": ["valid"]
+}
+
+async def get_llm_response_async(user_query, selected_model, structured_output=False, system_prompt=None, stream=False, on_partial=None):
+    """Get node sequence from LLM, optionally constrained to the node schema.
+
+    With stream the response is parsed while it arrives: the call is aborted
+    with StreamAbort on the first unknown (and unrepairable) node or malformed
+    array and returns the parsed array as JSON once the array is closed.
+    on_partial is called with the sequence so far whenever a node completes.
     """
+    kwargs = {'format': get_sequence_schema()} if structured_output else {}
+    messages = build_generation_messages(user_query, system_prompt)
+    if not stream:
+        response = await chat_async(selected_model, messages, kind='generation', **kwargs)
+        return response['message']['content'].strip()
 
-    response = client.chat(
-        model=selected_model,
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
-    )
+    parser = SequenceStreamParser()
+
+    def on_content(text):
+        if parser.feed(text) and on_partial is not None:
+            on_partial(list(parser.nodes))
+        return parser.done
+
+    await chat_async(selected_model, messages, kind='generation', on_content=on_content, **kwargs)
+    result = parser.result()
+    record_repairs(parser.repairs)
+    return result
 
-    return response['message']['content'].strip()
+def get_llm_response(user_query, selected_model, structured_output=False, system_prompt=None, stream=False, on_partial=None):
+    """Get node sequence from LLM"""
+    return run_sync(get_llm_response_async(user_query, selected_model, structured_output, system_prompt, stream, on_partial))
 
 def parse_llm_response(content):
-    """Parse LLM response to extract node sequence"""
-    try:
-        # Clean up markdown formatting if present
-        if content.startswith('```json'):
-            content = content.replace('```json', '', 1)
-            content = content.replace('```', '', 1)
-        elif content.startswith('```python'):
-            content = content.replace('```python', '', 1)
-            content = content.replace('```', '', 1)
-        elif content.startswith('```'):
-            content = content.replace('```', '', 1)
-            content = content.replace('```', '', 1)
-            
+    """Parse LLM response to extract node sequence, repairing near-miss node names"""
+    node_sequence, repairs = extract_sequence(content)
+    record_repairs(repairs)
+    return node_sequence
+
+def build_validation_messages(user_query, node_sequence):
+    """Build the chat messages asking the LLM to judge a node sequence"""
+    user_message = (
+        f"Original User Request: \"{user_query}\"\n"
+        f"Generated Node Sequence: {json.dumps(list(node_sequence))}\n"
+    )
+
+    return [
+        {"role": "system", "content": judge_system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+def parse_validation_response(content):
+    """Parse the validation verdict, treating anything unparseable as invalid"""
+    content = content.strip()
+    if content.startswith('```json'):
+        content = content.replace('```json', '', 1)
+        content = content.replace('```', '', 1)
         content = content.strip()
-        
-        # First try parsing as JSON
-        try:
-            json_data = json.loads(content)
-            if isinstance(json_data, list):
-                return json_data
-            elif isinstance(json_data, dict) and 'sequence' in json_data:
-                return json_data['sequence']
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try evaluating as Python list
-            if content.startswith('[') and content.endswith(']'):
-                # Using ast.literal_eval is safer than eval()
-                import ast
-                return ast.literal_eval(content)
-            
-        raise ValueError("Invalid response format")
-    except Exception as e:
-        raise ValueError(f"Failed to parse response: {str(e)}")
 
-def validate_node_sequence(user_query, node_sequence, selected_model):
-    """Validate if the node sequence is appropriate for the user query"""
-    
-    user_message = f"""
-        Original User Request: "{user_query}"
-        Generated Node Sequence: {node_sequence}
+    # The closing brace is a stop sequence, so Ollama leaves it out
+    if content.startswith('{') and not content.endswith('}'):
+        content += '}'
 
-        Evaluate if this sequence correctly fulfills the user's request.
-        Return ONLY a JSON object with a single "valid" boolean key.
-        Example: {{"valid": true}}
-    """
+    validation_result = json.loads(content)
+    return validation_result.get('valid', False)
 
+async def validate_node_sequence_async(user_query, node_sequence, selected_model, structured_output=False):
+    """Validate if the node sequence is appropriate for the user query"""
+    messages = build_validation_messages(user_query, node_sequence)
     try:
-        response = client.chat(
-            model=selected_model,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
+        response = await chat_async(
+            selected_model, messages, kind='validation',
+            format=validation_schema if structured_output else 'json', options=validation_options
         )
-        
-        # Parse the response
-        content = response['message']['content'].strip()
-        if content.startswith('```json'):
-            content = content.replace('```json', '', 1)
-            content = content.replace('```', '', 1)
-        
-        validation_result = json.loads(content)
-        return validation_result.get('valid', False)
-        
+        valid = parse_validation_response(response['message']['content'])
     except Exception as e:
         return False
+    stats = current_query_stats.get()
+    if valid and stats is not None:
+        stats.llm_accepted.add(tuple(node_sequence))
+    return valid
+
+def validate_node_sequence(user_query, node_sequence, selected_model, structured_output=False):
+    """Validate if the node sequence is appropriate for the user query"""
+    return run_sync(validate_node_sequence_async(user_query, node_sequence, selected_model, structured_output))
+
+def _local_validation_slots(user_query, node_sequence, local_slots, validation_threshold, add_debug):
+    """Validation slots the structural validator fills: min(local_slots, threshold) if it accepts, else 0"""
+    if local_slots <= 0:
+        return 0
+    if not structural_validator.accepts(user_query, node_sequence):
+        add_debug("Structural check undecided, validating with the LLM", 'info')
+        return 0
+    filled = min(local_slots, validation_threshold)
+    record_local_validations(filled)
+    add_debug(f"Structural check passed: {filled}/{validation_threshold} validations filled locally", 'success')
+    return filled
+
+async def run_concurrent_validations_async(user_query, node_sequence, selected_model, validation_threshold, max_in_flight, add_debug, structured_output=False, local_slots=0):
+    """Run validations concurrently, stopping at the first failure.
+
+    At most max_in_flight validation calls are outstanding at once; with a cap
+    of 1 this is the serial loop. Once one returns false, the remaining
+    validations are cancelled, matching the "break on first failure" behavior.
+    Up to local_slots validations are filled by the structural validator
+    first if it accepts the sequence; they count as passed.
+    """
+    validations_passed = _local_validation_slots(user_query, node_sequence, local_slots, validation_threshold, add_debug)
+    submitted = validations_passed
+    pending = {}
+
+    def submit():
+        nonlocal submitted
+        submitted += 1
+        add_debug(f"Validation {submitted}/{validation_threshold}...", 'info')
+        task = asyncio.ensure_future(validate_node_sequence_async(
+            user_query, node_sequence, selected_model, structured_output
+        ))
+        pending[task] = submitted
+
+    try:
+        while submitted < min(validations_passed + max(max_in_flight, 1), validation_threshold):
+            submit()
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=pending.get):
+                validation_num = pending.pop(task)
+                if not task.result():
+                    add_debug(f"Validation {validation_num} failed", 'error')
+                    return validations_passed
+
+                validations_passed += 1
+                add_debug(f"Validation {validation_num} successful!", 'success')
+
+                if submitted < validation_threshold:
+                    submit()
+
+        return validations_passed
+    finally:
+        for task in pending:
+            task.cancel()
+
+def run_concurrent_validations(user_query, node_sequence, selected_model, validation_threshold, max_in_flight, add_debug, structured_output=False, local_slots=0):
+    """Run validations concurrently, stopping at the first failure"""
+    return run_sync(run_concurrent_validations_async(
+        user_query, node_sequence, selected_model, validation_threshold, max_in_flight, add_debug,
+        structured_output, local_slots
+    ))
 
 def get_available_nodes():
-    """Returns a set of all available node names"""
-    return {
-        # Event Nodes
-        "OnVariableChange", "OnKeyRelease", "OnKeyPress", "OnClick", 
-        "OnWindowResize", "OnMouseEnter", "OnMouseLeave", "OnTimer", "Delay",
-        
-        # Action Nodes
-        "Console", "Alert", "Log", "Assign", "SendRequest", "Navigate",
-        "Save", "Delete", "PlaySound", "PauseSound", "StopSound",
-        
-        # Transformation Nodes
-        "Branch", "Map", "Filter", "Reduce", "Sort", "GroupBy",
-        "Merge", "Split",
-        
-        # Display Nodes
-        "Show", "Hide", "Update", "DisplayModal", "CloseModal",
-        "Highlight", "Tooltip", "RenderChart",
-        
-        # Data Nodes
-        "FetchData", "StoreData", "UpdateData", "DeleteData", "CacheData"
-    }
+    """Returns the frozen set of all available node names"""
+    return NODE_NAMES
 
 def validate_node_names(node_sequence):
     """Validate if all nodes in the sequence are available nodes"""
-    available_nodes = get_available_nodes()
-    invalid_nodes = []
-    
-    for node in node_sequence:
-        if node not in available_nodes:
-            invalid_nodes.append(node)
-    
+    invalid_nodes = [node for node in node_sequence if node not in NODE_NAMES]
     return len(invalid_nodes) == 0, invalid_nodes
 
-def process_query(user_query, max_attempts=3, validation_threshold=3, selected_model=None, silent=False):
-    """Process user query with retry logic and multiple validations"""
-    attempt = 0
-    all_sequences = []
+def get_cache_stats():
+    """Returns hit/miss counters of the process_query result cache"""
+    return result_cache.stats()
+
+async def _warm_up_backend(backend, model):
+    """Load model on one host and prime its generation and validation prompt prefixes"""
+    report = {'host': backend.url, 'model': model, 'load_s': 0.0, 'duration_s': 0.0, 'error': None}
+    started = time.perf_counter()
+    try:
+        async with _get_host_semaphore(backend.url, backend.max_in_flight):
+            client = _get_async_client(backend.url)
+            for messages in (build_generation_messages("warm up"), build_validation_messages("warm up", [])):
+                call_started = time.perf_counter()
+                response = await client.chat(
+                    model=model, messages=messages, keep_alive=ollama_keep_alive, options={'num_predict': 1}
+                )
+                call = record_llm_call('warmup', model, 0.0, time.perf_counter() - call_started, response)
+                report['load_s'] += call['load_duration_s'] or 0.0
+    except Exception as e:
+        report['error'] = str(e) or type(e).__name__
+    report['duration_s'] = time.perf_counter() - started
+    return report
+
+async def warm_up_async(models, silent=False):
+    """Preload models on every Ollama host that serves them, before any user query.
+
+    Each host loads the models one after another (loading them at once would
+    only make them evict each other); hosts warm up in parallel. The request
+    is the real system prompt with a one-token answer, so Ollama also caches
+    the prompt prefix, and keep_alive holds the model in memory afterwards.
+    Returns one report per (host, model) with the load time Ollama measured.
+    Nothing is loaded when replaying a cassette.
+    """
+    if cassette is not None and cassette.mode == 'replay':
+        return []
+    await asyncio.gather(*[_check_backend(backend) for backend in backend_pool.backends])
+
+    async def warm_host(backend):
+        return [await _warm_up_backend(backend, model) for model in models if backend.serves(model)]
+
+    healthy = [backend for backend in backend_pool.backends if backend.healthy]
+    reports = [report for host_reports in await asyncio.gather(*[warm_host(b) for b in healthy]) for report in host_reports]
+    if not silent:
+        for report in reports:
+            if report['error']:
+                console.print(f"[red]❌ Warm-up of {report['model']} on {report['host']} failed: {report['error']}[/red]")
+            else:
+                console.print(
+                    f"[green]🔥 {report['model']} warm on {report['host']}: "
+                    f"loaded in {report['load_s']:.2f}s, ready after {report['duration_s']:.2f}s[/green]"
+                )
+        missing = set(models) - {report['model'] for report in reports if not report['error']}
+        if missing:
+            console.print(f"[yellow]⚠️ Not warm on any host: {', '.join(sorted(missing))}[/yellow]")
+    return reports
+
+def warm_up(models, silent=False):
+    """Synchronous version of warm_up_async"""
+    return run_sync(warm_up_async(models, silent))
+
+def warmed_up(models, reports):
+    """True if no warm-up report failed and every model is warm on some host"""
+    if cassette is not None and cassette.mode == 'replay':
+        return True
+    return not any(report['error'] for report in reports) and set(models) <= {report['model'] for report in reports}
+
+async def _retry_warm_up(models, ready, retry_s, silent):
+    while True:
+        if not silent:
+            console.print(f"[yellow]⚠️ Warm-up incomplete, retrying in {retry_s:g}s[/yellow]")
+        await asyncio.sleep(retry_s)
+        if warmed_up(models, await warm_up_async(models, silent)):
+            ready.set()
+            return
+
+def warm_up_until_ready(models, ready, retry_s=30, silent=False):
+    """Warm the models up and set the ready event once warmed_up.
+
+    The first attempt blocks; if it falls short, it is retried every retry_s
+    seconds on the async engine and the returned Future completes once ready
+    is set. Returns None when the first attempt succeeded.
+    """
+    if warmed_up(models, warm_up(models, silent)):
+        ready.set()
+        return None
+    return run_background(_retry_warm_up(models, ready, retry_s, silent))
+
+async def process_query_async(user_query, max_attempts=3, validation_threshold=3, selected_model=None, silent=False, use_cache=True, validation_concurrency=1, speculative_candidates=0, structured_output=False, return_stats=False, few_shot_k=0, use_fast_path=False, stream=False, on_partial=None, cascade=None, coalesce=True, local_validations=0, adaptive=None, exclude_exact_examples=False):
+    """Process user query, serving repeated queries from the result cache.
+
+    With validation_concurrency > 1 the validations of a candidate run
+    concurrently with at most that many calls in flight. With
+    speculative_candidates > 0 that many generations are fired at once and
+    only distinct candidates are validated, most frequent first. With
+    structured_output the responses are constrained by JSON schemas, so they
+    always parse and only contain known nodes. With return_stats a QueryStats
+    object with every timed LLM call is returned as a fourth element. With
+    few_shot_k > 0 the system message carries only the few_shot_k most similar
+    examples instead of all of them; exclude_exact_examples leaves out an
+    example identical to the query, so evaluations on the indexed test prompts
+    do not see their own answer. With use_fast_path a local classifier
+    answers first and the LLM is only called when it is not confident; its
+    answers count as validated and are not cached. With stream generations are
+    streamed and aborted early when they cannot be valid; on_partial is called
+    with the partial sequence of the current attempt as nodes arrive. With a
+    CascadePolicy as cascade, selected_model is ignored and the query runs on
+    the cascade tiers, cheapest first. With coalesce, a query identical to one
+    already in flight (same model, prompt and parameters) waits for that one's
+    result instead of calling the LLM itself; it gets no partial sequences.
+    With local_validations > 0 the structural validator fills up to that many
+    validation slots of a sequence it accepts; the rest, and all slots of a
+    sequence it is unsure about, go to the LLM. With an AdaptivePolicy as
+    adaptive, max_attempts and validation_threshold become upper bounds: a
+    candidate is accepted as soon as its posterior confidence from validations
+    and repeated generations reaches the target and at least one validation
+    passed it, and the query stops early
+    when candidates keep diverging or the policy's call or time budget runs
+    out, returning the majority answer unvalidated.
+    """
+    stats = QueryStats()
+    stats_token = current_query_stats.set(stats)
+    attempt_token = current_attempt.set(None)
+    outcome = 'failed'
+    try:
+        if cascade is not None:
+            cascade = CascadePolicy(tuple(cascade.tiers), *cascade[1:])
+            selected_model = cascade.tiers[0]
+        cache_key = make_cache_key(
+            selected_model if cascade is None else list(cascade),
+            user_query,
+            system_message,
+            max_attempts=max_attempts,
+            validation_threshold=validation_threshold,
+            speculative_candidates=speculative_candidates,
+            structured_output=structured_output,
+            few_shot_k=few_shot_k,
+            exclude_exact_examples=exclude_exact_examples,
+            local_validations=local_validations,
+            adaptive=list(adaptive) if adaptive is not None else None
+        )
+        cached = result_cache.get(cache_key) if use_cache else None
+        fast_sequence = None
+        if use_fast_path and cached is None:
+            fast_sequence = fast_path_classifier.classify(user_query)
+
+        if cached is not None:
+            stats.cache_hit = True
+            outcome = 'cache_hit'
+            node_sequence, was_validated = cached['sequence'], cached['validated']
+            debug_output = "" if silent else CACHE_HIT_MESSAGE
+        elif fast_sequence is not None:
+            stats.fast_path = True
+            outcome = 'fast_path'
+            node_sequence, was_validated = fast_sequence, True
+            debug_output = "" if silent else FAST_PATH_MESSAGE
+        else:
+            async def generate():
+                # Runs once per coalesced group, in the context of the first caller
+                if cascade is not None:
+                    result = await _run_cascade(
+                        user_query, max_attempts, validation_threshold, cascade, silent,
+                        validation_concurrency, speculative_candidates, structured_output,
+                        build_system_message(user_query, few_shot_k, exclude_exact_examples), stream, on_partial, stats, local_validations, adaptive
+                    )
+                else:
+                    stats.tier = selected_model
+                    result = await _run_query(
+                        user_query, max_attempts, validation_threshold, selected_model, silent,
+                        validation_concurrency, speculative_candidates, structured_output,
+                        build_system_message(user_query, few_shot_k, exclude_exact_examples), stream, on_partial,
+                        local_validations=local_validations, adaptive=adaptive
+                    )
+                return result + (stats.tier, stats.llm_calls)
+
+            if coalesce:
+                flight, shared = await query_flights.do((cache_key, silent), generate)
+            else:
+                flight, shared = await generate(), False
+            node_sequence, was_validated, debug_output, tier, leader_llm_calls = flight
+            if node_sequence is not None:
+                outcome = 'validated' if was_validated else 'fallback'
+
+            if shared:
+                stats.coalesced = True
+                stats.tier = tier
+                record_coalesced(leader_llm_calls)
+            # Only fully validated sequences are cached; fallbacks may improve on a retry
+            elif node_sequence is not None and was_validated:
+                if use_cache:
+                    result_cache.set(cache_key, {'sequence': node_sequence, 'validated': was_validated})
+                # Learning from answers only the local checks vouched for would feed them their own mistakes
+                if tuple(node_sequence) in stats.llm_accepted:
+                    fast_path_classifier.learn(user_query, node_sequence)
+                    structural_validator.learn(user_query, node_sequence)
+    finally:
+        current_attempt.reset(attempt_token)
+        current_query_stats.reset(stats_token)
+        stats.finish()
+        record_query(stats, outcome, stats.tier or selected_model)
+
+    if return_stats:
+        return node_sequence, was_validated, debug_output, stats
+    return node_sequence, was_validated, debug_output
+
+def process_query(user_query, max_attempts=3, validation_threshold=3, selected_model=None, silent=False, *, use_cache=True, validation_concurrency=1, speculative_candidates=0, structured_output=False, return_stats=False, few_shot_k=0, use_fast_path=False, stream=False, on_partial=None, cascade=None, coalesce=True, local_validations=0, adaptive=None, exclude_exact_examples=False):
+    """Process user query with retry logic and multiple validations.
+
+    Synchronous version of process_query_async; the options after silent are
+    keyword-only.
+    """
+    return run_sync(process_query_async(
+        user_query, max_attempts, validation_threshold, selected_model, silent,
+        use_cache=use_cache, validation_concurrency=validation_concurrency,
+        speculative_candidates=speculative_candidates, structured_output=structured_output,
+        return_stats=return_stats, few_shot_k=few_shot_k, use_fast_path=use_fast_path, stream=stream,
+        on_partial=on_partial, cascade=cascade, coalesce=coalesce, local_validations=local_validations,
+        adaptive=adaptive, exclude_exact_examples=exclude_exact_examples
+    ))
+
+async def process_queries_async(prompts, concurrency=8, **kwargs):
+    """Process many prompts concurrently, yielding results as they complete.
+
+    prompts can be any iterable, including a generator over a large file; it
+    is consumed lazily so at most `concurrency` queries are held at once.
+    Yields (index, sequence, validated, debug, error) tuples in completion
+    order, with the QueryStats inserted before error when return_stats=True is
+    passed. error is None, or the exception the query raised. Remaining
+    keyword arguments are passed to process_query_async.
+    """
+    prompt_iter = enumerate(prompts)
+    pending = set()
+
+    async def run_one(index, prompt):
+        try:
+            result = await process_query_async(prompt, **kwargs)
+        except Exception as e:
+            failed = (index, None, False, f"{QUERY_ERROR_PREFIX}{str(e)}")
+            return failed + ((None, e) if kwargs.get('return_stats') else (e,))
+        return (index,) + tuple(result) + (None,)
+
+    def fill():
+        while len(pending) < concurrency:
+            try:
+                index, prompt = next(prompt_iter)
+            except StopIteration:
+                return
+            pending.add(asyncio.ensure_future(run_one(index, prompt)))
+
+    try:
+        fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            # Keep the pipeline full while the caller handles finished results
+            fill()
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def process_queries(prompts, concurrency=8, **kwargs):
+    """Process many prompts concurrently, yielding results as they complete"""
+    results = process_queries_async(prompts, concurrency, **kwargs)
+    try:
+        while True:
+            try:
+                yield run_sync(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(results.aclose())
+
+def _debug_collector(silent):
+    """Returns an add_debug callback and the list of messages it collects"""
     debug_output = []
-    
+
     def add_debug(message, type='info'):
         if not silent:
             if type == 'success':
@@ -351,14 +919,64 @@ def process_query(user_query, max_attempts=3, validation_threshold=3, selected_m
                 color = 'blue'
             
             debug_output.append(f"{marker} {message}")
+
+    return add_debug, debug_output
+
+def _most_frequent_sequence(all_sequences, validation_threshold, max_attempts, add_debug, debug_output):
+    """Fall back to the most frequent generated sequence when none was validated"""
+    add_debug(f"Could not achieve {validation_threshold} validations in {max_attempts} attempts", 'warning')
+    add_debug("Analyzing most frequent sequence...", 'info')
+    
+    if all_sequences:
+        sequence_counts = Counter(all_sequences)
+        most_common_sequence = list(sequence_counts.most_common(1)[0][0])
+        
+        add_debug("Sequence Statistics:", 'info')
+        for seq, count in sequence_counts.items():
+            add_debug(f"Sequence {list(seq)}: {count} occurrences", 'info')
+        
+        return most_common_sequence, False, "\n".join(debug_output)
+    
+    return None, False, "\n".join(debug_output)
+
+async def _run_query(user_query, max_attempts, validation_threshold, selected_model, silent, validation_concurrency=1, speculative_candidates=0, structured_output=False, system_prompt=None, stream=False, on_partial=None, validation_model=None, all_sequences=None, local_validations=0, adaptive=None):
+    """Run the generation/validation loop with retry logic and multiple validations.
+
+    Validations use validation_model if given, else selected_model. Generated
+    candidates are appended to all_sequences if the caller passes a list.
+    With an AdaptivePolicy the loop is _run_adaptive_query instead.
+    """
+    if all_sequences is None:
+        all_sequences = []
+    if adaptive is not None:
+        return await _run_adaptive_query(
+            user_query, max_attempts, validation_threshold, selected_model, silent, validation_concurrency,
+            speculative_candidates, structured_output, system_prompt, stream, on_partial, validation_model,
+            all_sequences, local_validations, adaptive
+        )
+    if speculative_candidates > 0:
+        return await _run_speculative_query(
+            user_query, max_attempts, validation_threshold, selected_model,
+            silent, validation_concurrency, speculative_candidates, structured_output, system_prompt, stream,
+            validation_model, all_sequences, local_validations
+        )
+
+    attempt = 0
+    add_debug, debug_output = _debug_collector(silent)
     
     while attempt < max_attempts:
         attempt += 1
         add_debug(f"Attempt {attempt}/{max_attempts}", 'info')
             
+        current_attempt.set(attempt)
         try:
-            llm_response = get_llm_response(user_query, selected_model)
-            node_sequence = parse_llm_response(llm_response)
+            llm_response = await get_llm_response_async(
+                user_query, selected_model, structured_output, system_prompt, stream, on_partial
+            )
+            node_sequence, repairs = extract_sequence(llm_response)
+            if repairs:
+                record_repairs(repairs)
+                add_debug(f"Repaired node names: {', '.join(f'{old} -> {new}' for old, new in repairs)}", 'warning')
             
             nodes_valid, invalid_nodes = validate_node_names(node_sequence)
             if not nodes_valid:
@@ -371,17 +989,10 @@ def process_query(user_query, max_attempts=3, validation_threshold=3, selected_m
             add_debug("Generated Node Sequence:", 'info')
             add_debug(f"{str(node_sequence)}", 'info')
             
-            validations_passed = 0
-            for validation_num in range(1, validation_threshold + 1):
-                add_debug(f"Validation {validation_num}/{validation_threshold}...", 'info')
-                is_valid = validate_node_sequence(user_query, node_sequence, selected_model)
-                
-                if is_valid:
-                    validations_passed += 1
-                    add_debug(f"Validation {validation_num} successful!", 'success')
-                else:
-                    add_debug(f"Validation {validation_num} failed", 'error')
-                    break
+            validations_passed = await run_concurrent_validations_async(
+                user_query, node_sequence, validation_model or selected_model,
+                validation_threshold, validation_concurrency, add_debug, structured_output, local_validations
+            )
             
             if validations_passed == validation_threshold:
                 add_debug(f"All {validation_threshold} validations passed!", 'success')
@@ -392,105 +1003,489 @@ def process_query(user_query, max_attempts=3, validation_threshold=3, selected_m
         except Exception as e:
             add_debug(f"Error in attempt {attempt}: {str(e)}", 'error')
     
-    add_debug(f"Could not achieve {validation_threshold} validations in {max_attempts} attempts", 'warning')
-    add_debug("Analyzing most frequent sequence...", 'info')
-    
-    if all_sequences:
-        sequence_counts = Counter(all_sequences)
-        most_common_sequence = list(sequence_counts.most_common(1)[0][0])
-        
-        add_debug("Sequence Statistics:", 'info')
-        for seq, count in sequence_counts.items():
-            add_debug(f"Sequence {list(seq)}: {count} occurrences", 'info')
-        
-        return most_common_sequence, False, "\n".join(debug_output)
-    
-    return None, False, "\n".join(debug_output)
+    return _most_frequent_sequence(all_sequences, validation_threshold, max_attempts, add_debug, debug_output)
+
+async def _generate_candidate(user_query, selected_model, structured_output=False, attempt=None, system_prompt=None, stream=False, on_partial=None):
+    """Generate and parse one candidate sequence, returning (sequence, error)"""
+    current_attempt.set(attempt)
+    try:
+        llm_response = await get_llm_response_async(user_query, selected_model, structured_output, system_prompt, stream, on_partial)
+        node_sequence = parse_llm_response(llm_response)
+    except Exception as e:
+        return None, str(e)
+
+    nodes_valid, invalid_nodes = validate_node_names(node_sequence)
+    if not nodes_valid:
+        return None, f"Unknown nodes: {invalid_nodes}"
+    return tuple(node_sequence), None
+
+async def _run_speculative_query(user_query, max_attempts, validation_threshold, selected_model, silent, validation_concurrency, speculative_candidates, structured_output=False, system_prompt=None, stream=False, validation_model=None, all_sequences=None, local_validations=0):
+    """Generate candidates in parallel rounds and validate distinct ones by frequency.
+
+    Each round fires up to speculative_candidates generations at once, within
+    the max_attempts generation budget. Distinct candidates that pass
+    validate_node_names are validated once each, most frequent first.
+    """
+    if all_sequences is None:
+        all_sequences = []
+    validated_candidates = set()
+    attempts_used = 0
+    add_debug, debug_output = _debug_collector(silent)
+
+    while attempts_used < max_attempts:
+        round_size = min(speculative_candidates, max_attempts - attempts_used)
+        add_debug(f"Attempts {attempts_used + 1}-{attempts_used + round_size}/{max_attempts}: generating {round_size} candidates", 'info')
+        attempts_used += round_size
+
+        candidates = await asyncio.gather(*[
+            _generate_candidate(user_query, selected_model, structured_output, attempts_used - round_size + i + 1, system_prompt, stream)
+            for i in range(round_size)
+        ])
+        for node_sequence, error in candidates:
+            if node_sequence is None:
+                add_debug(f"Rejected candidate: {error}", 'error')
+            else:
+                all_sequences.append(node_sequence)
+
+        # Validate each distinct candidate once, most frequent first
+        for node_sequence, count in Counter(all_sequences).most_common():
+            if node_sequence in validated_candidates:
+                continue
+            validated_candidates.add(node_sequence)
+
+            add_debug(f"Validating candidate {list(node_sequence)} ({count} occurrences)", 'info')
+            validations_passed = await run_concurrent_validations_async(
+                user_query, list(node_sequence), validation_model or selected_model,
+                validation_threshold, validation_concurrency, add_debug, structured_output, local_validations
+            )
+            if validations_passed == validation_threshold:
+                add_debug(f"All {validation_threshold} validations passed!", 'success')
+                return list(node_sequence), True, "\n".join(debug_output)
+
+        if attempts_used < max_attempts:
+            add_debug("Retrying with new candidates...", 'warning')
+
+    return _most_frequent_sequence(all_sequences, validation_threshold, max_attempts, add_debug, debug_output)
+
+async def _validate_adaptively(user_query, node_sequence, beliefs, count, selected_model, structured_output, add_debug):
+    """Run count validations concurrently, feeding verdicts to beliefs until the candidate is decided"""
+    tasks = [
+        asyncio.ensure_future(validate_node_sequence_async(user_query, list(node_sequence), selected_model, structured_output))
+        for _ in range(count)
+    ]
+    try:
+        for next_verdict in asyncio.as_completed(tasks):
+            valid = await next_verdict
+            beliefs.add_verdict(node_sequence, valid)
+            add_debug(
+                f"Validation {beliefs.validations[node_sequence]} {'passed' if valid else 'failed'}: "
+                f"confidence {beliefs.confidence(node_sequence):.2f}",
+                'success' if valid else 'error'
+            )
+            if beliefs.decided(node_sequence):
+                return
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _run_adaptive_query(user_query, max_attempts, validation_threshold, selected_model, silent, validation_concurrency, speculative_candidates, structured_output, system_prompt, stream, on_partial, validation_model, all_sequences, local_validations, adaptive):
+    """Generate and validate until a candidate's posterior confidence reaches the policy's target.
+
+    Up to max_attempts generations (speculative_candidates at a time) and up to
+    validation_threshold validations per distinct candidate. Validations go to
+    the most confident undecided candidate, only as many at once as it still
+    needs to be accepted (capped by validation_concurrency), and stop as soon
+    as it is accepted or rejected. Without an accepted candidate the majority
+    answer is returned unvalidated.
+    """
+    beliefs = CandidateBeliefs(adaptive)
+    budget = QueryBudget(adaptive, current_query_stats.get() or QueryStats())
+    add_debug, debug_output = _debug_collector(silent)
+    validator_model = validation_model or selected_model
+    locally_checked = set()
+    stop_reason = 'attempts'
 
-def load_test_cases(json_file='test_prompts.json', max_tests = 100):
-    """Load test cases from JSON file"""
-    if max_tests > 100:
-        max_tests = 100
+    while True:
+        stop_reason = budget.exhausted() or stop_reason
+        if stop_reason != 'attempts':
+            break
+
+        open_candidates = beliefs.open_candidates(validation_threshold)
+        if open_candidates:
+            node_sequence = open_candidates[0]
+            if local_validations > 0 and node_sequence not in locally_checked:
+                locally_checked.add(node_sequence)
+                filled = _local_validation_slots(
+                    user_query, list(node_sequence), local_validations, beliefs.validations_needed(node_sequence), add_debug
+                )
+                for _ in range(filled):
+                    beliefs.add_verdict(node_sequence, True)
+            if not beliefs.decided(node_sequence):
+                count = min(
+                    beliefs.validations_needed(node_sequence), max(validation_concurrency, 1),
+                    validation_threshold - beliefs.validations[node_sequence], budget.calls_left()
+                )
+                add_debug(f"Validating {list(node_sequence)} (confidence {beliefs.confidence(node_sequence):.2f})", 'info')
+                await _validate_adaptively(
+                    user_query, node_sequence, beliefs, count, validator_model, structured_output, add_debug
+                )
+            if beliefs.accepted(node_sequence):
+                add_debug(f"Accepted with confidence {beliefs.confidence(node_sequence):.2f}", 'success')
+                record_adaptive_stop('accepted', beliefs.confidence(node_sequence))
+                return list(node_sequence), True, "\n".join(debug_output)
+            continue
+
+        if beliefs.diverging():
+            stop_reason = 'diverged'
+            add_debug(f"Stopping early: the last {beliefs.new_streak} candidates all differ", 'warning')
+            break
+        if beliefs.generations >= max_attempts:
+            break
+
+        round_size = int(min(max(speculative_candidates, 1), max_attempts - beliefs.generations, budget.calls_left()))
+        add_debug(f"Attempt {beliefs.generations + 1}/{max_attempts}", 'info')
+        candidates = await asyncio.gather(*[
+            _generate_candidate(
+                user_query, selected_model, structured_output, beliefs.generations + i + 1, system_prompt, stream,
+                on_partial if round_size == 1 else None
+            )
+            for i in range(round_size)
+        ])
+        for node_sequence, error in candidates:
+            beliefs.add_generation(node_sequence)
+            if node_sequence is None:
+                add_debug(f"Rejected candidate: {error}", 'error')
+                continue
+            all_sequences.append(node_sequence)
+            add_debug(f"Generated {list(node_sequence)} ({beliefs.counts[node_sequence]} occurrences)", 'info')
+
+    if stop_reason in ('call_budget', 'time_budget'):
+        add_debug(f"Stopping early: {stop_reason.replace('_', ' ')} exhausted", 'warning')
+    majority = beliefs.majority()
+    record_adaptive_stop(stop_reason, beliefs.confidence(majority) if majority is not None else None)
+    if majority is None:
+        return None, False, "\n".join(debug_output)
+    add_debug(f"Returning the majority answer {list(majority)} (confidence {beliefs.confidence(majority):.2f})", 'warning')
+    return list(majority), False, "\n".join(debug_output)
+
+async def _run_cascade(user_query, max_attempts, validation_threshold, cascade, silent, validation_concurrency, speculative_candidates, structured_output, system_prompt, stream, on_partial, stats, local_validations=0, adaptive=None):
+    """Run the query tier by tier, escalating on failed validations or disagreeing candidates.
+
+    A validated answer of an earlier tier is kept if a later tier fails to
+    validate; without any validated answer the last tier's fallback is used.
+    """
+    debug_sections = []
+    validated_result = None
+    fallback = None
+    for tier, model in enumerate(cascade.tiers):
+        last_tier = tier == len(cascade.tiers) - 1
+        attempts = max_attempts if last_tier else (cascade.tier_attempts or max_attempts)
+        stats.tier = model
+        if tier > 0:
+            stats.escalations += 1
+            record_escalation(cascade.tiers[tier - 1], model)
+
+        all_sequences = []
+        node_sequence, was_validated, debug_output = await _run_query(
+            user_query, attempts, validation_threshold, model, silent,
+            validation_concurrency, speculative_candidates, structured_output, system_prompt, stream,
+            on_partial, cascade.validation_model, all_sequences, local_validations, adaptive
+        )
+        if not silent:
+            debug_sections.append(f"🔀 Tier {tier + 1}/{len(cascade.tiers)}: {model}\n{debug_output}")
+
+        disagreement = len(set(all_sequences)) > 1
+        if was_validated:
+            validated_result = (node_sequence, model)
+            if last_tier or not (cascade.escalate_on_disagreement and disagreement):
+                break
+        elif node_sequence is not None:
+            fallback = node_sequence
+
+    debug_output = "\n".join(debug_sections)
+    if validated_result is not None:
+        node_sequence, stats.tier = validated_result
+        return node_sequence, True, debug_output
+    return fallback, False, debug_output
+
+def load_test_cases(json_file='test_prompts.json', max_tests = 100, shard=None, sample_rate=None, seed=0):
+    """Load test cases from a JSON array or JSON lines file (max_tests=0 loads all).
+
+    shard, sample_rate and seed select cases as in iter_test_cases; pass
+    iter_test_cases itself to run_tests to stream a large dataset instead.
+    """
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            test_cases = json.load(f)
-        if max_tests > 0:
-            test_cases = test_cases[:max_tests]
-        return test_cases
+        return list(iter_test_cases(json_file, shard, sample_rate, seed, max_tests))
     except Exception as e:
         console.print(f"[bold red]Error loading test cases: {str(e)}[/bold red]")
         return None
 
+def _error_message(error):
+    """Non-empty description of an exception, so error rows stay distinguishable"""
+    return str(error) or type(error).__name__
+
+def _test_result(test_case, node_sequence, was_validated, debug_output, stats=None, error=None):
+    """Build the result row of a single test case; error is the exception the query raised, if any"""
+    if error is not None:
+        return {
+            'prompt': test_case['User Prompt'],
+            'error': _error_message(error)
+        }
+
+    expected_sequence = test_case['Correct Output']
+    result = {
+        'prompt': test_case['User Prompt'],
+        'expected': expected_sequence,
+        'actual': node_sequence,
+        'passed': node_sequence == expected_sequence,
+        'validated': was_validated,
+        'cache_hit': debug_output.startswith(CACHE_HIT_MESSAGE),
+        'fast_path': debug_output.startswith(FAST_PATH_MESSAGE),
+        'error': None
+    }
+    if stats is not None:
+        result.update(
+            cache_hit=stats.cache_hit,
+            fast_path=stats.fast_path,
+            tier=stats.tier,
+            escalations=stats.escalations,
+            local_validations=stats.local_validations,
+            stop_reason=stats.stop_reason,
+            confidence=None if stats.confidence is None else round(stats.confidence, 3),
+            llm_calls=stats.llm_calls,
+            generation_calls=stats.generation_calls,
+            validation_calls=stats.validation_calls,
+            duration_s=round(stats.duration_s, 3)
+        )
+    return result
+
 def process_single_test(args):
     """Helper function to process a single test case"""
-    test_case, selected_model = args
+    test_case, selected_model, use_fast_path, cascade, local_validations, adaptive = args
     try:
-        node_sequence, was_validated, debug_output = process_query(
+        node_sequence, was_validated, debug_output, stats = process_query(
             test_case['User Prompt'],
             max_attempts=3,
             validation_threshold=3,
-            selected_model=selected_model
+            selected_model=selected_model,
+            return_stats=True,
+            use_fast_path=use_fast_path,
+            cascade=cascade,
+            local_validations=local_validations,
+            adaptive=adaptive
         )
-        
-        expected_sequence = test_case['Correct Output']
-        passed = node_sequence == expected_sequence
-        
-        return {
-            'prompt': test_case['User Prompt'],
-            'expected': expected_sequence,
-            'actual': node_sequence,
-            'passed': passed,
-            'validated': was_validated,
-            'error': None
-        }
+        return _test_result(test_case, node_sequence, was_validated, debug_output, stats)
     except Exception as e:
         return {
             'prompt': test_case['User Prompt'],
-            'error': str(e)
+            'error': _error_message(e)
         }
 
-def run_tests(test_cases, selected_model=None):
-    """Run tests in parallel and return performance metrics"""
-    if not test_cases:
+def _iter_test_results(test_cases, selected_model, executor, concurrency, use_fast_path=False, cascade=None, local_validations=0, adaptive=None):
+    """Yield test results as they complete using the chosen executor"""
+    if executor == 'process':
+        test_args = ((test_case, selected_model, use_fast_path, cascade, local_validations, adaptive) for test_case in test_cases)
+        with Pool(processes=concurrency) as pool:
+            yield from pool.imap_unordered(process_single_test, test_args)
+        return
+
+    # Only the cases of tests in flight are held, so test_cases can be a lazy iterator
+    in_flight = {}
+
+    def prompts():
+        for index, test_case in enumerate(test_cases):
+            in_flight[index] = test_case
+            yield test_case['User Prompt']
+
+    for index, node_sequence, was_validated, debug_output, stats, error in process_queries(
+        prompts(),
+        concurrency,
+        max_attempts=3,
+        validation_threshold=3,
+        selected_model=selected_model,
+        return_stats=True,
+        use_fast_path=use_fast_path,
+        cascade=cascade,
+        local_validations=local_validations,
+        adaptive=adaptive
+    ):
+        yield _test_result(in_flight.pop(index), node_sequence, was_validated, debug_output, stats, error)
+
+def run_tests(test_cases, selected_model=None, executor='async', concurrency=None, output_file='test_results.csv', metrics_file=None, use_fast_path=False, cascade=None, local_validations=0, adaptive=None):
+    """Run tests concurrently and return performance metrics.
+
+    The default 'async' executor interleaves all tests on one event loop with
+    `concurrency` tests in flight (default: backend_pool.capacity(), the
+    requests all hosts may have in flight). 'process' keeps the old
+    one-process-per-core pool. Each result is appended to output_file as soon as its test finishes.
+    If metrics_file is given, the metrics registry is dumped to it in Prometheus
+    text format at the end; with the 'process' executor it only covers the
+    parent process.
+    With use_fast_path the local classifier answers confident prompts; its hit
+    rate and accuracy are reported separately from the LLM path. With a
+    CascadePolicy as cascade, results['tiers'] has the cost and pass rate of
+    the tests answered by each model. local_validations and adaptive are
+    passed on to process_query. test_cases can be any iterable, such as
+    iter_test_cases over a large dataset; it is consumed lazily. Only running
+    totals (see new_test_totals) are kept in memory; the per-test rows are in
+    output_file.
+    """
+    test_cases = iter(test_cases)
+    first_case = next(test_cases, None)
+    if first_case is None:
         return None
-    
+    test_cases = itertools.chain([first_case], test_cases)
+    results = new_test_totals(cascade.tiers if cascade is not None else None)
+
+    if concurrency is None:
+        concurrency = cpu_count() if executor == 'process' else backend_pool.capacity()
+    console.print(f"[bold blue]Running tests with {concurrency} concurrent {executor} workers...[/bold blue]")
+
+    csv_file = open(output_file, 'w', newline='', encoding='utf-8') if output_file else None
+    try:
+        writer = None
+        if csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=TEST_RESULT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            csv_file.flush()
+
+        # Process results as they complete
+        for result in _iter_test_results(test_cases, selected_model, executor, concurrency, use_fast_path, cascade, local_validations, adaptive):
+            count_test_result(results, result)
+            if result.get('error') is not None:
+                console.print(f"[bold red]Error in test[/bold red]")
+            elif result['passed']:
+                console.print("Test: [bold green]PASSED[/bold green]")
+            else:
+                console.print("Test: [bold red]FAILED[/bold red]")
+
+            if writer:
+                writer.writerow(result)
+                csv_file.flush()
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    if metrics_file:
+        with open(metrics_file, 'w', encoding='utf-8') as f:
+            f.write(registry.to_prometheus())
+        console.print(f"[green]Metrics written to '{metrics_file}'[/green]")
+
+    results['output_file'] = output_file
+    return results
+
+def _parse_result_row(row):
+    """Turn a row of a run_tests CSV back into the result it was written from"""
+    result = {}
+    for field, value in row.items():
+        if field == 'error':
+            # Error rows are the ones without a verdict, whatever their message
+            result[field] = value or '' if not row.get('passed') else None
+        elif value is None or value == '':
+            result[field] = None
+        elif field in ('expected', 'actual'):
+            result[field] = ast.literal_eval(value)
+        elif field in ('passed', 'validated', 'cache_hit', 'fast_path'):
+            result[field] = value == 'True'
+        elif field in ('escalations', 'local_validations', 'llm_calls', 'generation_calls', 'validation_calls'):
+            result[field] = int(value)
+        elif field in ('confidence', 'duration_s'):
+            result[field] = float(value)
+        else:
+            result[field] = value
+    return result
+
+def merge_test_results(result_files, output_file='test_results.csv', tiers=None):
+    """Combine the result CSVs of several run_tests runs, e.g. one per shard.
+
+    The rows are copied to output_file as they are read. Returns the results
+    dict run_tests would have returned for all cases in one run, so
+    print_test_summary prints the same summary; pass the cascade tiers to
+    get results['tiers'].
+    """
+    if os.path.abspath(output_file) in {os.path.abspath(result_file) for result_file in result_files}:
+        raise ValueError(f"Merged output file {output_file} is also an input")
+    results = new_test_totals(tiers)
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=TEST_RESULT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result_file in result_files:
+            with open(result_file, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    writer.writerow(row)
+                    count_test_result(results, _parse_result_row(row))
+
+    results['output_file'] = output_file
+    return results
+
+def new_test_totals(tiers=None):
+    """Empty running totals of a test run; with the cascade tiers, results['tiers'] is kept too"""
     results = {
-        'total_tests': len(test_cases),
+        'total_tests': 0,
         'passed': 0,
         'failed': 0,
         'errors': 0,
-        'details': []
+        'validated': 0,
+        'cache_hits': 0,
+        'fast_path': 0,
+        'fast_path_passed': 0,
+        # Sum and maximum over the answered tests that reported their calls
+        'llm_calls': 0,
+        'max_llm_calls': None,
+        'local_validations': 0,
+        'validation_calls': 0,
+        'stop_reasons': Counter(),
     }
-
-    # Create arguments for each test case
-    test_args = [(test_case, selected_model) for test_case in test_cases]
-    
-    # Use number of CPU cores for parallel processing
-    num_processes = cpu_count()
-    console.print(f"[bold blue]Running tests using {num_processes} processes...[/bold blue]")
-    
-    # Run tests in parallel
-    with Pool(processes=num_processes) as pool:
-        test_results = list(pool.imap_unordered(process_single_test, test_args))
-    
-    # Process results
-    for result in test_results:
-        if 'error' in result and result['error'] is not None:
-            results['errors'] += 1
-            console.print(f"[bold red]Error in test[/bold red]")
-        else:
-            if result['passed']:
-                results['passed'] += 1
-                status = "[bold green]PASSED[/bold green]"
-            else:
-                results['failed'] += 1
-                status = "[bold red]FAILED[/bold red]"
-            console.print(f"Test: {status}")
-        
-        results['details'].append(result)
-    
+    if tiers:
+        results['tiers'] = {tier: _tier_summary() for tier in tiers}
     return results
 
+def _tier_summary():
+    return {'tests': 0, 'passed': 0, 'pass_rate': None, 'mean_llm_calls': None, 'mean_duration_s': None,
+            'escalated': 0, 'llm_calls': 0, 'duration_s': 0.0}
+
+def _count_tier(tier_summary, result):
+    tier_summary['tests'] += 1
+    tier_summary['passed'] += bool(result['passed'])
+    tier_summary['escalated'] += bool(result.get('escalations'))
+    tier_summary['llm_calls'] += result.get('llm_calls') or 0
+    tier_summary['duration_s'] += result.get('duration_s') or 0
+    count = tier_summary['tests']
+    tier_summary.update(
+        pass_rate=tier_summary['passed'] / count,
+        mean_llm_calls=tier_summary['llm_calls'] / count,
+        mean_duration_s=tier_summary['duration_s'] / count
+    )
+
+def count_test_result(results, result):
+    """Add one test result row to the running totals of new_test_totals"""
+    results['total_tests'] += 1
+    if result.get('error') is not None:
+        results['errors'] += 1
+        return
+    results['passed' if result['passed'] else 'failed'] += 1
+    results['validated'] += bool(result.get('validated'))
+    results['cache_hits'] += bool(result.get('cache_hit'))
+    if result.get('fast_path'):
+        results['fast_path'] += 1
+        results['fast_path_passed'] += bool(result['passed'])
+    if result.get('llm_calls') is not None:
+        results['llm_calls'] += result['llm_calls']
+        results['max_llm_calls'] = max(results['max_llm_calls'] or 0, result['llm_calls'])
+    results['local_validations'] += result.get('local_validations') or 0
+    results['validation_calls'] += result.get('validation_calls') or 0
+    if result.get('stop_reason'):
+        results['stop_reasons'][result['stop_reason']] += 1
+    if result.get('tier') in results.get('tiers', {}):
+        _count_tier(results['tiers'][result['tier']], result)
+
+def summarize_tiers(details, tiers):
+    """Per cascade tier: tests answered, pass rate, mean LLM calls and mean duration"""
+    results = new_test_totals(tiers)
+    for detail in details:
+        count_test_result(results, detail)
+    return results['tiers']
+
 def print_test_summary(results):
     """Print a summary of test results"""
     if not results:
@@ -512,15 +1507,95 @@ def print_test_summary(results):
     console.print(f"Passed: [green]{passed}[/green] ({pass_rate:.1f}%)")
     console.print(f"Failed: [red]{failed}[/red]")
     console.print(f"Errors: [yellow]{errors}[/yellow]")
-    
-    # Export results to CSV
-    df = pd.DataFrame(results['details'])
-    df.to_csv('test_results.csv', index=False)
-    console.print("\n[green]Test results exported to 'test_results.csv'[/green]")
 
-def main():
+    # Pool workers keep their own counters, so count hits from the per-test results
+    console.print(f"Cache Hits: [cyan]{results['cache_hits']}[/cyan]")
+
+    # The fast path and the LLM path are scored separately
+    answered = passed + failed
+    fast_path = results['fast_path']
+    if fast_path:
+        llm_path = answered - fast_path
+        llm_passed = passed - results['fast_path_passed']
+        console.print(
+            f"Fast Path: [cyan]{fast_path}[/cyan] hits ({fast_path / total * 100:.1f}%), "
+            f"accuracy {results['fast_path_passed'] / fast_path * 100:.1f}%"
+        )
+        if llm_path:
+            console.print(f"LLM Path: {llm_path} tests, accuracy {llm_passed / llm_path * 100:.1f}%")
+
+    # Cost next to accuracy, so budget policies can be compared
+    if results['max_llm_calls'] is not None:
+        console.print(
+            f"LLM Calls: {results['llm_calls'] / answered:.2f} per test "
+            f"(max {results['max_llm_calls']}), accuracy {pass_rate:.1f}%"
+        )
+    if results['stop_reasons']:
+        console.print("Adaptive Stops: " + ", ".join(f"{reason} {count}" for reason, count in results['stop_reasons'].most_common()))
+
+    if results['local_validations']:
+        validation_calls = results['validation_calls']
+        console.print(
+            f"Local Validations: [cyan]{results['local_validations']}[/cyan] slots filled without the LLM, "
+            f"{validation_calls} LLM validation calls ({validation_calls / max(answered, 1):.1f} per test)"
+        )
+
+    if results.get('tiers'):
+        console.print("\n[bold blue]Cascade Tiers[/bold blue]")
+        for tier, tier_summary in results['tiers'].items():
+            if not tier_summary['tests']:
+                console.print(f"{tier}: 0 tests")
+                continue
+            console.print(
+                f"{tier}: {tier_summary['tests']} tests ({tier_summary['escalated']} escalated), "
+                f"pass rate {tier_summary['pass_rate'] * 100:.1f}%, "
+                f"{tier_summary['mean_llm_calls']:.1f} LLM calls and {tier_summary['mean_duration_s']:.2f}s per test"
+            )
+
+    # run_tests writes results as they finish; there is nothing to export without an output file
+    if results.get('output_file'):
+        console.print(f"\n[green]Test results exported to '{results['output_file']}'[/green]")
+
+def _shard_arg(spec):
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Incari Node Sequence Generator')
+    parser.add_argument('--test', action='store_true', help='Evaluate a dataset and exit instead of prompting')
+    parser.add_argument('--dataset', default='test_prompts.json', help='JSON array or JSON lines file of test cases')
+    parser.add_argument('--shard', type=_shard_arg, help='Evaluate slice i of n, e.g. 2/4')
+    parser.add_argument('--sample', type=float, help='Keep each case with this probability')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of --sample')
+    parser.add_argument('--max-tests', type=int, default=0, help='Stop after this many cases (0: all)')
+    parser.add_argument('--model', default='qwen2.5-coder:7b')
+    parser.add_argument('--output', default='test_results.csv', help='Result CSV to write')
+    parser.add_argument('--merge', nargs='+', metavar='RESULT_CSV', help='Merge per-shard result CSVs into --output and print the summary')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.merge:
+        print_test_summary(merge_test_results(args.merge, args.output))
+        return
+    if args.test:
+        warm_up([args.model])
+        console.print(f"[bold blue]Evaluating {args.dataset}[/bold blue]" + (f" shard {args.shard[0] + 1}/{args.shard[1]}" if args.shard else ""))
+        results = run_tests(
+            iter_test_cases(args.dataset, args.shard, args.sample, args.seed, args.max_tests),
+            args.model, output_file=args.output, metrics_file=METRICS_FILE
+        )
+        print_test_summary(results)
+        return
+
     print("Incari Node Sequence Generator")
-    print("Type 'quit' to exit or 'test' to run tests")
+    print("Type 'quit' to exit, 'test' to run tests, 'cache' to show cache statistics or 'hosts' to show the Ollama hosts")
+    print("Type 'structured' to toggle schema-constrained output, 'fast' to toggle the local fast path")
+    print("Type 'local <n>' to let the structural validator fill up to n validations (or 'local off')")
+    print("Type 'adaptive' to stop at a target confidence instead of fixed budgets, 'adaptive <calls>' to also cap LLM calls per query (or 'adaptive off')")
+    print("Type 'cascade <n>,<m>,...' to escalate through models (or 'cascade off'), 'validator <n>' to validate with another model")
     print("-" * 50)
     
     models_llm = ['qwen2.5-coder:7b', 'qwen2.5-coder:14b', 'llama3.1:8b', 'codegemma:7b']
@@ -531,9 +1606,30 @@ def main():
     for i, model in enumerate(models_llm):
         print(f"{i+1}. {model}")
     print(f"\nCurrently using: {selected_model}")
+    warm_up([selected_model])
     
     max_attempts = 10
     validation_threshold = 5
+    structured_output = False
+    use_fast_path = False
+    local_validations = 0
+    adaptive = None
+    cascade_tiers = None
+    validation_model = None
+
+    def current_cascade():
+        # A separate validation model alone is a single-tier cascade
+        if cascade_tiers:
+            return CascadePolicy(cascade_tiers, validation_model, tier_attempts=max(1, max_attempts // 2))
+        if validation_model:
+            return CascadePolicy([selected_model], validation_model)
+        return None
+
+    def model_number(text):
+        number = int(text) - 1
+        if not 0 <= number < len(models_llm):
+            raise ValueError(text)
+        return models_llm[number]
     
     while True:
         user_input = input("\nDescribe what you want to achieve (or type 'model <number>' to switch models): ").strip()
@@ -546,7 +1642,9 @@ def main():
                 model_num = int(user_input.split()[1]) - 1
                 if 0 <= model_num < len(models_llm):
                     selected_model = models_llm[model_num]
-                    print(f"\nSwitched to model: {selected_model}")
+                    print(f"\nLoading model: {selected_model}")
+                    warm_up([selected_model])
+                    print(f"Switched to model: {selected_model}")
                 else:
                     print("\nInvalid model number. Please choose from the available models.")
             except (IndexError, ValueError):
@@ -557,9 +1655,81 @@ def main():
             console.print(f"[yellow]Using model: {selected_model}[/yellow]")
             test_cases = load_test_cases()
             if test_cases:
-                results = run_tests(test_cases, selected_model)
+                results = run_tests(
+                    test_cases, selected_model, use_fast_path=use_fast_path, cascade=current_cascade(),
+                    local_validations=local_validations, adaptive=adaptive, metrics_file=METRICS_FILE
+                )
                 print_test_summary(results)
             continue
+        elif user_input.lower() == 'structured':
+            structured_output = not structured_output
+            print(f"\nStructured output {'enabled' if structured_output else 'disabled'}")
+            continue
+        elif user_input.lower().startswith('cascade '):
+            argument = user_input.split(maxsplit=1)[1].strip()
+            if argument.lower() == 'off':
+                cascade_tiers = None
+                print("\nModel cascade disabled")
+                continue
+            try:
+                cascade_tiers = [model_number(number) for number in argument.split(',')]
+                print(f"\nModel cascade: {' -> '.join(cascade_tiers)}")
+                warm_up(cascade_tiers)
+            except ValueError:
+                print("\nInvalid input. Use 'cascade <number>,<number>' with model numbers, cheapest first.")
+            continue
+        elif user_input.lower().startswith('validator '):
+            argument = user_input.split(maxsplit=1)[1].strip()
+            try:
+                validation_model = None if argument.lower() == 'off' else model_number(argument)
+            except ValueError:
+                print("\nInvalid input. Use 'validator <number>' or 'validator off'.")
+                continue
+            print(f"\nValidation model: {validation_model or 'same as generation'}")
+            if validation_model:
+                warm_up([validation_model])
+            continue
+        elif user_input.lower() == 'fast':
+            use_fast_path = not use_fast_path
+            print(f"\nFast path {'enabled' if use_fast_path else 'disabled'}")
+            continue
+        elif user_input.lower().startswith('local '):
+            argument = user_input.split(maxsplit=1)[1].strip()
+            try:
+                local_validations = 0 if argument.lower() == 'off' else max(0, int(argument))
+            except ValueError:
+                print("\nInvalid input. Use 'local <number>' or 'local off'.")
+                continue
+            print(f"\nLocal validations: {local_validations or 'disabled'}")
+            continue
+        elif user_input.lower() == 'adaptive' or user_input.lower().startswith('adaptive '):
+            argument = user_input[len('adaptive'):].strip().lower()
+            try:
+                adaptive = None if argument == 'off' else AdaptivePolicy(max_calls=int(argument) if argument else None)
+            except ValueError:
+                print("\nInvalid input. Use 'adaptive', 'adaptive <calls>' or 'adaptive off'.")
+                continue
+            if adaptive is None:
+                print("\nAdaptive budgets disabled")
+            else:
+                print(f"\nAdaptive budgets: target confidence {adaptive.target_confidence}, call budget {adaptive.max_calls or 'none'}")
+            continue
+        elif user_input.lower() == 'cache':
+            stats = get_cache_stats()
+            console.print(
+                f"Cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['size']}/{stats['max_size']} entries"
+            )
+            continue
+        elif user_input.lower() == 'hosts':
+            for host in backend_pool.status():
+                state = "[green]healthy[/green]" if host['healthy'] else "[red]ejected[/red]"
+                models = ', '.join(host['models']) if host['models'] is not None else 'not checked yet'
+                console.print(
+                    f"{host['url']}: {state}, {host['in_flight']}/{host['max_in_flight']} in flight, "
+                    f"{host['requests']} requests, {host['failures']} failures, models: {models}"
+                )
+            continue
         elif not user_input:
             continue
             
@@ -568,7 +1738,12 @@ def main():
             max_attempts, 
             validation_threshold,
             selected_model,
-            silent=False
+            silent=False,
+            structured_output=structured_output,
+            use_fast_path=use_fast_path,
+            cascade=current_cascade(),
+            local_validations=local_validations,
+            adaptive=adaptive
         )
         if node_sequence:
             console.print(debug_output)
@@ -0,0 +1,66 @@
+import re
+
+from node_registry import is_node, repair_node_name
+
+# Where a node array can start: a bare array or the {"sequence": wrapper of structured output
+ARRAY_START = re.compile(r'''\{\s*["']sequence["']\s*:\s*\[|\[''')
+# One element of the array: a double- or single-quoted string, the closing bracket or a comma
+ARRAY_TOKEN = re.compile(r'''\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)'|(\])|,)''', re.S)
+ESCAPE = re.compile(r'\\(.)')
+
+
+def _scan_array(text, start):
+    """Read a flat array of quoted strings whose '[' is at start.
+
+    Returns (names, end) with end just past the ']', or (None, position) at
+    the first token that cannot be part of such an array. Strings may use
+    single or double quotes, so Python list reprs are accepted too.
+    """
+    names = []
+    position = start + 1
+    while True:
+        token = ARRAY_TOKEN.match(text, position)
+        if token is None:
+            return None, position
+        position = token.end()
+        if token.group(3):
+            return names, position
+        double, single = token.group(1), token.group(2)
+        if double is not None or single is not None:
+            name = double if double is not None else single
+            names.append(ESCAPE.sub(r'\1', name) if '\\' in name else name)
+
+
+def extract_sequence(content):
+    """Find the node sequence in an LLM response and repair near-miss node names.
+
+    Scans once for the first non-empty array of strings, bare or wrapped in
+    {"sequence": ...}, wherever it is: after chatter, inside a code fence in
+    the middle of the text or followed by an explanation. Each name that is
+    not a node but is close to one (see repair_node_name) is replaced.
+
+    Returns (sequence, repairs) where repairs lists (original, repaired)
+    pairs; names that cannot be repaired are kept so they fail validation.
+    Raises ValueError if there is no array.
+    """
+    position = 0
+    while True:
+        match = ARRAY_START.search(content, position)
+        if match is None:
+            raise ValueError("Failed to parse response: no node array found")
+        names, position = _scan_array(content, match.end() - 1)
+        if names:
+            break
+        position = max(position, match.end())
+
+    sequence = []
+    repairs = []
+    for name in names:
+        repaired = name if is_node(name) else repair_node_name(name)
+        if repaired is None:
+            sequence.append(name)
+        else:
+            if repaired != name:
+                repairs.append((name, repaired))
+            sequence.append(repaired)
+    return sequence, repairs
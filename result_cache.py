@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Normalize a prompt so trivially different spellings share a cache entry"""
+    return " ".join(prompt.split()).casefold()
+
+
+def make_cache_key(model, prompt, system_message, **params):
+    """Build a stable cache key from the model, prompt, system message and query parameters"""
+    system_hash = hashlib.sha256(system_message.encode('utf-8')).hexdigest()[:16]
+    payload = json.dumps(
+        {
+            'model': model,
+            'prompt': normalize_prompt(prompt),
+            'system': system_hash,
+            'params': params,
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier result cache: in-memory LRU with TTL, plus an optional sqlite tier.
+
+    The sqlite tier survives restarts and can be shared by several processes
+    (e.g. the `run_tests` pool workers) pointing at the same file.
+    """
+
+    def __init__(self, max_size=1024, ttl=86400, db_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self):
+        # sqlite connections must not be shared across fork, so reopen per process
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _expired(self, created, now):
+        return self.ttl is not None and self.ttl > 0 and now - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+
+            if self.db_path:
+                try:
+                    row = self._connection().execute(
+                        "SELECT value, created FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None and not self._expired(row[1], now):
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key in every configured tier"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self.db_path:
+                try:
+                    conn = self._connection()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), now)
+                    )
+                    if self.ttl:
+                        conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.memory_hits = self.disk_hits = self.evictions = 0
+            if self.db_path:
+                conn = self._connection()
+                conn.execute("DELETE FROM results")
+                conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
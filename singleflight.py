@@ -0,0 +1,60 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class _LeaderCancelled(Exception):
+    """The call that was running for a key was cancelled; waiting duplicates retry"""
+
+
+class Singleflight:
+    """Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller for a key runs it; callers arriving while it is in
+    flight wait for the same result (or exception) instead of running their
+    own. Results are shared through concurrent.futures.Future, so duplicates
+    are coalesced across event loops and threads. Nothing is kept once the
+    call finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.duplicates = 0
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    async def do(self, key, fn):
+        """Await fn() once per in-flight key; returns (result, shared)"""
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = concurrent.futures.Future()
+                else:
+                    self.duplicates += 1
+
+            if not leader:
+                try:
+                    # shield: a cancelled duplicate must not cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(future)), True
+                except _LeaderCancelled:
+                    continue
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    del self._calls[key]
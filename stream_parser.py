@@ -0,0 +1,80 @@
+import json
+
+from node_registry import is_node, repair_node_name
+
+
+class StreamAbort(ValueError):
+    """Raised when a streamed response can no longer become a valid node sequence"""
+
+
+class SequenceStreamParser:
+    """Incremental parser for a node sequence streamed as a JSON array.
+
+    Like extract_sequence, anything before the array is skipped: a code
+    fence, the {"sequence": wrapper or a sentence of chatter, and also a '['
+    that turns out not to start an array of strings. Once the array has a
+    node, anything that cannot continue it raises StreamAbort as soon as it
+    arrives, and so does every node name that is not in the registry and
+    cannot be repaired (see repair_node_name) once its closing quote is seen.
+    Repaired names are listed in repairs. Text after the closing bracket is
+    ignored.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.repairs = []
+        self.done = False
+        self._in_array = False
+        self._quote = None
+        self._name = []
+        self._escaped = False
+
+    def feed(self, text):
+        """Consume a chunk of the response; returns the node names completed by it"""
+        completed = []
+        for char in text:
+            if self.done:
+                break
+            if not self._in_array:
+                self._in_array = char == '['
+            elif self._quote:
+                self._feed_string(char, completed)
+            elif char in '"\'':
+                self._quote = char
+            elif char == ']':
+                # An empty array is skipped like any other text before the sequence
+                self.done = bool(self.nodes)
+                self._in_array = self.done
+            elif char != ',' and not char.isspace():
+                if self.nodes:
+                    raise StreamAbort(f"Unexpected {char!r} in node array")
+                # Not an array of strings after all; keep looking for one
+                self._in_array = char == '['
+        return completed
+
+    def _feed_string(self, char, completed):
+        if self._escaped:
+            self._name.append(char)
+            self._escaped = False
+        elif char == '\\':
+            self._escaped = True
+        elif char == self._quote:
+            name = ''.join(self._name)
+            self._quote = None
+            self._name = []
+            node = name if is_node(name) else repair_node_name(name)
+            if node is None:
+                raise StreamAbort(f"Unknown node: {name}")
+            if node != name:
+                self.repairs.append((name, node))
+            self.nodes.append(node)
+            completed.append(node)
+        else:
+            self._name.append(char)
+
+    def result(self):
+        """Returns the parsed sequence as a JSON array string; raises ValueError if incomplete"""
+        if not self.done:
+            missing = "incomplete node array" if self.nodes else "no node array found"
+            raise ValueError(f"Failed to parse response: {missing}")
+        return json.dumps(self.nodes)
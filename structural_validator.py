@@ -0,0 +1,77 @@
+import threading
+from collections import Counter
+
+from fast_path import rule_sequence, split_clauses
+from node_registry import category_of
+
+# Pseudo categories around every sequence, so start and end rules are transitions too
+START = 'Start'
+END = 'End'
+
+
+def category_path(sequence):
+    return [START] + [category_of(node) for node in sequence] + [END]
+
+
+class StructuralValidator:
+    """Local accept/undecided check of a node sequence against its prompt.
+
+    Built from known (prompt, sequence) pairs, it learns which category
+    transitions occur (Start -> Data -> Transformation -> Display -> End).
+    A sequence scores the product of:
+
+    - transitions: share of its category transitions seen min_count times
+    - coverage: share of the nodes the registry keywords find in the prompt
+      that are in the sequence (0 when the keywords find nothing)
+    - order: 1 if those nodes appear in the order the prompt mentions them
+    - extras: 1 if the nodes no keyword explains fit in the prompt's
+      unexplained steps
+    - distinct: 1 if no node is repeated
+
+    A score of at least threshold accepts the sequence; anything lower is
+    undecided (not rejected) and left to the LLM. Accepted results can be
+    fed back with learn().
+    """
+
+    def __init__(self, examples=(), threshold=1.0, min_count=1):
+        self.threshold = threshold
+        self.min_count = min_count
+        self._lock = threading.Lock()
+        self._transitions = Counter()
+        for prompt, sequence in examples:
+            self.learn(prompt, sequence)
+
+    def learn(self, prompt, sequence):
+        path = category_path(sequence)
+        if None in path:
+            return
+        with self._lock:
+            self._transitions.update(zip(path, path[1:]))
+
+    def explain(self, prompt, sequence):
+        """Returns the score components of a sequence for the prompt"""
+        path = category_path(sequence)
+        pairs = list(zip(path, path[1:]))
+        with self._lock:
+            seen = sum(1 for pair in pairs if self._transitions[pair] >= self.min_count)
+        mentioned = rule_sequence(prompt)
+        common = [node for node in sequence if node in mentioned]
+        extras = len(sequence) - len(common)
+        return {
+            'transitions': seen / len(pairs),
+            'coverage': len(set(common)) / len(mentioned) if mentioned else 0.0,
+            'order': float(common == [node for node in mentioned if node in common]),
+            'extras': float(extras <= max(0, len(split_clauses(prompt)) - len(mentioned))),
+            'distinct': float(len(set(sequence)) == len(sequence)),
+        }
+
+    def score(self, prompt, sequence):
+        if not sequence:
+            return 0.0
+        score = 1.0
+        for value in self.explain(prompt, sequence).values():
+            score *= value
+        return score
+
+    def accepts(self, prompt, sequence):
+        return self.score(prompt, sequence) >= self.threshold
@@ -2,9 +2,40 @@ import unittest
 from node_seq_gen import (
     process_query, 
     validate_node_names,
-    load_test_cases
+    load_test_cases,
+    run_concurrent_validations
 )
+from unittest import mock
+import asyncio
+import json
+from benchmarks.mock_ollama import MockConfig, MockOllamaServer
+from background_jobs import JobManager
+from backend_pool import BackendPool
+from cassette import Cassette, CassetteMiss
+import threading
+from few_shot import ExampleIndex
+from fast_path import FastPathClassifier, rule_sequence
+from stream_parser import SequenceStreamParser, StreamAbort
+from response_parser import extract_sequence
+from singleflight import Singleflight
+from eval_dataset import iter_test_cases, parse_shard
+from adaptive_budget import AdaptivePolicy, CandidateBeliefs
+from structural_validator import StructuralValidator
+from metrics import MetricsRegistry, QueryStats, registry
+import metrics
+import node_registry
+import node_seq_gen
+from result_cache import ResultCache, make_cache_key
+import inspect
+import io
+import os
+import subprocess
+import sys
+import tempfile
 import time
+import urllib.error
+import urllib.request
+from rich.console import Console
 
 class TestNodeSeqSystem(unittest.TestCase):
     def setUp(self):
@@ -73,6 +104,961 @@ class TestNodeSeqSystem(unittest.TestCase):
         print(f"Passed: {passed_cases} ({success_rate:.2f}%)")
         print(f"Average Time per Case: {avg_time:.2f}s")
         
-            
+
+class TestConcurrentValidation(unittest.TestCase):
+    def test_runs_concurrently_within_cap(self):
+        """Test that validations overlap but never exceed the in-flight cap"""
+        state = {'in_flight': 0, 'peak': 0}
+
+        async def fake_validate(user_query, node_sequence, selected_model, *args):
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+            await asyncio.sleep(0.05)
+            state['in_flight'] -= 1
+            return True
+
+        with mock.patch('node_seq_gen.validate_node_sequence_async', side_effect=fake_validate):
+            passed = run_concurrent_validations("q", ["Show"], "m", 5, 3, lambda *args: None)
+        self.assertEqual(passed, 5)
+        self.assertEqual(state['peak'], 3)
+
+    def test_stops_on_first_failure(self):
+        """Test that a failed validation stops the fan-out without waiting for stragglers"""
+        calls = []
+
+        async def fake_validate(user_query, node_sequence, selected_model, *args):
+            calls.append(1)
+            if len(calls) == 1:
+                return False
+            await asyncio.sleep(0.5)
+            return True
+
+        start = time.time()
+        with mock.patch('node_seq_gen.validate_node_sequence_async', side_effect=fake_validate):
+            passed = run_concurrent_validations("q", ["Show"], "m", 5, 5, lambda *args: None)
+        self.assertEqual(passed, 0)
+        self.assertLess(time.time() - start, 0.4)
+
+
+class TestAsyncEngine(unittest.TestCase):
+    def test_host_semaphore_caps_outstanding_requests(self):
+        """Test that concurrent queries share one loop but respect the per-host cap"""
+        state = {'in_flight': 0, 'peak': 0}
+
+        class FakeClient:
+            async def chat(self, model, messages, **kwargs):
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+                await asyncio.sleep(0.01)
+                state['in_flight'] -= 1
+                content = '{"valid": true}' if 'Generated Node Sequence' in messages[-1]['content'] else '["FetchData", "Show"]'
+                return {'message': {'content': content}}
+
+        async def run_all():
+            return await asyncio.gather(*[
+                node_seq_gen.process_query_async(f"query {i}", 2, 2, "m", silent=True, use_cache=False)
+                for i in range(10)
+            ])
+
+        with mock.patch('node_seq_gen._get_async_client', return_value=FakeClient()), \
+                mock.patch('node_seq_gen.backend_pool', BackendPool(["http://fake"], max_in_flight=2)):
+            results = asyncio.run(run_all())
+
+        self.assertTrue(all(result[0] == ["FetchData", "Show"] and result[1] for result in results))
+        self.assertEqual(state['peak'], 2)
+
+
+class TestBackendPool(unittest.TestCase):
+    def test_spreads_load_and_fails_over_to_healthy_hosts(self):
+        """Test that requests go to the least-loaded host, skip dead hosts and respect model inventory"""
+        config = MockConfig(latency_ms=20, accuracy=1.0, valid_rate=1.0, models=["m"], seed=0)
+        pool = BackendPool(["http://127.0.0.1:9"], eject_seconds=60)
+        with MockOllamaServer(config=config) as first, MockOllamaServer(config=config) as second, \
+                mock.patch('node_seq_gen.backend_pool', pool):
+            pool.backends += BackendPool([first.url, second.url]).backends
+
+            async def run_all():
+                return await asyncio.gather(*[
+                    node_seq_gen.chat_async("m", [{"role": "user", "content": f"Fetch data {i}"}], kind='generation')
+                    for i in range(8)
+                ])
+
+            responses = asyncio.run(run_all())
+            served = (first.state.snapshot()['generation'], second.state.snapshot()['generation'])
+
+        self.assertEqual(len(responses), 8)
+        self.assertEqual(served, (4, 4))
+        dead, healthy = pool.status()[0], pool.status()[1:]
+        self.assertFalse(dead['healthy'])
+        self.assertTrue(all(host['healthy'] and host['models'] == ["m:latest"] for host in healthy))
+        with self.assertRaises(node_seq_gen.ollama.ResponseError):
+            pool.acquire("other", exclude=[dead['url']])
+
+
+class TestWarmUp(unittest.TestCase):
+    def test_warm_up_loads_models_before_first_query(self):
+        """Test that warm-up pays the model load so the first query does not"""
+        config = MockConfig(latency_ms=1, load_ms=50, accuracy=1.0, valid_rate=1.0, models=["m"], seed=0)
+        with MockOllamaServer(config=config) as server, \
+                mock.patch('node_seq_gen.backend_pool', BackendPool([server.url])):
+            reports = node_seq_gen.warm_up(["m", "missing"], silent=True)
+            _, _, _, stats = process_query(
+                "Fetch data and show it", max_attempts=1, validation_threshold=1, selected_model="m",
+                silent=True, use_cache=False, return_stats=True
+            )
+
+        self.assertEqual([(report['model'], report['error']) for report in reports], [("m", None)])
+        self.assertGreaterEqual(reports[0]['load_s'], 0.05)
+        self.assertTrue(all(not call['load_duration_s'] for call in stats.calls))
+
+    def test_ready_only_after_a_clean_warm_up(self):
+        """Test that a failed warm-up leaves readiness unset and is retried"""
+        ready = threading.Event()
+        attempts = [[{'model': "m", 'error': "connection refused"}], [{'model': "m", 'error': None}]]
+
+        checked = threading.Event()
+
+        async def fake_warm_up(models, silent=False):
+            if len(attempts) == 1:
+                await asyncio.get_running_loop().run_in_executor(None, checked.wait, 5)
+            return attempts.pop(0)
+
+        with mock.patch('node_seq_gen.warm_up_async', side_effect=fake_warm_up):
+            retrying = node_seq_gen.warm_up_until_ready(["m"], ready, retry_s=0.01, silent=True)
+            self.assertFalse(ready.is_set())
+            checked.set()
+            retrying.result(timeout=5)
+
+        self.assertTrue(ready.is_set())
+        self.assertFalse(node_seq_gen.warmed_up(["m", "missing"], [{'model': "m", 'error': None}]))
+
+    def test_ready_endpoint_follows_readiness(self):
+        """Test that /ready answers 503 until readiness is reported"""
+        server = metrics.start_metrics_server(0, host='127.0.0.1')
+        url = f"http://127.0.0.1:{server.server_address[1]}/ready"
+        try:
+            with mock.patch.object(metrics, 'ready', threading.Event()):
+                with self.assertRaises(urllib.error.HTTPError) as error:
+                    urllib.request.urlopen(url)
+                self.assertEqual(error.exception.code, 503)
+                metrics.ready.set()
+                self.assertEqual(urllib.request.urlopen(url).status, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestSpeculativeGeneration(unittest.TestCase):
+    def test_validates_distinct_candidates_by_frequency(self):
+        """Test that duplicates are validated once and the most frequent candidate goes first"""
+        responses = iter([
+            '["FetchData", "Show"]',
+            '["FetchData", "Map", "Show"]',
+            '["FetchData", "Show"]',
+            '["NotANode"]',
+        ])
+        validated = []
+
+        async def fake_generate(user_query, selected_model, *args):
+            return next(responses)
+
+        async def fake_validate(user_query, node_sequence, selected_model, *args):
+            validated.append(list(node_sequence))
+            return node_sequence == ["FetchData", "Map", "Show"]
+
+        with mock.patch('node_seq_gen.get_llm_response_async', side_effect=fake_generate), \
+                mock.patch('node_seq_gen.validate_node_sequence_async', side_effect=fake_validate):
+            result, was_validated, _ = process_query(
+                "q", max_attempts=4, validation_threshold=2, selected_model="m",
+                silent=True, use_cache=False, speculative_candidates=4
+            )
+
+        self.assertEqual(result, ["FetchData", "Map", "Show"])
+        self.assertTrue(was_validated)
+        self.assertEqual(validated, [["FetchData", "Show"], ["FetchData", "Map", "Show"], ["FetchData", "Map", "Show"]])
+
+
+class TestStructuredOutput(unittest.TestCase):
+    def test_format_schema_is_passed(self):
+        """Test that structured mode sends the node enum and boolean schemas"""
+        calls = []
+
+        async def fake_chat(model, messages, **kwargs):
+            calls.append(kwargs.get('format'))
+            if 'Generated Node Sequence' in messages[-1]['content']:
+                return {'message': {'content': '{"valid": true}'}}
+            return {'message': {'content': '{"sequence": ["FetchData", "Show"]}'}}
+
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat):
+            result, was_validated, _ = process_query(
+                "q", max_attempts=1, validation_threshold=1, selected_model="m",
+                silent=True, use_cache=False, structured_output=True
+            )
+
+        self.assertEqual(result, ["FetchData", "Show"])
+        self.assertTrue(was_validated)
+        node_enum = calls[0]['properties']['sequence']['items']['enum']
+        self.assertIn("FetchData", node_enum)
+        self.assertEqual(calls[1]['properties']['valid']['type'], "boolean")
+
+
+class TestModelCascade(unittest.TestCase):
+    def test_escalates_when_cheap_tier_fails_validation(self):
+        """Test that a failed tier escalates and validations go to the validation model"""
+        calls = []
+
+        async def fake_chat(model, messages, kind='chat', **kwargs):
+            calls.append((kind, model))
+            if kind == 'validation':
+                return {'message': {'content': '{"valid": %s}' % str('FetchData' in messages[-1]['content']).lower()}}
+            sequence = ["Show"] if model == "small" else ["FetchData", "Show"]
+            return {'message': {'content': json.dumps(sequence)}}
+
+        cascade = node_seq_gen.CascadePolicy(["small", "big"], validation_model="judge", tier_attempts=1)
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat):
+            result, validated, _, stats = process_query(
+                "Fetch data and show it", max_attempts=2, validation_threshold=2,
+                silent=True, use_cache=False, return_stats=True, cascade=cascade
+            )
+
+        self.assertEqual(result, ["FetchData", "Show"])
+        self.assertTrue(validated)
+        self.assertEqual((stats.tier, stats.escalations), ("big", 1))
+        self.assertEqual([model for kind, model in calls if kind == 'generation'], ["small", "big"])
+        self.assertEqual({model for kind, model in calls if kind == 'validation'}, {"judge"})
+
+        summary = node_seq_gen.summarize_tiers(
+            [{'tier': 'big', 'passed': True, 'llm_calls': 4, 'duration_s': 1.0, 'escalations': 1, 'error': None}],
+            cascade.tiers
+        )
+        self.assertEqual(summary['small']['tests'], 0)
+        self.assertEqual((summary['big']['pass_rate'], summary['big']['escalated']), (1.0, 1))
+
+
+class TestQueryCoalescing(unittest.TestCase):
+    def test_identical_concurrent_queries_share_one_flight(self):
+        """Test that identical in-flight queries run the LLM once and share the result"""
+        calls = []
+
+        async def fake_chat(model, messages, kind='chat', **kwargs):
+            calls.append(kind)
+            await asyncio.sleep(0.05)
+            if kind == 'validation':
+                return {'message': {'content': '{"valid": true}'}}
+            return {'message': {'content': '["FetchData", "Show"]'}}
+
+        async def run_all():
+            return await asyncio.gather(*(
+                node_seq_gen.process_query_async(
+                    "Fetch data and show it", validation_threshold=1, selected_model="m",
+                    silent=True, use_cache=False, return_stats=True
+                ) for _ in range(4)
+            ))
+
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat):
+            results = asyncio.run(run_all())
+
+        self.assertEqual(calls.count('generation'), 1)
+        self.assertEqual({tuple(result[0]) for result in results}, {("FetchData", "Show")})
+        self.assertEqual(sum(result[3].coalesced for result in results), 3)
+        self.assertEqual(node_seq_gen.query_flights.in_flight(), 0)
+
+    def test_followers_retry_when_leader_is_cancelled(self):
+        """Test that waiting duplicates run the call themselves if the leader is cancelled"""
+        flights = Singleflight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return len(runs)
+
+        async def scenario():
+            leader = asyncio.ensure_future(flights.do("key", work))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(flights.do("key", work))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(scenario()), (2, False))
+
+
+class TestAdaptiveBudget(unittest.TestCase):
+    def test_posterior_needs_fewer_validations_with_agreement(self):
+        """Test that repeated candidates need fewer validations and a failed one is dropped"""
+        beliefs = CandidateBeliefs(AdaptivePolicy())
+        beliefs.add_generation(("FetchData", "Show"))
+        self.assertEqual(beliefs.validations_needed(("FetchData", "Show")), 2)
+        beliefs.add_generation(("FetchData", "Show"))
+        self.assertEqual(beliefs.validations_needed(("FetchData", "Show")), 1)
+        # Agreement alone never accepts without a passing validation
+        beliefs.add_generation(("FetchData", "Show"))
+        self.assertFalse(beliefs.accepted(("FetchData", "Show")))
+        self.assertEqual(beliefs.validations_needed(("FetchData", "Show")), 1)
+        beliefs.add_generation(("OnClick", "PlaySound"))
+        beliefs.add_verdict(("OnClick", "PlaySound"), False)
+        self.assertTrue(beliefs.rejected(("OnClick", "PlaySound")))
+        self.assertEqual(beliefs.majority(), ("FetchData", "Show"))
+
+    def test_stops_on_divergence_and_budget(self):
+        """Test that diverging candidates and the call budget stop the query early"""
+        answers = iter(['["FetchData", "Show"]', '["OnClick", "PlaySound"]', '["FetchData", "Sort", "Show"]'] * 5)
+
+        async def fake_chat(model, messages, kind='chat', **kwargs):
+            metrics.record_llm_call(kind, model, 0.0, 0.0)
+            if kind == 'validation':
+                return {'message': {'content': '{"valid": false}'}}
+            return {'message': {'content': next(answers)}}
+
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat):
+            node_sequence, was_validated, _, stats = node_seq_gen.process_query(
+                "Fetch data and show it", max_attempts=10, validation_threshold=5, selected_model="m",
+                silent=True, use_cache=False, return_stats=True, adaptive=AdaptivePolicy()
+            )
+            self.assertEqual((node_sequence, was_validated, stats.stop_reason), (["FetchData", "Show"], False, 'diverged'))
+            self.assertEqual((stats.generation_calls, stats.validation_calls), (3, 3))
+
+            stats = node_seq_gen.process_query(
+                "Fetch data and show it", max_attempts=10, validation_threshold=5, selected_model="m",
+                silent=True, use_cache=False, return_stats=True, adaptive=AdaptivePolicy(max_calls=2)
+            )[3]
+            self.assertEqual((stats.llm_calls, stats.stop_reason), (2, 'call_budget'))
+
+
+class TestPromptConstruction(unittest.TestCase):
+    def test_prompt_is_stable_across_hash_seeds(self):
+        """Test that the generation prompt does not depend on set iteration order"""
+        script = (
+            "import hashlib, json, node_seq_gen; "
+            "print(hashlib.sha256(json.dumps(node_seq_gen.build_generation_messages('q')).encode()).hexdigest())"
+        )
+        digests = set()
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            output = subprocess.run(
+                [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True
+            ).stdout
+            digests.add(output.strip())
+        self.assertEqual(len(digests), 1)
+
+    def test_user_query_comes_last(self):
+        """Test that prompts for different queries share everything but the tail"""
+        first = node_seq_gen.build_generation_messages("Fetch data")
+        second = node_seq_gen.build_generation_messages("Play a sound")
+        self.assertEqual(first[0], second[0])
+        prefix = os.path.commonprefix([first[1]['content'], second[1]['content']])
+        self.assertTrue(prefix.endswith("User request: "))
+
+
+class TestValidationPrompt(unittest.TestCase):
+    def test_validation_uses_compact_judge_prompt(self):
+        """Test that validation calls send the short judge prompt with capped JSON output"""
+        calls = []
+
+        async def fake_chat(model, messages, **kwargs):
+            calls.append((messages, kwargs))
+            return {'message': {'content': '{"valid": true'}}
+
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat):
+            self.assertTrue(node_seq_gen.validate_node_sequence("Fetch data", ["FetchData"], "m"))
+
+        messages, kwargs = calls[0]
+        self.assertIs(messages[0]['content'], node_seq_gen.judge_system_message)
+        self.assertLess(len(node_seq_gen.judge_system_message), len(node_seq_gen.system_message) / 2)
+        self.assertNotIn("User Prompt:", node_seq_gen.judge_system_message)
+        self.assertEqual(kwargs['format'], 'json')
+        self.assertLessEqual(kwargs['options']['num_predict'], 16)
+        self.assertFalse(node_seq_gen.parse_validation_response('```json\n{"valid": false}\n```'))
+
+
+class TestProcessQueries(unittest.TestCase):
+    def test_streams_in_completion_order_with_bounded_parallelism(self):
+        """Test lazy consumption, the concurrency bound and completion-order results"""
+        state = {'in_flight': 0, 'peak': 0, 'pulled': 0}
+
+        def prompts():
+            for delay in [0.08, 0.01, 0.05, 0.02, 0.03]:
+                state['pulled'] += 1
+                yield str(delay)
+
+        async def fake_process_query(prompt, **kwargs):
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+            await asyncio.sleep(float(prompt))
+            state['in_flight'] -= 1
+            return [prompt], True, ""
+
+        with mock.patch('node_seq_gen.process_query_async', side_effect=fake_process_query):
+            results = node_seq_gen.process_queries(prompts(), concurrency=2)
+            first = next(results)
+            self.assertLessEqual(state['pulled'], 3)
+            rest = list(results)
+
+        self.assertEqual(first[0], 1)
+        self.assertEqual(sorted(index for index, _, _, _, _ in [first] + rest), [0, 1, 2, 3, 4])
+        self.assertEqual(state['peak'], 2)
+
+    def test_errors_are_reported_explicitly(self):
+        """Test that a raised query is an error row and error-looking debug output is not"""
+        async def fake_process_query(prompt, **kwargs):
+            if prompt == "raises":
+                raise RuntimeError()
+            stats = QueryStats()
+            stats.finish()
+            return ["Log"], True, node_seq_gen.QUERY_ERROR_PREFIX + "model said so", stats
+
+        cases = [{"User Prompt": "raises", "Correct Output": ["Log"]},
+                 {"User Prompt": "prints", "Correct Output": ["Log"]}]
+        with mock.patch('node_seq_gen.process_query_async', side_effect=fake_process_query):
+            rows = {row['prompt']: row for row in node_seq_gen._iter_test_results(cases, "m", 'async', 2)}
+
+        self.assertEqual(rows["raises"]['error'], "RuntimeError")
+        self.assertIsNone(rows["prints"]['error'])
+        self.assertTrue(rows["prints"]['passed'])
+
+
+    def test_sync_wrapper_forwards_every_option(self):
+        """Test that process_query keeps silent positional and forwards its keyword-only options"""
+        seen = []
+
+        async def fake_process_query(*args, **kwargs):
+            seen.append((args, kwargs))
+            return None, False, ""
+
+        with mock.patch('node_seq_gen.process_query_async', side_effect=fake_process_query):
+            node_seq_gen.process_query("q", 1, 2, "m", True, adaptive="policy")
+            with self.assertRaises(TypeError):
+                node_seq_gen.process_query("q", 1, 2, "m", True, False)
+
+        args, kwargs = seen[0]
+        self.assertEqual(args, ("q", 1, 2, "m", True))
+        self.assertEqual((kwargs['adaptive'], kwargs['use_cache']), ("policy", True))
+        self.assertEqual(set(kwargs), set(inspect.signature(node_seq_gen.process_query_async).parameters) - {
+            'user_query', 'max_attempts', 'validation_threshold', 'selected_model', 'silent'
+        })
+
+
+class TestRunTests(unittest.TestCase):
+    def test_results_are_appended_as_tests_finish(self):
+        """Test that each finished test is on disk before the run completes"""
+        test_cases = [
+            {"User Prompt": "first", "Correct Output": ["FetchData", "Show"]},
+            {"User Prompt": "second", "Correct Output": ["Log"]},
+        ]
+        rows_seen = []
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, "results.csv")
+
+            # Set when run_tests asks for the next result, i.e. after it wrote the previous one
+            released = threading.Event()
+            real_process_queries = node_seq_gen.process_queries
+
+            def tracking_process_queries(*args, **kwargs):
+                for item in real_process_queries(*args, **kwargs):
+                    yield item
+                    released.set()
+
+            async def fake_process_query(prompt, **kwargs):
+                if prompt == "second":
+                    self.assertTrue(await asyncio.get_running_loop().run_in_executor(None, released.wait, 5))
+                with open(output_file, encoding='utf-8') as f:
+                    rows_seen.append(len(f.readlines()))
+                stats = QueryStats()
+                stats.finish()
+                return ["FetchData", "Show"], True, "", stats
+
+            with mock.patch('node_seq_gen.process_query_async', side_effect=fake_process_query), \
+                    mock.patch('node_seq_gen.process_queries', side_effect=tracking_process_queries):
+                results = node_seq_gen.run_tests(
+                    test_cases, "m", concurrency=1, output_file=output_file,
+                    metrics_file=os.path.join(tmp, "metrics.prom")
+                )
+
+            with open(output_file, encoding='utf-8') as f:
+                lines = f.readlines()
+
+        self.assertEqual(rows_seen, [1, 2])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual((results['passed'], results['failed'], results['errors']), (1, 1, 0))
+
+
+    def test_default_concurrency_is_backend_capacity(self):
+        """Test that run_tests keeps every host's request slots busy by default"""
+        seen = []
+
+        def fake_iter_test_results(test_cases, selected_model, executor, concurrency, *args):
+            seen.append(concurrency)
+            return iter(())
+
+        pool = BackendPool([("http://a", 3), ("http://b", 5)])
+        with mock.patch('node_seq_gen.backend_pool', pool), \
+                mock.patch('node_seq_gen._iter_test_results', side_effect=fake_iter_test_results):
+            node_seq_gen.run_tests([{"User Prompt": "p", "Correct Output": []}], "m", output_file=None)
+
+        self.assertEqual(seen, [8])
+
+
+class TestEvalDataset(unittest.TestCase):
+    def test_streams_shards_and_samples_both_formats(self):
+        """Test that JSON and JSON lines stream the same cases and shards partition the sampled set"""
+        with open('test_prompts.json', encoding='utf-8') as f:
+            cases = json.load(f)
+        with tempfile.TemporaryDirectory() as tmp:
+            lines_file = os.path.join(tmp, "cases.jsonl")
+            with open(lines_file, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(case) + "\n" for case in cases)
+            with mock.patch('eval_dataset.CHUNK_SIZE', 7):
+                self.assertEqual(list(iter_test_cases('test_prompts.json')), cases)
+            self.assertEqual(list(iter_test_cases(lines_file)), cases)
+            self.assertEqual(len(load_test_cases(lines_file, max_tests=0)), len(cases))
+
+            sampled = list(iter_test_cases(lines_file, sample_rate=0.5, seed=3))
+            shards = [list(iter_test_cases('test_prompts.json', (i, 3), 0.5, 3)) for i in range(3)]
+        self.assertEqual(sorted(map(json.dumps, sum(shards, []))), sorted(map(json.dumps, sampled)))
+        self.assertEqual(parse_shard("2/3"), (1, 3))
+        with self.assertRaises(ValueError):
+            parse_shard("4/3")
+
+    def test_merged_shards_summarize_like_one_run(self):
+        """Test that merging per-shard result files gives the summary of the full run"""
+        async def fake_process_query(prompt, **kwargs):
+            stats = QueryStats()
+            stats.calls.append({'kind': 'generation'})
+            stats.finish()
+            if "chart" in prompt:
+                raise RuntimeError("backend down")
+            return (["FetchData", "Show"] if len(prompt) % 2 else ["Log"]), True, "", stats
+
+        def summary(results):
+            output = io.StringIO()
+            with mock.patch.object(node_seq_gen, 'console', Console(file=output, width=200)):
+                node_seq_gen.print_test_summary(results)
+            return output.getvalue().rsplit("Test results exported", 1)[0]
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('node_seq_gen.process_query_async', side_effect=fake_process_query):
+            def run(shard, name):
+                return node_seq_gen.run_tests(
+                    iter_test_cases('test_prompts.json', shard, max_tests=0), "m", concurrency=4,
+                    output_file=os.path.join(tmp, name), metrics_file=None
+                )
+            full = run(None, "full.csv")
+            shard_files = [os.path.join(tmp, f"shard{i}.csv") for i in range(3)]
+            for i in range(3):
+                run((i, 3), f"shard{i}.csv")
+            merged = node_seq_gen.merge_test_results(shard_files, os.path.join(tmp, "merged.csv"))
+
+        self.assertGreater(full['errors'], 0)
+        self.assertEqual(
+            {key: merged[key] for key in ('total_tests', 'passed', 'failed', 'errors')},
+            {key: full[key] for key in ('total_tests', 'passed', 'failed', 'errors')}
+        )
+        self.assertEqual(summary(merged), summary(full))
+        self.assertNotIn('details', full)
+        # A row without a verdict is an error even if its message is empty
+        row = dict.fromkeys(node_seq_gen.TEST_RESULT_FIELDS, '')
+        self.assertEqual(node_seq_gen._parse_result_row({**row, 'prompt': "p"})['error'], '')
+        self.assertIsNone(node_seq_gen._parse_result_row({**row, 'passed': 'False'})['error'])
+
+
+class TestMockOllamaPipeline(unittest.TestCase):
+    def test_process_query_against_mock_server(self):
+        """Test the full HTTP path of the pipeline against the mock Ollama server"""
+        config = MockConfig(latency_ms=1, accuracy=1.0, valid_rate=1.0, models=["m"], seed=0)
+        with MockOllamaServer(config=config) as server, mock.patch('node_seq_gen.backend_pool', BackendPool([server.url])):
+            result, validated, _ = process_query(
+                "Fetch data, reduce the results to a single count, and then log that count.",
+                max_attempts=2, validation_threshold=2, selected_model="m", silent=True, use_cache=False
+            )
+            counts = server.state.snapshot()
+
+        self.assertEqual(result, ["FetchData", "Reduce", "Log"])
+        self.assertTrue(validated)
+        self.assertEqual((counts['generation'], counts['validation']), (1, 2))
+
+    def test_structured_output_can_be_cut_off(self):
+        """Test that the mock's truncated structured generations are retried as parse failures"""
+        config = MockConfig(latency_ms=1, accuracy=1.0, valid_rate=1.0, structured_malformed_rate=1.0, models=["m"], seed=0)
+        with MockOllamaServer(config=config) as server, mock.patch('node_seq_gen.backend_pool', BackendPool([server.url])):
+            result, _, debug_output = process_query(
+                "Fetch data and show it", max_attempts=2, validation_threshold=1, selected_model="m",
+                use_cache=False, structured_output=True
+            )
+            counts = server.state.snapshot()
+
+        self.assertIsNone(result)
+        self.assertEqual((counts['generation'], counts['malformed'], counts['validation']), (2, 2, 0))
+        self.assertEqual(debug_output.count("Error in attempt"), 2)
+
+
+class TestCassette(unittest.TestCase):
+    def test_replay_reproduces_recorded_run_offline(self):
+        """Test that a recorded run replays to the same results without an Ollama host"""
+        cases = load_test_cases(max_tests=4)
+        config = MockConfig(latency_ms=1, accuracy=0.5, valid_rate=0.7, malformed_rate=0.2, models=["m"], seed=1)
+
+        def run(stream):
+            return [
+                process_query(case["User Prompt"], max_attempts=3, validation_threshold=2, selected_model="m",
+                              silent=True, use_cache=False, return_stats=True, stream=stream)
+                for case in cases
+            ]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calls.cassette")
+            recorder = Cassette(path, mode='record')
+            with MockOllamaServer(config=config) as server, \
+                    mock.patch('node_seq_gen.backend_pool', BackendPool([server.url])), \
+                    mock.patch('node_seq_gen.cassette', recorder):
+                recorded = run(stream=True)
+            recorder.close()
+
+            player = Cassette(path, mode='replay')
+            with mock.patch('node_seq_gen.backend_pool', BackendPool(["http://127.0.0.1:9"])), \
+                    mock.patch('node_seq_gen.cassette', player):
+                replayed = run(stream=True)
+                with self.assertRaises(CassetteMiss):
+                    node_seq_gen.run_sync(node_seq_gen.chat_async("m", [{"role": "user", "content": "never recorded"}]))
+            player.close()
+
+        self.assertEqual([result[:2] for result in replayed], [result[:2] for result in recorded])
+        self.assertEqual([result[3].llm_calls for result in replayed], [result[3].llm_calls for result in recorded])
+
+
+class TestStreamingGeneration(unittest.TestCase):
+    def test_parser_accepts_split_chunks_and_aborts_early(self):
+        """Test incremental parsing across chunk boundaries, skipped chatter and the early abort cases"""
+        parser = SequenceStreamParser()
+        completed = [parser.feed(chunk) for chunk in ['```js', 'on\n{"sequence": ["Fet', 'chData", "Sh', 'ow"]}', '\n```']]
+        self.assertEqual(completed, [[], [], ["FetchData"], ["Show"], []])
+        self.assertEqual(parser.result(), '["FetchData", "Show"]')
+
+        parser = SequenceStreamParser()
+        parser.feed('Sure! [Note: one node per step] [] Here it is:\n```json\n["OnCl')
+        self.assertEqual(parser.feed('ick"]'), ["OnClick"])
+        self.assertEqual(parser.result(), '["OnClick"]')
+        parser = SequenceStreamParser()
+        with self.assertRaisesRegex(StreamAbort, "Unexpected"):
+            parser.feed('["OnClick", Show]')
+        with self.assertRaisesRegex(ValueError, "no node array"):
+            SequenceStreamParser().result()
+        parser = SequenceStreamParser()
+        parser.feed('["OnClick", "Telepo')
+        with self.assertRaisesRegex(StreamAbort, "Teleport"):
+            parser.feed('rt", "Show"]')
+        self.assertEqual(parser.nodes, ["OnClick"])
+
+        parser = SequenceStreamParser()
+        parser.feed('["OnClick", "FetchDataNode", "Show"]')
+        self.assertEqual(parser.repairs, [("FetchDataNode", "FetchData")])
+
+    def test_streamed_query_against_mock_server(self):
+        """Test that streamed generations feed partial sequences, keep Ollama's counters and retry malformed streams"""
+        prompt = "Fetch data, reduce the results to a single count, and then log that count."
+        config = MockConfig(latency_ms=1, accuracy=1.0, valid_rate=1.0, malformed_rate=0.5, models=["m"], seed=4)
+        partials = []
+        with MockOllamaServer(config=config) as server, mock.patch('node_seq_gen.backend_pool', BackendPool([server.url])):
+            result, validated, _, stats = process_query(
+                prompt, max_attempts=10, validation_threshold=1, selected_model="m", silent=True,
+                use_cache=False, return_stats=True, stream=True, on_partial=partials.append
+            )
+            counts = server.state.snapshot()
+
+        self.assertEqual(result, ["FetchData", "Reduce", "Log"])
+        self.assertTrue(validated)
+        self.assertEqual(counts['stream'], stats.generation_calls)
+        self.assertEqual(partials[-3:], [["FetchData"], ["FetchData", "Reduce"], ["FetchData", "Reduce", "Log"]])
+        self.assertGreater(counts['malformed'], 0)
+        self.assertGreater(stats.generation_calls, 1)
+        generations = [call for call in stats.calls if call['kind'] == 'generation']
+        self.assertTrue(all(call['eval_count'] and call['prompt_eval_count'] for call in generations))
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_calls_are_timed_and_tagged(self):
+        """Test that QueryStats and the registry capture tagged calls with Ollama's counters"""
+        async def fake_chat(model, messages, **kwargs):
+            await asyncio.sleep(0.001)
+            validation = 'Generated Node Sequence' in messages[-1]['content']
+            return {
+                'message': {'content': '{"valid": true}' if validation else '["FetchData", "Show"]'},
+                'prompt_eval_count': 100, 'eval_count': 5,
+                'total_duration': 2_000_000, 'load_duration': 1_000_000,
+            }
+
+        class FakeClient:
+            chat = staticmethod(fake_chat)
+
+        before = registry.counter_value('node_seq_llm_calls_total', kind='validation', model='stats-model', status='ok')
+        with mock.patch('node_seq_gen._get_async_client', return_value=FakeClient()):
+            _, _, _, stats = process_query(
+                "q", max_attempts=1, validation_threshold=2, selected_model="stats-model",
+                silent=True, use_cache=False, return_stats=True
+            )
+
+        self.assertEqual((stats.generation_calls, stats.validation_calls), (1, 2))
+        self.assertEqual([call['attempt'] for call in stats.calls], [1, 1, 1])
+        self.assertEqual(stats.to_dict()['prompt_eval_count'], 300)
+        self.assertAlmostEqual(stats.calls[0]['load_duration_s'], 0.001)
+        after = registry.counter_value('node_seq_llm_calls_total', kind='validation', model='stats-model', status='ok')
+        self.assertEqual(after - before, 2)
+
+    def test_prometheus_format(self):
+        """Test the text exposition format of counters and histograms"""
+        metrics_registry = MetricsRegistry()
+        metrics_registry.inc('requests_total', help_text='Requests', kind='generation')
+        metrics_registry.observe('latency_seconds', 0.3, buckets=(0.1, 0.5), kind='generation')
+        text = metrics_registry.to_prometheus()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{kind="generation"} 1', text)
+        self.assertIn('latency_seconds_bucket{kind="generation",le="0.1"} 0', text)
+        self.assertIn('latency_seconds_bucket{kind="generation",le="0.5"} 1', text)
+        self.assertIn('latency_seconds_bucket{kind="generation",le="+Inf"} 1', text)
+        self.assertIn('latency_seconds_count{kind="generation"} 1', text)
+
+
+class TestResponseExtraction(unittest.TestCase):
+    def test_finds_array_anywhere_and_repairs_names(self):
+        """Test extraction from chatter and mid-response fences, with near-miss names repaired"""
+        content = (
+            'Sure! Here is the sequence:\n```json\n{"sequence": ["onClick", "Fetch Data", "DisplayModalNode"]}\n```\n'
+            'It fetches the data [when] clicked.'
+        )
+        sequence, repairs = extract_sequence(content)
+        self.assertEqual(sequence, ["OnClick", "FetchData", "DisplayModal"])
+        self.assertEqual(repairs, [("onClick", "OnClick"), ("Fetch Data", "FetchData"), ("DisplayModalNode", "DisplayModal")])
+        self.assertEqual(extract_sequence("Use [note] this: ['PlaySond', 'Teleport']"), (["PlaySound", "Teleport"], [("PlaySond", "PlaySound")]))
+        with self.assertRaises(ValueError):
+            extract_sequence('{"sequence": ["FetchData", "Show"')
+
+    def test_repair_is_bounded(self):
+        """Test that short names are never edited and ambiguous edits are refused"""
+        self.assertEqual(node_registry.repair_node_name("RenderCharts"), "RenderChart")
+        self.assertIsNone(node_registry.repair_node_name("Sav"))
+        self.assertIsNone(node_registry.repair_node_name("Sound"))
+
+
+class TestStructuralValidator(unittest.TestCase):
+    def test_accepts_plausible_and_leaves_corrupted_undecided(self):
+        """Test that only sequences matching the prompt and known transitions are accepted"""
+        validator = StructuralValidator([("Fetch the users and show them", ["FetchData", "Show"])])
+        self.assertTrue(validator.accepts("Fetch data and show it", ["FetchData", "Show"]))
+        self.assertFalse(validator.accepts("Fetch data and show it", ["Show", "FetchData"]))
+        self.assertFalse(validator.accepts("Fetch data and show it", ["FetchData", "PlaySound", "Show"]))
+        self.assertFalse(validator.accepts("Fetch data and show it", ["FetchData"]))
+
+    def test_local_slots_skip_llm_validations(self):
+        """Test that accepted sequences fill validation slots without LLM calls"""
+        calls = []
+
+        async def fake_chat(model, messages, kind='chat', **kwargs):
+            calls.append(kind)
+            if kind == 'validation':
+                return {'message': {'content': '{"valid": true}'}}
+            return {'message': {'content': '["FetchData", "Show"]'}}
+
+        validator = StructuralValidator([("Fetch the users and show them", ["FetchData", "Show"])])
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat), \
+                mock.patch.object(node_seq_gen, 'structural_validator', validator):
+            result = node_seq_gen.process_query(
+                "Fetch data and show it", validation_threshold=3, selected_model="m",
+                silent=True, use_cache=False, return_stats=True, local_validations=2
+            )
+
+        self.assertEqual(result[0], ["FetchData", "Show"])
+        self.assertEqual(calls, ['generation', 'validation'])
+        self.assertEqual(result[3].local_validations, 2)
+
+    def test_learns_only_llm_accepted_results(self):
+        """Test that a result validated only by the structural validator is not learned"""
+        async def fake_chat(model, messages, kind='chat', **kwargs):
+            if kind == 'validation':
+                return {'message': {'content': '{"valid": true}'}}
+            return {'message': {'content': '["FetchData", "Show"]'}}
+
+        validator = StructuralValidator([("Fetch the users and show them", ["FetchData", "Show"])])
+        learned = []
+        with mock.patch('node_seq_gen.chat_async', side_effect=fake_chat), \
+                mock.patch.object(node_seq_gen, 'structural_validator', validator), \
+                mock.patch.object(validator, 'learn', side_effect=lambda *args: learned.append('validator')), \
+                mock.patch.object(node_seq_gen.fast_path_classifier, 'learn', side_effect=lambda *args: learned.append('fast_path')):
+            for local_validations in (3, 2):
+                _, validated, _ = node_seq_gen.process_query(
+                    "Fetch data and show it", validation_threshold=3, selected_model="m",
+                    silent=True, use_cache=False, local_validations=local_validations
+                )
+                self.assertTrue(validated)
+                learned.append(local_validations)
+
+        self.assertEqual(learned, [3, 'fast_path', 'validator', 2])
+
+
+class TestFewShotRetrieval(unittest.TestCase):
+    def test_retrieves_similar_examples_excluding_exact_match(self):
+        """Test top-k retrieval ranking and leave-one-out of the query itself"""
+        index = ExampleIndex([
+            ("Play a sound when a key is pressed", ["OnKeyPress", "PlaySound"]),
+            ("Fetch data and show it in a modal", ["FetchData", "DisplayModal"]),
+            ("Fetch data, sort it and show it", ["FetchData", "Sort", "Show"]),
+        ])
+        results = index.search("fetch data and show it in a modal", k=2, exclude_exact=True)
+        self.assertEqual([prompt for _, prompt, _ in results], ["Fetch data, sort it and show it"])
+        results = index.search("fetch data and show it in a modal", k=1)
+        self.assertEqual([prompt for _, prompt, _ in results], ["Fetch data and show it in a modal"])
+        results = index.search("Fetch the data and show it in a modal dialog", k=1)
+        self.assertEqual(results[0][2], ["FetchData", "DisplayModal"])
+
+    def test_compact_system_message(self):
+        """Test that the compact system message keeps the catalog and only k examples"""
+        compact = node_seq_gen.build_system_message("Fetch data and render a chart", 3)
+        self.assertLess(len(compact), len(node_seq_gen.system_message) / 2)
+        self.assertIn(node_registry.CATALOG_TEXT, compact)
+        self.assertEqual(compact.count("User Prompt:"), 3)
+        self.assertIs(node_seq_gen.build_system_message("Fetch data", 0), node_seq_gen.system_message)
+
+        prompt = node_seq_gen.example_index.examples[0][0]
+        self.assertIn(f'User Prompt: "{prompt}"', node_seq_gen.build_system_message(prompt, 1))
+        self.assertNotIn(f'User Prompt: "{prompt}"', node_seq_gen.build_system_message(prompt, 1, exclude_exact=True))
+
+
+class TestFastPath(unittest.TestCase):
+    def test_rules_and_learned_examples(self):
+        """Test keyword rules, confidence gating and persistence of learned results"""
+        self.assertEqual(
+            rule_sequence("Fetch data, sort it by date, and then show the sorted list."),
+            ["FetchData", "Sort", "Show"]
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'learned.jsonl')
+            classifier = FastPathClassifier(threshold=0.9, db_path=db_path)
+            # Rules alone stay below the threshold until a known example agrees
+            self.assertIsNone(classifier.classify("Fetch data and then render a chart"))
+            classifier.learn("Fetch the data, then render a chart of it", ["FetchData", "RenderChart"])
+            self.assertEqual(classifier.classify("Fetch data and then render a chart"), ["FetchData", "RenderChart"])
+            # Rules cover only part of this prompt, so nothing is confident yet
+            self.assertIsNone(classifier.classify("Grab the latest prices and pop up a dialog"))
+
+            classifier.learn("Grab the latest prices and pop up a dialog", ["FetchData", "DisplayModal"])
+            classifier.learn("Grab the newest prices, pop up a dialog", ["Made", "Up"])
+            reloaded = FastPathClassifier(threshold=0.8, db_path=db_path)
+            self.assertEqual(len(reloaded), 2)
+            self.assertEqual(reloaded.classify("grab the latest prices, then pop up a dialog"), ["FetchData", "DisplayModal"])
+
+    def test_trigger_clauses_run_first(self):
+        """Test that trailing event clauses come first and leading repeats are kept"""
+        self.assertEqual(
+            rule_sequence("Navigate to a new page after a delay of 3 seconds when the user clicks a button."),
+            ["OnClick", "Delay", "Navigate"]
+        )
+        self.assertEqual(rule_sequence("Show an alert when the button is clicked"), ["OnClick", "Alert"])
+        self.assertEqual(rule_sequence("Play a sound, then after a delay pause the sound"), ["PlaySound", "Delay", "PauseSound"])
+        self.assertEqual(rule_sequence("Wait 2 seconds, play a sound, then wait 2 seconds again"), ["Delay", "PlaySound", "Delay"])
+        self.assertIsNone(FastPathClassifier().classify("Show an alert when the button is clicked"))
+
+    def test_confident_query_skips_llm(self):
+        """Test that a fast-path answer makes no LLM call and is reported separately"""
+        classifier = FastPathClassifier([("Fetch data from the server and render a chart", ["FetchData", "RenderChart"])])
+        with mock.patch('node_seq_gen.chat_async', side_effect=AssertionError("LLM called")), \
+                mock.patch.object(node_seq_gen, 'fast_path_classifier', classifier):
+            node_sequence, validated, _, stats = process_query(
+                "Fetch data from the API and then render a chart of it.",
+                selected_model="m", silent=True, use_cache=False, return_stats=True, use_fast_path=True
+            )
+        self.assertEqual(node_sequence, ["FetchData", "RenderChart"])
+        self.assertTrue(validated)
+        self.assertTrue(stats.fast_path)
+        self.assertEqual(stats.llm_calls, 0)
+
+
+class TestBackgroundJobs(unittest.TestCase):
+    def test_jobs_run_in_order_and_report_progress(self):
+        """Test that jobs beyond max_workers wait and that progress and failures can be polled"""
+        manager = JobManager(max_workers=1)
+        release = threading.Event()
+
+        def slow_job(job, steps):
+            job.progress(done=0, total=steps)
+            release.wait(5)
+            for step in range(steps):
+                job.progress(done=step + 1, message=f"step {step + 1}")
+            return steps
+
+        def failing_job(job):
+            raise RuntimeError("boom")
+
+        first = manager.submit('slow', slow_job, 2)
+        second = manager.submit('failing', failing_job)
+        time.sleep(0.05)
+        self.assertEqual(manager.get(first)['status'], 'running')
+        self.assertEqual(manager.get(second)['status'], 'queued')
+        self.assertEqual(manager.active(), 2)
+
+        release.set()
+        deadline = time.time() + 5
+        while manager.active() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(manager.get(first)['result'], 2)
+        self.assertEqual(manager.get(first)['output'], "step 1\nstep 2")
+        self.assertEqual((manager.get(second)['status'], manager.get(second)['error']), ('failed', "boom"))
+        self.assertIsNone(manager.get('missing'))
+
+
+class TestNodeRegistry(unittest.TestCase):
+    def test_lookup_structures(self):
+        """Test the registry indexes against the node catalog"""
+        self.assertEqual(len(node_registry.NODES), 41)
+        self.assertEqual(len(node_registry.NODE_NAMES), len(node_registry.NODES))
+        self.assertEqual(node_registry.lookup_node(" displaymodal "), "DisplayModal")
+        self.assertIsNone(node_registry.lookup_node("DisplayModals"))
+        self.assertEqual(node_registry.category_of("Delay"), "Event")
+        self.assertIn("Map", node_registry.NODES_BY_CATEGORY["Transformation"])
+
+    def test_prompt_and_schema_generated_from_registry(self):
+        """Test that every node appears in the system message and the schema"""
+        schema_nodes = node_seq_gen.get_sequence_schema()['properties']['sequence']['items']['enum']
+        self.assertEqual(set(schema_nodes), node_registry.NODE_NAMES)
+        for node in node_registry.NODES:
+            self.assertIn(f"[{node.name}]: {node.description}", node_seq_gen.system_message)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_key_normalizes_prompt(self):
+        """Test that whitespace and case differences share a cache key"""
+        key_a = make_cache_key("m", "Fetch  data and SHOW it", "sys", max_attempts=3)
+        key_b = make_cache_key("m", " fetch data and show it ", "sys", max_attempts=3)
+        key_c = make_cache_key("m", "fetch data and show it", "sys", max_attempts=5)
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+
+    def test_lru_eviction_and_ttl(self):
+        """Test size-based eviction, TTL expiry and hit/miss counters"""
+        cache = ResultCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+        cache._entries["a"] = (1, time.time() - 120)
+        self.assertIsNone(cache.get("a"))
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_disk_tier_survives_restart(self):
+        """Test that the sqlite tier serves entries to a fresh cache"""
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "cache.db")
+            ResultCache(db_path=db_path).set("key", {"sequence": ["FetchData", "Show"], "validated": True})
+            cache = ResultCache(db_path=db_path)
+            self.assertEqual(cache.get("key"), {"sequence": ["FetchData", "Show"], "validated": True})
+            self.assertEqual(cache.stats()['disk_hits'], 1)
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file